@@ -0,0 +1,107 @@
+"""Minimal runner for the benchmarks in this directory.
+
+The benchmark modules follow the airspeed velocity (asv) conventions, i.e.
+classes with optional 'params' and 'setup', 'time_*' methods, and 'track_*'
+methods returning a value in the unit given by their 'unit' attribute. This
+runner allows running them without asv installed:
+
+    $ python -m benchmarks [NAME_FILTER] [--repeat N] [--output RESULTS.json]
+
+The results can be written to a JSON file, along with the versions of vttLib
+and fontTools, to compare them across releases.
+"""
+import importlib
+import itertools
+import json
+import pkgutil
+import sys
+import timeit
+from argparse import ArgumentParser
+
+import fontTools
+
+import benchmarks
+import vttLib
+
+
+def iter_benchmarks(name_filter=None):
+    for module_info in pkgutil.iter_modules(benchmarks.__path__):
+        if not module_info.name.startswith("bench_"):
+            continue
+        module = importlib.import_module("benchmarks." + module_info.name)
+        for class_name, cls in sorted(vars(module).items()):
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            for attr in sorted(dir(cls)):
+                if not attr.startswith(("time_", "track_")):
+                    continue
+                name = "{}.{}.{}".format(module_info.name, class_name, attr)
+                if name_filter and name_filter not in name:
+                    continue
+                yield name, cls, attr
+
+
+def iter_params(cls):
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if not params or not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return itertools.product(*params)
+
+
+def run(name, cls, attr, repeat):
+    results = {}
+    for args in iter_params(cls):
+        instance = cls()
+        label = name + ("(%s)" % ", ".join(map(str, args)) if args else "")
+        if hasattr(instance, "setup"):
+            try:
+                instance.setup(*args)
+            except NotImplementedError:
+                # asv's convention for skipping a benchmark
+                print("%-70s %13s" % (label, "skipped"))
+                continue
+        func = getattr(instance, attr)
+        if attr.startswith("track_"):
+            value = max(func(*args) for _ in range(repeat))
+            unit = getattr(func, "unit", "")
+            print("%-70s %10.1f %s" % (label, value, unit))
+            results[label] = {"value": value, "unit": unit}
+        else:
+            best = min(timeit.repeat(lambda: func(*args), number=1, repeat=repeat))
+            print("%-70s %10.3f ms" % (label, best * 1000))
+            results[label] = {"value": best, "unit": "seconds"}
+        if hasattr(instance, "teardown"):
+            instance.teardown(*args)
+    return results
+
+
+def main(args=None):
+    parser = ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("name_filter", nargs="?")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", metavar="RESULTS.json")
+    options = parser.parse_args(args)
+
+    results = {}
+    for name, cls, attr in iter_benchmarks(options.name_filter):
+        results.update(run(name, cls, attr, options.repeat))
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "versions": {
+                        "vttLib": vttLib.__version__,
+                        "fontTools": fontTools.version,
+                    },
+                    "results": results,
+                },
+                fp,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Benchmarks for checking and rewriting composite glyph information."""
+import vttLib
+from benchmarks.common import make_synthetic_font
+
+
+class TimeComposites:
+    # use a tuple of (n_glyphs, n_composites) combinations, not their product
+    params = [[(2000, 500), (20000, 5000)]]
+    param_names = ["font_size"]
+
+    def setup(self, font_size):
+        n_glyphs, n_composites = font_size
+        self.font = make_synthetic_font(n_glyphs, n_composites)
+        self.glyf = self.font["glyf"]
+        self.glyph_order = self.font.getGlyphOrder()
+        self.glyph_ids = self.font.getReverseGlyphMap()
+        self.composites = [
+            name for name in self.font.getGlyphOrder() if self.glyf[name].isComposite()
+        ]
+        self.assemblies = [
+            vttLib.get_glyph_assembly(self.font, name) for name in self.glyph_order
+        ]
+
+    def time_write_composite_info(self, font_size):
+        for name in self.composites:
+            vttLib.write_composite_info(self.glyf[name], self.glyph_ids)
+
+    def time_write_composite_info_glyph_order_list(self, font_size):
+        # the former linear search in the glyph order, for comparison
+        for name in self.composites:
+            vttLib.write_composite_info(self.glyf[name], self.glyph_order)
+
+    def time_update_composites(self, font_size):
+        vttLib.update_composites(self.font, glyphs=self.composites)
+
+    def time_update_composites_all_glyphs(self, font_size):
+        vttLib.update_composites(self.font)
+
+    def time_scan_components(self, font_size):
+        for data in self.assemblies:
+            vttLib.scan_components(data)
+
+    def time_transform_assembly_components(self, font_size):
+        # the former way of finding the components, for comparison
+        for data in self.assemblies:
+            vttLib.transform_assembly(data, components=[])
+
+
+class TimeIncrementalComposites:
+    # (n_glyphs, n_composites, n_changed)
+    params = [[(20000, 5000, 10), (20000, 5000, 5000)], [1, 4]]
+    param_names = ["font_size", "jobs"]
+    timeout = 300
+
+    def setup(self, font_size, jobs):
+        n_glyphs, n_composites, n_changed = font_size
+        self.font = make_synthetic_font(n_glyphs, n_composites)
+        vttLib.update_composites(self.font)
+        self.state = vttLib.composite_state(self.font)
+        glyf = self.font["glyf"]
+        for name in list(self.state)[:n_changed]:
+            glyf[name].components[0].x += 10
+
+    def time_changed_composites(self, font_size, jobs):
+        vttLib.changed_composites(self.font, self.state)
+
+    def time_update_changed_composites(self, font_size, jobs):
+        changed = vttLib.changed_composites(self.font, self.state)
+        vttLib.update_composites(self.font, changed, jobs=jobs)
+
+    def time_update_all_composites(self, font_size, jobs):
+        vttLib.update_composites(self.font, jobs=jobs)
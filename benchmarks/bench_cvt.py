@@ -0,0 +1,60 @@
+"""Benchmarks for parsing the control values of the VTT control program."""
+import array
+import re
+
+import vttLib.cvt
+
+GROUPS = ["UpperCase", "LowerCase", "Figure", "Other"]
+CATEGORIES = ["SquareHeight", "RoundHeight", "StraightStroke", "RoundStroke"]
+
+
+def make_control_program(n_cvts, comment_lines=20):
+    lines = ["/* Control Program */", "CATEGORY Stroke"]
+    for index in range(n_cvts):
+        if index % 50 == 0:
+            lines.append(
+                "/*" + "\n".join(["* notes %d" % i for i in range(comment_lines)])
+            )
+            lines.append("*/")
+            lines.append(GROUPS[index // 50 % len(GROUPS)])
+            lines.append("  Black")
+            lines.append("  X")
+        if index % 10 == 0:
+            lines.append("  " + CATEGORIES[index // 10 % len(CATEGORIES)])
+        if index % 10:
+            lines.append(
+                "%7d: %5d ~ %3d @ 58 /* cvt %d */" % (index, 10, index - 1, index)
+            )
+        else:
+            lines.append("%7d: %5d /* cvt %d */" % (index, 100 + index, index))
+            lines.append('ASM("CALL[], %d, 89")' % index)
+    return "\n".join(lines)
+
+
+def _legacy_parse(data):
+    # the former two regular expressions and growing array, for comparison
+    data = re.sub(r"/\*.*?\*/", "", data, flags=re.DOTALL)
+    values = array.array("h")
+    for m in re.finditer(r"^\s*([0-9]+)\s*:\s*(-?[0-9]+)", data, re.MULTILINE):
+        index, value = int(m.group(1)), int(m.group(2))
+        for _ in range(1 + index - len(values)):
+            values.append(0)
+        values[index] = value
+    return values
+
+
+class TimeParseControlProgram:
+    params = [[500, 5000, 20000]]
+    param_names = ["n_cvts"]
+
+    def setup(self, n_cvts):
+        self.data = make_control_program(n_cvts)
+
+    def time_parse_control_program(self, n_cvts):
+        vttLib.cvt._parse_control_program(self.data)
+
+    def time_parse_control_program_cached(self, n_cvts):
+        vttLib.cvt.parse_control_program(self.data)
+
+    def time_legacy_parse(self, n_cvts):
+        _legacy_parse(self.data)
@@ -0,0 +1,32 @@
+"""Benchmarks for the start-up time of the command line interface.
+
+Each run starts a new interpreter, so that the modules aren't cached. The
+heavy dependencies (pyparsing, ufoLib2 and fontTools.varLib) are only
+imported by the commands that need them; 'python -m vttLib --version' must
+stay under VERSION_TARGET seconds.
+"""
+import subprocess
+import sys
+import time
+
+VERSION_TARGET = 0.5
+
+
+def _run(*args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+class TimeImport:
+    def time_import_vttLib(self):
+        _run("-c", "import vttLib")
+
+    def time_cli_version(self):
+        seconds = _run("-m", "vttLib", "--version")
+        assert (
+            seconds < VERSION_TARGET
+        ), "'python -m vttLib --version' took %.3f s, the target is %.3f s" % (
+            seconds,
+            VERSION_TARGET,
+        )
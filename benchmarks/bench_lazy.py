@@ -0,0 +1,61 @@
+"""Benchmarks for reading a few glyph programs from a large font file.
+
+'eager' decodes the whole TSI1 and TSI3 tables as fontTools does, 'lazy'
+only the programs which are read (see vttLib.lazy), and 'mmap' does the same
+with a font opened with lazy=True, whose tables are memory-mapped.
+"""
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from fontTools.ttLib import TTFont, newTable
+
+import vttLib
+from benchmarks.common import make_synthetic_font
+
+N_READ = 100
+
+
+def _read_programs(path, mode):
+    font = TTFont(path, lazy=True if mode == "mmap" else None)
+    if mode == "eager":
+        font["TSI1"]
+        font["TSI3"]
+    glyph_order = font.getGlyphOrder()
+    step = len(glyph_order) // N_READ
+    for glyph_name in glyph_order[::step]:
+        vttLib.get_glyph_assembly(font, glyph_name)
+        vttLib.get_glyph_talk(font, glyph_name)
+
+
+class TimeLazyPrograms:
+    params = [[10000, 65000], ["eager", "lazy", "mmap"]]
+    param_names = ["n_glyphs", "mode"]
+    timeout = 300
+
+    def setup(self, n_glyphs, mode):
+        font = make_synthetic_font(n_glyphs)
+        for tag in ("TSI0", "TSI2"):
+            font[tag] = newTable(tag)
+        for glyph_name in font.getGlyphOrder():
+            vttLib.set_glyph_talk(font, glyph_name, "/* VTTTalk */\nYAnchor(0)")
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "font.ttf")
+        font.save(self.path)
+
+    def teardown(self, n_glyphs, mode):
+        shutil.rmtree(self.tmpdir)
+
+    def time_read_programs(self, n_glyphs, mode):
+        _read_programs(self.path, mode)
+
+    def track_peak_memory_read_programs(self, n_glyphs, mode):
+        tracemalloc.start()
+        try:
+            _read_programs(self.path, mode)
+            return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    track_peak_memory_read_programs.unit = "MiB"
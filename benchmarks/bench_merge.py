@@ -0,0 +1,112 @@
+"""Benchmarks for dumping the VTT sources of a font and merging them back.
+
+The dumps are written from synthetic fonts with the given number of glyphs,
+either with the VTT tables only ("vtt") or with all the tables of the font
+("full"). 'import_xml' is the former way of reading the dump, importing all
+of it into a TTFont, for comparison. TimeDumpFormats compares the TTX dump
+with the binary sidecar.
+"""
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from fontTools.ttLib import TTFont, newTable
+
+import vttLib
+from benchmarks.common import make_synthetic_font
+
+
+def _peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def _import_xml(path):
+    TTFont().importXML(path)
+
+
+class TimeMergeFile:
+    params = [[10000, 50000], ["vtt", "full"]]
+    param_names = ["n_glyphs", "dump"]
+    timeout = 300
+
+    def setup(self, n_glyphs, dump):
+        self.font = make_synthetic_font(n_glyphs)
+        tsi5 = self.font["TSI5"] = newTable("TSI5")
+        tsi5.glyphGrouping = {name: 1 for name in self.font.getGlyphOrder()}
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "dump.ttx")
+        if dump == "vtt":
+            vttLib.transfer.dump_to_file(self.font, self.path)
+        else:
+            self.font.saveXML(self.path)
+
+    def teardown(self, n_glyphs, dump):
+        shutil.rmtree(self.tmpdir)
+
+    def time_merge_from_file(self, n_glyphs, dump):
+        vttLib.transfer.merge_from_file(self.font, self.path)
+
+    def time_import_xml(self, n_glyphs, dump):
+        _import_xml(self.path)
+
+    def track_peak_memory_merge_from_file(self, n_glyphs, dump):
+        return _peak_memory(vttLib.transfer.merge_from_file, self.font, self.path)
+
+    track_peak_memory_merge_from_file.unit = "MiB"
+
+    def track_peak_memory_import_xml(self, n_glyphs, dump):
+        return _peak_memory(_import_xml, self.path)
+
+    track_peak_memory_import_xml.unit = "MiB"
+
+
+class TimeDumpFormats:
+    params = [10000, 50000]
+    param_names = ["n_glyphs"]
+    timeout = 300
+
+    def setup(self, n_glyphs):
+        self.font = make_synthetic_font(n_glyphs)
+        tsi5 = self.font["TSI5"] = newTable("TSI5")
+        tsi5.glyphGrouping = {name: 1 for name in self.font.getGlyphOrder()}
+        self.tmpdir = tempfile.mkdtemp()
+        self.ttx = os.path.join(self.tmpdir, "dump.ttx")
+        self.sidecar = os.path.join(self.tmpdir, "dump.vttb")
+        vttLib.transfer.dump_to_file(self.font, self.ttx)
+        vttLib.transfer.dump_to_sidecar(self.font, self.sidecar)
+        self.glyph_name = self.font.getGlyphOrder()[n_glyphs // 2]
+
+    def teardown(self, n_glyphs):
+        shutil.rmtree(self.tmpdir)
+
+    def time_dump_to_file(self, n_glyphs):
+        vttLib.transfer.dump_to_file(self.font, self.ttx)
+
+    def time_dump_to_sidecar(self, n_glyphs):
+        vttLib.transfer.dump_to_sidecar(self.font, self.sidecar)
+
+    def time_merge_from_file(self, n_glyphs):
+        vttLib.transfer.merge_from_file(self.font, self.ttx)
+
+    def time_merge_from_sidecar(self, n_glyphs):
+        vttLib.transfer.merge_from_sidecar(self.font, self.sidecar)
+
+    def time_sidecar_get_glyph_assembly(self, n_glyphs):
+        with vttLib.transfer.SidecarReader(self.sidecar) as reader:
+            reader.get_glyph_assembly(self.glyph_name)
+
+    def track_size_ttx(self, n_glyphs):
+        return os.path.getsize(self.ttx) / 1024
+
+    track_size_ttx.unit = "KiB"
+
+    def track_size_sidecar(self, n_glyphs):
+        return os.path.getsize(self.sidecar) / 1024
+
+    track_size_sidecar.unit = "KiB"
@@ -0,0 +1,56 @@
+"""Benchmarks for normalizing the VTT programs of a large font."""
+import vttLib
+from benchmarks.common import make_synthetic_font
+
+
+def _legacy_normalize_glyph_programs(font):
+    # the former per-glyph fetch of both programs and three regex passes, for
+    # comparison
+    for name in font.getGlyphOrder():
+        for is_talk in (True, False):
+            try:
+                program = vttLib.get_vtt_program(font, name, is_talk, is_glyph=True)
+            except KeyError:
+                continue
+            if is_talk:
+                program = vttLib.gui_generated_re.sub("", program)
+            program = vttLib.vtt_compiler_re.sub(r"/* \1 */\r", program)
+            program = vttLib.glyph_re.sub("", program)
+            vttLib.set_vtt_program(font, name, program, is_talk, is_glyph=True)
+
+
+def _add_vtt_comments(font):
+    # what VTT writes when it compiles the glyph programs
+    for i, name in enumerate(font.getGlyphOrder()):
+        assembly = vttLib.get_glyph_assembly(font, name)
+        vttLib.set_glyph_assembly(
+            font,
+            name,
+            "/* TT glyph %d, char 0x%x */\n"
+            "/* VTT 6.35 compiler Mon Jan 1 00:00:00 2018 */\n%s" % (i, i, assembly),
+        )
+        vttLib.set_glyph_talk(
+            font,
+            name,
+            "/* VTTTalk glyph %d, char 0x%x */\n"
+            "/* GUI generated Mon Jan 1 00:00:00 2018 */\nYAnchor(1)" % (i, i),
+        )
+
+
+class TimeNormalizePrograms:
+    params = [[50000], ["vtt", "normalized"], ["legacy", "1", "4"]]
+    param_names = ["n_glyphs", "programs", "jobs"]
+    timeout = 600
+
+    def setup(self, n_glyphs, programs, jobs):
+        self.font = make_synthetic_font(n_glyphs)
+        if programs == "vtt":
+            _add_vtt_comments(self.font)
+        else:
+            vttLib.normalize_vtt_programs(self.font)
+
+    def time_normalize_vtt_programs(self, n_glyphs, programs, jobs):
+        if jobs == "legacy":
+            _legacy_normalize_glyph_programs(self.font)
+        else:
+            vttLib.normalize_vtt_programs(self.font, jobs=int(jobs))
@@ -0,0 +1,105 @@
+"""Benchmarks for each stage of compiling the VTT sources of a whole font.
+
+Fonts are either the bundled NotoSans-MM-ASCII-VF fixture ("noto") or
+synthetic fonts with the given number of glyphs, a fifth of them composites.
+"""
+import time
+
+import vttLib
+from benchmarks.common import (
+    glyph_assemblies,
+    load_merged_noto_font,
+    make_synthetic_font,
+    make_synthetic_fpgm,
+)
+
+
+def _load_font(font_name):
+    if font_name == "noto":
+        return load_merged_noto_font()
+    n_glyphs = int(font_name)
+    return make_synthetic_font(n_glyphs, n_composites=n_glyphs // 5)
+
+
+class TimeGlyphPrograms:
+    params = ["noto", "10000", "50000"]
+    param_names = ["font"]
+    timeout = 300
+
+    def setup(self, font_name):
+        self.font = _load_font(font_name)
+        self.assemblies = [data.strip() for _, data in glyph_assemblies(self.font)]
+        self.tokens = [vttLib.tokenize(data) for data in self.assemblies]
+        self.ft_assemblies = [
+            vttLib.transform(tokens, components=[]) for tokens in self.tokens
+        ]
+
+    def time_tokenize(self, font_name):
+        for data in self.assemblies:
+            vttLib.tokenize(data)
+
+    def time_transform(self, font_name):
+        for tokens in self.tokens:
+            vttLib.transform(tokens, components=[])
+
+    def time_make_ft_program(self, font_name):
+        for assembly in self.ft_assemblies:
+            vttLib.make_ft_program(assembly)
+
+    def time_compile_instructions(self, font_name):
+        vttLib.compile_instructions(self.font, ship=False)
+
+    def time_compile_instructions_optimize(self, font_name):
+        vttLib.compile_instructions(self.font, ship=False, optimize=True)
+
+    def track_compile_throughput(self, font_name):
+        start = time.perf_counter()
+        vttLib.compile_instructions(self.font, ship=False)
+        return len(self.assemblies) / (time.perf_counter() - start)
+
+    track_compile_throughput.unit = "glyphs/s"
+
+
+class TimeFontProgram:
+    params = [100, 1000]
+    param_names = ["n_functions"]
+
+    def setup(self, n_functions):
+        self.data = make_synthetic_fpgm(n_functions)
+        self.tokens = vttLib.tokenize(self.data)
+        self.functions = [
+            vttLib.transform(f) for f in vttLib.split_functions(self.tokens)
+        ]
+        self.ft_assembly = vttLib.merge_functions(self.functions)
+
+    def time_transform(self, n_functions):
+        for f in vttLib.split_functions(self.tokens):
+            vttLib.transform(f)
+
+    def time_merge_functions(self, n_functions):
+        vttLib.merge_functions(self.functions)
+
+    def time_make_ft_program(self, n_functions):
+        vttLib.make_ft_program(self.ft_assembly)
+
+    def time_make_program(self, n_functions):
+        vttLib.make_program(self.data, "fpgm")
+
+    def time_make_program_assembly_backend(self, n_functions):
+        vttLib.make_program(self.data, "fpgm", backend="assembly")
+
+    def time_make_font_program_jobs(self, n_functions):
+        vttLib._make_font_program(self.data, jobs=0)
+
+
+class TimeProgramBackends:
+    params = [list(vttLib.PROGRAM_BACKENDS), ["noto", "10000"]]
+    param_names = ["backend", "font"]
+
+    def setup(self, backend, font_name):
+        font = _load_font(font_name)
+        self.assemblies = [data for _, data in glyph_assemblies(font)]
+
+    def time_make_glyph_programs(self, backend, font_name):
+        for data in self.assemblies:
+            vttLib.make_program(data, components=[], backend=backend)
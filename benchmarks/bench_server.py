@@ -0,0 +1,41 @@
+"""Benchmarks for the requests of the compile server, with a warm session."""
+import os
+import shutil
+import tempfile
+
+import vttLib
+from benchmarks.common import DATA_DIR
+from vttLib.server import CompileSession
+
+
+class TimeCompileSession:
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "NotoSans-MM-ASCII-VF.ttf")
+        shutil.copyfile(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF.ttf"), self.path)
+        vttLib.vtt_merge_file(
+            os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF.ttx"), self.path
+        )
+        self.outfile = os.path.join(self.tmpdir, "out.ttf")
+        self.session = CompileSession(self.path)
+        self.session.compile_font()
+        self.assembly = self.session.get_glyph_assembly("A")["assembly"]
+        self.edits = 0
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def time_compile_glyph(self):
+        # unchanged, so taken from the cache
+        self.session.compile_glyph("A", self.assembly)
+
+    def time_compile_glyph_edited(self):
+        self.edits += 1
+        self.session.compile_glyph("A", "/* edit %d */\n" % self.edits + self.assembly)
+
+    def time_compile_font(self):
+        self.session.compile_font(self.outfile, ship=True)
+
+    def time_vtt_compile(self):
+        # a compile command without the server, for comparison
+        vttLib.vtt_compile(self.path, self.outfile, ship=True)
@@ -0,0 +1,59 @@
+"""Benchmarks for subsetting the VTT sources of a large font."""
+from fontTools import subset
+from fontTools.ttLib import newTable
+
+import vttLib
+import vttLib.subset
+from benchmarks.common import make_synthetic_font
+
+
+def _legacy_subset_vtt_glyph_programs(font, glyph_names):
+    # the former membership tests in whatever 'glyph_names' is, for comparison
+    for tag in ("TSI1", "TSI3"):
+        programs = font[tag].glyphPrograms
+        for name in list(programs.keys()):
+            if name not in glyph_names:
+                del programs[name]
+    groups = font["TSI5"].glyphGrouping
+    for name in list(groups.keys()):
+        if name not in glyph_names:
+            del groups[name]
+
+
+class TimeSubsetVTTSources:
+    # keep one glyph in 'step'
+    params = [[20000], [10, 1000], ["legacy", "subset_vtt_glyph_programs"]]
+    param_names = ["n_glyphs", "step", "method"]
+    timeout = 300
+
+    def setup(self, n_glyphs, step, method):
+        self.font = make_synthetic_font(n_glyphs)
+        self.font["TSI5"] = newTable("TSI5")
+        self.font["TSI5"].glyphGrouping = {
+            name: 1 for name in self.font.getGlyphOrder()
+        }
+        # a list, as callers commonly pass
+        self.glyph_names = self.font.getGlyphOrder()[::step]
+
+    def time_subset_programs(self, n_glyphs, step, method):
+        if method == "legacy":
+            _legacy_subset_vtt_glyph_programs(self.font, self.glyph_names)
+        else:
+            vttLib.subset_vtt_glyph_programs(self.font, self.glyph_names)
+
+
+class TimeSubsetFont:
+    params = [[20000], [10, 1000]]
+    param_names = ["n_glyphs", "step"]
+    timeout = 300
+
+    def setup(self, n_glyphs, step):
+        self.font = make_synthetic_font(n_glyphs, n_composites=n_glyphs // 4)
+        self.glyph_names = self.font.getGlyphOrder()[::step]
+        self.options = subset.Options()
+        self.options.glyph_names = True
+
+    def time_subset_font(self, n_glyphs, step):
+        vttLib.subset.subset_font(
+            self.font, glyphs=self.glyph_names, options=self.options
+        )
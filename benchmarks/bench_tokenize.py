@@ -0,0 +1,26 @@
+"""Benchmarks for tokenizing VTT assembly with each tokenizer engine."""
+import vttLib
+from benchmarks.common import (
+    FDEF_FIXTURES,
+    glyph_assemblies,
+    load_vtt_font,
+    read_fixture,
+)
+
+
+class TimeTokenize:
+    params = sorted(vttLib.TOKENIZER_ENGINES)
+    param_names = ["engine"]
+
+    def setup(self, engine):
+        font = load_vtt_font()
+        self.glyph_programs = [data for _, data in glyph_assemblies(font)]
+        self.functions = [read_fixture(name) for name in FDEF_FIXTURES]
+
+    def time_glyph_programs(self, engine):
+        for data in self.glyph_programs:
+            vttLib.tokenize(data, engine=engine)
+
+    def time_functions(self, engine):
+        for data in self.functions:
+            vttLib.tokenize(data, engine=engine)
@@ -0,0 +1,25 @@
+"""Benchmarks for transforming VTT assembly into fontTools assembly."""
+import vttLib
+from benchmarks.common import FDEF_FIXTURES, read_fixture, synthetic_jump_function
+
+
+class TimeTransformJumps:
+    params = [10, 100, 500]
+    param_names = ["n_jumps"]
+
+    def setup(self, n_jumps):
+        self.data = synthetic_jump_function(n_jumps)
+
+    def time_transform_fpgm(self, n_jumps):
+        vttLib.transform_assembly(self.data, name="fpgm")
+
+
+class TimeTransformFunctions:
+    params = FDEF_FIXTURES
+    param_names = ["fixture"]
+
+    def setup(self, fixture):
+        self.data = read_fixture(fixture)
+
+    def time_transform(self, fixture):
+        vttLib.transform_assembly(self.data)
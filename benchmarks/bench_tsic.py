@@ -0,0 +1,23 @@
+"""Benchmarks for computing 'cvar' variations from the 'TSIC' table."""
+import vttLib
+from benchmarks.common import make_synthetic_tsic
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    HAVE_NUMPY = False
+else:
+    HAVE_NUMPY = True
+
+
+class TimeCvarVariations:
+    params = [[500, 2500, 10000], [8, 40], [False, True]]
+    param_names = ["n_cvts", "n_masters", "use_numpy"]
+
+    def setup(self, n_cvts, n_masters, use_numpy):
+        if use_numpy and not HAVE_NUMPY:
+            raise NotImplementedError("NumPy is not installed")
+        self.tsic, self.cvts = make_synthetic_tsic(n_cvts, n_masters, n_axes=3)
+
+    def time_make_cvar_variations(self, n_cvts, n_masters, use_numpy):
+        vttLib.make_cvar_variations(self.tsic, self.cvts, use_numpy=use_numpy)
@@ -0,0 +1,187 @@
+"""Shared helpers for loading benchmark inputs."""
+import os
+import random
+import re
+from types import SimpleNamespace
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphComponent
+
+import vttLib
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tests", "data")
+
+FDEF_FIXTURES = ["fdef83", "fdef133", "fdef152", "fdef153", "idef145"]
+
+
+def read_fixture(name):
+    with open(os.path.join(DATA_DIR, name + ".txt")) as fp:
+        return fp.read()
+
+
+def load_vtt_font(filename="NotoSans-MM-ASCII-VF-VTT.ttx"):
+    font = TTFont()
+    font.importXML(os.path.join(DATA_DIR, filename))
+    return font
+
+
+def load_merged_noto_font():
+    """Return the NotoSans-MM-ASCII-VF font with its VTT sources merged in."""
+    font = TTFont(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF.ttf"))
+    vttLib.transfer.merge_from_file(
+        font, os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF.ttx")
+    )
+    return font
+
+
+def glyph_assemblies(font):
+    """Return a list of (glyph name, VTT assembly) for all glyph programs."""
+    result = []
+    for name in font.getGlyphOrder():
+        try:
+            data = vttLib.get_glyph_assembly(font, name)
+        except KeyError:
+            continue
+        if data.strip():
+            result.append((name, data))
+    return result
+
+
+def synthetic_jump_function(n_jumps, number=200):
+    """Return the VTT assembly of a function with 'n_jumps' forward jumps, all
+    landing after the block containing the jump instructions.
+    """
+    lines = ["FDEF[], %d" % number, "#BEGIN", "#PUSHOFF"]
+    for i in range(n_jumps):
+        lines.append("#PUSH, 1, 2, 300, Var%d" % i)
+        lines.append("JROT[], (Var%d=#Label%d)" % (i, i))
+        lines.append("DUP[]")
+        lines.append("POP[]")
+    for i in range(n_jumps):
+        lines.append("#Label%d:" % i)
+        lines.append("#PUSH, %d" % i)
+        lines.append("POP[]")
+    lines.extend(["#PUSHON", "#END", "ENDF[]"])
+    return "\n".join(lines)
+
+
+_FDEF_NUMBER_RE = re.compile(r"^FDEF\[\], *[0-9]+", re.MULTILINE)
+
+
+def make_synthetic_fpgm(n_functions):
+    """Return the VTT assembly of a 'fpgm' with 'n_functions' FDEFs, made by
+    renumbering copies of the function fixtures.
+    """
+    fixtures = [read_fixture(name) for name in FDEF_FIXTURES if name.startswith("fdef")]
+    functions = []
+    for i in range(n_functions):
+        data = fixtures[i % len(fixtures)]
+        functions.append(_FDEF_NUMBER_RE.sub("FDEF[], %d" % i, data))
+    return "\n".join(functions)
+
+
+SIMPLE_GLYPH_PROGRAM = """\
+/* synthetic glyph program */
+SVTCA[Y]
+MIAP[R], 0, 1
+MIAP[R], 2, 3
+SRP1[], 0
+SRP2[], 2
+IP[], 1
+SVTCA[X]
+MDAP[R], 0
+MDRP[m>RBl], 2
+IUP[Y]
+IUP[X]
+"""
+
+
+def make_synthetic_font(n_glyphs, n_composites=0, n_functions=0):
+    """Return a TTFont with 'n_glyphs' glyphs, the last 'n_composites' of which
+    are composites of two base glyphs, and VTT sources for all of them and for
+    a 'fpgm' with 'n_functions' functions.
+    """
+    glyph_order = [".notdef"] + ["glyph%05d" % i for i in range(1, n_glyphs)]
+    n_simple = n_glyphs - n_composites
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 700))
+    pen.lineTo((500, 700))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    simple_glyph = pen.glyph()
+
+    glyphs = {}
+    for i, name in enumerate(glyph_order):
+        if i < n_simple:
+            glyphs[name] = simple_glyph
+            continue
+        glyph = Glyph()
+        glyph.numberOfContours = -1
+        glyph.components = []
+        for base, x in ((i % n_simple, 0), ((i * 7) % n_simple, 300)):
+            component = GlyphComponent()
+            component.glyphName = glyph_order[base]
+            component.x, component.y = x, 0
+            component.flags = 0x4  # ROUND_XY_TO_GRID
+            glyph.components.append(component)
+        glyphs[name] = glyph
+
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (600, 0) for name in glyph_order})
+    fb.setupMaxp()
+    font = fb.font
+
+    tsi1 = font["TSI1"] = newTable("TSI1")
+    tsi1.extraPrograms = {
+        "fpgm": make_synthetic_fpgm(n_functions),
+        "ppgm": "",
+        "cvt": "",
+        "reserved": "",
+    }
+    tsi1.glyphPrograms = {}
+    tsi3 = font["TSI3"] = newTable("TSI3")
+    tsi3.extraPrograms = {}
+    tsi3.glyphPrograms = {}
+    glyph_ids = font.getReverseGlyphMap()
+    glyf = font["glyf"]
+    for name in glyph_order:
+        glyph = glyf[name]
+        if glyph.isComposite():
+            data = "".join(vttLib.write_composite_info(glyph, glyph_ids))
+        else:
+            data = SIMPLE_GLYPH_PROGRAM
+        vttLib.set_glyph_assembly(font, name, data)
+        vttLib.set_glyph_talk(font, name, "/* VTTTalk */")
+    return font
+
+
+def make_synthetic_tsic(n_cvts, n_masters, n_axes=2, seed=0):
+    """Return (tsic, cvts): data mimicking a 'TSIC' table with 'n_masters'
+    non-default masters, each overriding a random subset of the 'n_cvts' CVTs,
+    and the default CVT values.
+    """
+    rng = random.Random(seed)
+    axes = ["ax%02d" % i for i in range(n_axes)]
+    steps = [-1.0, -0.5, 0.5, 1.0]
+    locations = set()
+    while len(locations) < n_masters:
+        loc = tuple(rng.choice(steps + [0.0]) for _ in axes)
+        if any(loc):
+            locations.add(loc)
+    cvts = [rng.randint(-1000, 1000) for _ in range(n_cvts)]
+    records = []
+    for _ in locations:
+        indices = sorted(rng.sample(range(n_cvts), n_cvts // 2))
+        values = [cvts[i] + rng.randint(-50, 50) for i in indices]
+        records.append(SimpleNamespace(CVTArray=indices, CVTValueArray=values))
+    tsic = SimpleNamespace(
+        AxisArray=axes,
+        RecordLocations=[SimpleNamespace(Axis=list(loc)) for loc in sorted(locations)],
+        Record=records,
+    )
+    return tsic, cvts
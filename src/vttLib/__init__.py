@@ -1,12 +1,17 @@
 import array
+import contextlib
 import io
+import itertools
 import logging
 import os
 import re
+import time
 from collections import OrderedDict, defaultdict, deque, namedtuple
+from collections.abc import Mapping
+from typing import Dict
 
-import ufoLib2
 from fontTools.misc.fixedTools import otRound
+from fontTools.misc.textTools import binary2num
 from fontTools.misc.vector import Vector
 from fontTools.ttLib import TTFont, TTLibError, newTable
 from fontTools.ttLib.tables._g_l_y_f import (
@@ -15,12 +20,25 @@ from fontTools.ttLib.tables._g_l_y_f import (
     UNSCALED_COMPONENT_OFFSET,
     USE_MY_METRICS,
 )
-from fontTools.ttLib.tables.ttProgram import Program
-from fontTools.ttLib.tables.TupleVariation import TupleVariation
-from fontTools.varLib import models
+from fontTools.ttLib.tables.ttProgram import (
+    Program,
+    mnemonicDict,
+    streamMnemonicDict,
+    tt_instructions_error,
+)
 
+import vttLib.cache
+import vttLib.callgraph
+import vttLib.cvt
+import vttLib.lazy
+import vttLib.parser
+import vttLib.peephole
+import vttLib.profile
+import vttLib.sidecar
+import vttLib.subset
+import vttLib.tokenizer
 import vttLib.transfer
-from vttLib.parser import AssemblyParser, ParseException
+from vttLib.tokenizer import scan
 
 try:
     from ._version import version as __version__  # type: ignore
@@ -30,6 +48,13 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
+def __getattr__(name):
+    # the pyparsing grammar and its exception are only imported on first use
+    if name in ("AssemblyParser", "ParseException"):
+        return getattr(vttLib.parser, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 MAXP_ATTRS = {
     "maxZones",
     "maxTwilightPoints",
@@ -62,20 +87,15 @@ class VTTLibArgumentError(VTTLibError):
 
 
 def set_cvt_table(font, data):
-    data = re.sub(r"/\*.*?\*/", "", data, flags=re.DOTALL)
-    values = array.array("h")
-    # control values are defined in VTT Control Program as colon-separated
-    # INDEX: VALUE pairs
-    for m in re.finditer(r"^\s*([0-9]+)\s*:\s*(-?[0-9]+)", data, re.MULTILINE):
-        index, value = int(m.group(1)), int(m.group(2))
-        for _ in range(1 + index - len(values)):
-            # missing CV indexes default to zero
-            values.append(0)
-        values[index] = value
-    if len(values):
+    """Set the font's 'cvt ' table from the VTT control program 'data', if it
+    defines any control values, and return its ControlValueTable.
+    """
+    cvt = vttLib.cvt.parse_control_program(data)
+    if len(cvt):
         if "cvt " not in font:
             font["cvt "] = newTable("cvt ")
-        font["cvt "].values = values
+        font["cvt "].values = array.array("h", cvt.values)
+    return cvt
 
 
 OffsetComponent = namedtuple(
@@ -169,11 +189,31 @@ def merge_functions(functions, include=None):
     return result
 
 
-def tokenize(data, parseAll=True):
-    return AssemblyParser.parseString(data, parseAll=parseAll)
+def _pyparsing_tokenize(data, parseAll=True):
+    return vttLib.parser.get_parser().parseString(data, parseAll=parseAll)
+
+
+# the hand-written scanner is the default; the pyparsing grammar is kept as a
+# reference implementation to test the former against
+TOKENIZER_ENGINES = {"fast": scan, "pyparsing": _pyparsing_tokenize}
+
+
+def tokenize(data, parseAll=True, engine="fast"):
+    try:
+        tokenizer = TOKENIZER_ENGINES[engine]
+    except KeyError:
+        raise ValueError("Invalid tokenizer engine: %r" % engine)
+    return tokenizer(data, parseAll=parseAll)
 
 
 def transform(tokens, components=None):
+    return _concat_stream(_transform_stream(tokens, components))
+
+
+def _transform_stream(tokens, components=None):
+    """Return the fontTools assembly for 'tokens' as a list of rows, each
+    holding an instruction followed by its arguments, if any.
+    """
     push_on = True
     push_indexes = [0]
     stream = [deque()]
@@ -266,7 +306,8 @@ def transform(tokens, components=None):
                     # be replaced with the actual relative offset
                     args = [-999] * len(args)
                     if len(args) > 8:
-                        stream.append(["NPUSHW[]", len(args)] + args)
+                        # fontTools computes the count of NPUSHW items itself
+                        stream.append(["NPUSHW[]"] + args)
                     else:
                         stream.append(["PUSHW[]"] + args)
                 else:
@@ -355,13 +396,17 @@ def transform(tokens, components=None):
         pos += 1
 
     # calculate the relative offsets of each jump variables
+    if jump_variables:
+        # the first row holds the pending stack items of the outermost block,
+        # which are pushed before any label or jump instruction
+        offsets = _stream_offsets(stream, start=1)
     for variable in jump_variables.values():
         to_offset = jump_labels[variable.to_label]
         from_offset = variable.from_offset
         assert to_offset != from_offset
         start, end = sorted([from_offset, to_offset])
         sign = 1 if to_offset > from_offset else -1
-        size = _calc_stream_size(stream[start:end])
+        size = offsets[end] - offsets[start]
         variable.relative_offset = sign * size
 
     # replace variable push args with the computed relative offsets
@@ -375,7 +420,7 @@ def transform(tokens, components=None):
     if len(stack):
         stream[0] = ["PUSH[]"] + list(stack)
 
-    return _concat_stream(stream)
+    return stream
 
 
 def transform_assembly(data, name=None, components=None):
@@ -396,6 +441,22 @@ def transform_assembly(data, name=None, components=None):
         return transform(tokens, components=components)
 
 
+def transform_bytecode(data, name=None, components=None):
+    """Like transform_assembly, but return the TrueType bytecode, encoded
+    directly from the transformed stream without going through the textual
+    fontTools assembly.
+    """
+    data = data.strip()
+    if not data:
+        return b""
+
+    tokens = tokenize(data)
+
+    if name == "fpgm":
+        return _assemble_functions(_compile_functions(split_functions(tokens)))
+    return _assemble_stream(_transform_stream(tokens, components=components))
+
+
 def _concat_stream(stream):
     return "\n".join(" ".join(str(i) for i in item) for item in stream if item)
 
@@ -405,6 +466,156 @@ def _calc_stream_size(stream):
     return len(program.getBytecode())
 
 
+def _split_push(args):
+    """Yield the (number of words, number of bytes) of each pair of PUSHW and
+    PUSHB instructions that a 'PUSH[]' of 'args' is encoded as by the automatic
+    push optimization in fontTools' Program._assemble.
+    """
+    n_args = len(args)
+    offset = 0
+    n_words = 0
+    while n_args:
+        while (
+            n_words < n_args
+            and n_words < 255
+            and not (0 <= args[offset + n_words] <= 255)
+        ):
+            n_words += 1
+        n_bytes = 0
+        while (
+            n_words + n_bytes < n_args
+            and n_bytes < 255
+            and 0 <= args[offset + n_words + n_bytes] <= 255
+        ):
+            n_bytes += 1
+        if n_bytes < 2 and n_words + n_bytes < 255 and n_words + n_bytes != n_args:
+            # fontTools writes the bytes as words
+            n_words += n_bytes
+            continue
+        yield n_words, n_bytes
+        n_total = n_words + n_bytes
+        offset += n_total
+        n_args -= n_total
+        n_words = 0
+
+
+def _calc_push_size(args):
+    """Return the size in bytes of a 'PUSH[]' of 'args', as encoded by the
+    automatic push optimization in fontTools' Program._assemble.
+    """
+    size = 0
+    for n_words, n_bytes in _split_push(args):
+        if n_words:
+            size += (1 if n_words <= 8 else 2) + 2 * n_words
+        if n_bytes:
+            size += (1 if n_bytes <= 8 else 2) + n_bytes
+    return size
+
+
+def _calc_row_size(row):
+    if not row:
+        return 0
+    instruction = row[0]
+    n_args = len(row) - 1
+    if instruction == "PUSH[]":
+        return _calc_push_size(row[1:])
+    elif instruction in ("PUSHB[]", "PUSHW[]", "NPUSHB[]", "NPUSHW[]"):
+        # explicit pushes are written exactly as requested
+        size = 1 if instruction.startswith("PUSH") else 2
+        return size + n_args * (2 if instruction[-3] == "W" else 1)
+    elif not n_args:
+        return 1
+    return _calc_stream_size([row])
+
+
+def _stream_offsets(stream, start=0):
+    """Return the byte offsets at which each row of the stream begins, plus
+    the total size in bytes, counting from the 'start' row.
+
+    Rows are assembled independently by fontTools, so the size of any slice
+    stream[i:j] is offsets[j] - offsets[i].
+    """
+    offsets = [0] * (start + 1)
+    offset = 0
+    for row in itertools.islice(stream, start, None):
+        offset += _calc_row_size(row)
+        offsets.append(offset)
+    return offsets
+
+
+def _encode_push(mnemonic, args, bytecode):
+    # write a PUSHB, PUSHW, NPUSHB or NPUSHW instruction like fontTools does
+    n_args = len(args)
+    op = streamMnemonicDict[mnemonic][0]
+    if mnemonic[0] != "N":
+        assert n_args <= 8, n_args
+        bytecode.append(op + n_args - 1)
+    else:
+        assert n_args < 256
+        bytecode.append(op)
+        bytecode.append(n_args)
+    if mnemonic[-1] == "W":
+        for value in args:
+            assert -32768 <= value < 32768, "PUSHW value out of range %d" % value
+            bytecode.append((value >> 8) & 0xFF)
+            bytecode.append(value & 0xFF)
+    else:
+        for value in args:
+            assert 0 <= value < 256, "PUSHB value out of range %d" % value
+            bytecode.append(value)
+
+
+_opcodes: Dict[str, int] = {}
+
+
+def _instruction_opcode(instruction):
+    try:
+        return _opcodes[instruction]
+    except KeyError:
+        pass
+    mnemonic, _, arg = instruction.partition("[")
+    arg = arg.rstrip("]").strip()
+    op, arg_bits, _ = mnemonicDict[mnemonic]
+    if len(arg) != arg_bits:
+        raise tt_instructions_error(
+            "Incorrect number of argument bits (%s[%s])" % (mnemonic, arg)
+        )
+    if arg:
+        op += binary2num(arg)
+    _opcodes[instruction] = op
+    return op
+
+
+def _assemble_stream(stream):
+    """Return the bytecode for a stream of rows as returned by
+    _transform_stream, identical to what fontTools assembles from the
+    equivalent text.
+    """
+    bytecode = []
+    for row in stream:
+        if not row:
+            continue
+        instruction = row[0]
+        if instruction == "PUSH[]":
+            args = row[1:]
+            offset = 0
+            for n_words, n_bytes in _split_push(args):
+                if n_words:
+                    mnemonic = "PUSHW" if n_words <= 8 else "NPUSHW"
+                    _encode_push(mnemonic, args[offset : offset + n_words], bytecode)
+                    offset += n_words
+                if n_bytes:
+                    mnemonic = "PUSHB" if n_bytes <= 8 else "NPUSHB"
+                    _encode_push(mnemonic, args[offset : offset + n_bytes], bytecode)
+                    offset += n_bytes
+        elif instruction in ("PUSHB[]", "PUSHW[]", "NPUSHB[]", "NPUSHW[]"):
+            _encode_push(instruction[:-2], row[1:], bytecode)
+        else:
+            assert len(row) == 1, "Unexpected arguments: %s" % row
+            bytecode.append(_instruction_opcode(instruction))
+    return bytes(bytecode)
+
+
 def make_ft_program(assembly):
     program = Program()
     program.fromAssembly(assembly)
@@ -461,12 +672,28 @@ def log_program_error(name, error):
     )
 
 
-def make_program(vtt_assembly, name=None, components=None):
+# the direct bytecode emitter is the default; going through the textual
+# fontTools assembly is kept as a reference implementation to test it against
+PROGRAM_BACKENDS = ("bytecode", "assembly")
+
+
+def make_program(vtt_assembly, name=None, components=None, backend="bytecode"):
+    if backend not in PROGRAM_BACKENDS:
+        raise ValueError("Invalid program backend: %r" % backend)
     try:
-        ft_assembly = transform_assembly(vtt_assembly, name=name, components=components)
-    except ParseException as e:
+        if backend == "bytecode":
+            bytecode = transform_bytecode(
+                vtt_assembly, name=name, components=components
+            )
+        else:
+            ft_assembly = transform_assembly(
+                vtt_assembly, name=name, components=components
+            )
+    except vttLib.parser.ParseException as e:
         log_program_error(name, e)
         raise VTTLibError(e)
+    if backend == "bytecode":
+        return _program_from_bytecode(bytecode)
     return make_ft_program(ft_assembly)
 
 
@@ -476,6 +703,26 @@ def make_glyph_program(vtt_assembly, name=None):
     return program, components
 
 
+def _make_glyph_program_timed(vtt_assembly, name=None):
+    # like make_glyph_program, but also return the time spent tokenizing,
+    # transforming and assembling the program
+    timer = time.perf_counter
+    components = []
+    start = timer()
+    data = vtt_assembly.strip()
+    try:
+        tokens = tokenize(data) if data else []
+        tokenized = timer()
+        stream = _transform_stream(tokens, components=components) if data else []
+    except vttLib.parser.ParseException as e:
+        log_program_error(name, e)
+        raise VTTLibError(e)
+    transformed = timer()
+    program = _program_from_bytecode(_assemble_stream(stream))
+    timings = (tokenized - start, transformed - tokenized, timer() - transformed)
+    return program, components, timings
+
+
 def get_extra_assembly(font, name):
     if name not in ("cvt", "cvt ", "prep", "ppgm", "fpgm"):
         raise ValueError("Invalid name: %r" % name)
@@ -497,10 +744,11 @@ def get_vtt_program(font, name, is_talk=False, is_glyph=False):
     if tag not in font:
         raise VTTLibError("%s table not found" % tag)
     try:
+        table = vttLib.lazy.load_lazy_table(font, tag)
         if is_glyph:
-            data = font[tag].glyphPrograms[name]
+            data = table.glyphPrograms[name]
         else:
-            data = font[tag].extraPrograms[name]
+            data = table.extraPrograms[name]
     except KeyError:
         raise KeyError(
             "%s program missing from %s: '%s'"
@@ -529,11 +777,25 @@ def set_vtt_program(font, name, data, is_talk=False, is_glyph=False):
     tag = "TSI3" if is_talk else "TSI1"
     if tag not in font:
         raise VTTLibError("%s table not found" % tag)
-    data = "\r".join(data.splitlines()).rstrip() + "\r"
+    data = _format_vtt_program(data)
+    table = vttLib.lazy.load_lazy_table(font, tag)
     if is_glyph:
-        font[tag].glyphPrograms[name] = data
+        table.glyphPrograms[name] = data
     else:
-        font[tag].extraPrograms[name] = data
+        table.extraPrograms[name] = data
+
+
+def _format_vtt_program(data, newline="\r"):
+    # VTT programs are stored with '\r' line endings and a trailing newline
+    return newline.join(data.splitlines()).rstrip() + newline
+
+
+def _glyph_index(glyph_order, glyph_name):
+    # 'glyph_order' is preferably a {glyph name: index} mapping such as the
+    # font's reverse glyph map; lists of glyph names are also accepted
+    if isinstance(glyph_order, Mapping):
+        return glyph_order[glyph_name]
+    return glyph_order.index(glyph_name)
 
 
 def check_composite_info(name, glyph, vtt_components, glyph_order, check_flags=False):
@@ -547,7 +809,7 @@ def check_composite_info(name, glyph, vtt_components, glyph_order, check_flags=F
     for i, comp in enumerate(glyph.components):
         vttcomp = vtt_components[i]
         base_name = comp.glyphName
-        index = glyph_order.index(base_name)
+        index = _glyph_index(glyph_order, base_name)
         if vttcomp.index != index:
             raise VTTLibInvalidComposite(
                 "Component %d in '%s' has incorrect index: "
@@ -630,6 +892,67 @@ composite_info_RE = re.compile(
 )
 
 
+# the component flag instructions, and the start of the component instructions
+# which the tokenizer scans, skipping those in comments
+_COMPONENT_SCAN_RE = re.compile(
+    r"/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+    r"|(?<![A-Za-z0-9#])(USEMYMETRICS|(?:UN)?SCALEDCOMPONENTOFFSET)"
+    r"[ \t\r\n]*\[[ \t\r\n]*\]"
+    r"|(?<![A-Za-z0-9#])(?=(ANCHOR|OFFSET)[ \t\r\n]*\[)"
+)
+
+
+def scan_components(data):
+    """Return the list of OffsetComponent and AnchorComponent in the VTT
+    assembly, like transform_assembly collects them, without transforming
+    the rest of the program (which isn't checked for errors).
+
+    Raise VTTLibInvalidComposite if a component instruction can't be parsed
+    or doesn't have three stack items, which transform_assembly rejects too.
+    """
+    components = []
+    if "OFFSET" not in data and "ANCHOR" not in data:
+        return components
+    use_my_metrics = False
+    scaled_offset = None
+    pos = 0
+    while True:
+        m = _COMPONENT_SCAN_RE.search(data, pos)
+        if m is None:
+            break
+        pos = m.end()
+        flag_mnemonic, mnemonic = m.groups()
+        if flag_mnemonic is not None:
+            if flag_mnemonic == "USEMYMETRICS":
+                use_my_metrics = True
+            else:
+                scaled_offset = flag_mnemonic == "SCALEDCOMPONENTOFFSET"
+            continue
+        if mnemonic is None:
+            # a comment
+            continue
+        token, pos = vttLib.tokenizer.scan_statement(data, m.start())
+        if token is None or len(token.stack_items) != 3:
+            statement = data[m.start() :].split("\n", 1)[0]
+            raise VTTLibInvalidComposite(
+                "Invalid component instruction '%s': expected 3 stack items."
+                % statement
+            )
+        index, a, b = token.stack_items
+        if mnemonic == "OFFSET":
+            # as in _transform_stream, only a single rounding flag rounds
+            round_to_grid = token.flags == "1"
+            component = OffsetComponent(
+                index, a, b, round_to_grid, use_my_metrics, scaled_offset
+            )
+        else:
+            component = AnchorComponent(index, a, b, use_my_metrics, scaled_offset)
+        components.append(component)
+        use_my_metrics = False
+        scaled_offset = None
+    return components
+
+
 def set_components_flags(glyph, components, vtt_version=6):
     assert len(components) == len(glyph.components)
     for i, comp in enumerate(glyph.components):
@@ -652,7 +975,20 @@ def set_components_flags(glyph, components, vtt_version=6):
             comp.flags &= ~SCALED_COMPONENT_OFFSET
 
 
-def write_composite_info(glyph, glyph_order, data="", vtt_version=6):
+def _composite_records(glyph, glyph_order):
+    # the component data written by write_composite_info, as a list of
+    # [glyph index, flags, is anchor, x or first point, y or second point]
+    records = []
+    for comp in glyph.components:
+        index = _glyph_index(glyph_order, comp.glyphName)
+        if hasattr(comp, "firstPt"):
+            records.append([index, comp.flags, True, comp.firstPt, comp.secondPt])
+        else:
+            records.append([index, comp.flags, False, comp.x, comp.y])
+    return records
+
+
+def _write_composite_records(records, data, vtt_version):
     head = ""
     last = 0
     for m in composite_info_RE.finditer(data):
@@ -663,62 +999,692 @@ def write_composite_info(glyph, glyph_order, data="", vtt_version=6):
     if last < len(data):
         tail += data[last:]
     instructions = []
-    for comp in glyph.components:
-        if comp.flags & USE_MY_METRICS:
+    for index, flags, is_anchor, a, b in records:
+        if flags & USE_MY_METRICS:
             instructions.append("USEMYMETRICS[]\n")
         if vtt_version >= 6:
-            if comp.flags & SCALED_COMPONENT_OFFSET:
+            if flags & SCALED_COMPONENT_OFFSET:
                 instructions.append("SCALEDCOMPONENTOFFSET[]\n")
-            if comp.flags & UNSCALED_COMPONENT_OFFSET:
+            if flags & UNSCALED_COMPONENT_OFFSET:
                 instructions.append("UNSCALEDCOMPONENTOFFSET[]\n")
-        index = glyph_order.index(comp.glyphName)
-        if hasattr(comp, "firstPt"):
-            instructions.append(
-                "ANCHOR[], %d, %d, %d\n" % (index, comp.firstPt, comp.secondPt)
-            )
+        if is_anchor:
+            instructions.append("ANCHOR[], %d, %d, %d\n" % (index, a, b))
         else:
-            flag = "R" if comp.flags & ROUND_XY_TO_GRID else "r"
-            instructions.append(
-                "OFFSET[%s], %d, %d, %d\n" % (flag, index, comp.x, comp.y)
-            )
+            flag = "R" if flags & ROUND_XY_TO_GRID else "r"
+            instructions.append("OFFSET[%s], %d, %d, %d\n" % (flag, index, a, b))
     return head, "".join(instructions), tail
 
 
-def update_composites(font, glyphs=None, vtt_version=6):
-    glyph_order = font.getGlyphOrder()
+def write_composite_info(glyph, glyph_order, data="", vtt_version=6):
+    records = _composite_records(glyph, glyph_order)
+    return _write_composite_records(records, data, vtt_version)
+
+
+def composite_state(font):
+    """Return a JSON-serializable mapping of the composite glyphs of the font
+    to the component data which update_composites writes in their VTT
+    assembly, to be compared with a later state by changed_composites.
+
+    The components refer to their base glyphs by index, so that composites
+    whose base glyphs were moved in the glyph order are seen as changed.
+    """
+    glyph_ids = font.getReverseGlyphMap()
+    glyf_table = font["glyf"]
+    state = {}
+    for glyph_name in font.getGlyphOrder():
+        glyph = glyf_table[glyph_name]
+        if glyph.isComposite():
+            state[glyph_name] = _composite_records(glyph, glyph_ids)
+    return state
+
+
+def changed_composites(font, previous_state):
+    """Return the set of the glyphs whose VTT composite information must be
+    updated since the 'previous_state' of the font (see composite_state):
+    the new or changed composite glyphs, and the former composite glyphs.
+    """
+    state = composite_state(font)
+    changed = {
+        glyph_name
+        for glyph_name, records in state.items()
+        if previous_state.get(glyph_name) != records
+    }
+    glyph_ids = font.getReverseGlyphMap()
+    changed.update(
+        glyph_name
+        for glyph_name in previous_state
+        if glyph_name not in state and glyph_name in glyph_ids
+    )
+    return changed
+
+
+CompositesReport = namedtuple("CompositesReport", ["rewritten", "dropped"])
+
+
+def _update_composite_chunk(items, vtt_version=6):
+    # runs in a worker process too: return the new assembly of each glyph
+    # whose program must be rewritten, or None if it's unchanged
+    result = []
+    for glyph_name, data, records in items:
+        if records is None:
+            # not a composite glyph; drop the assembly if it has components
+            result.append("" if scan_components(data or "") else None)
+            continue
+        new_data = "".join(_write_composite_records(records, data or "", vtt_version))
+        if data is None or _format_vtt_program(new_data) != _format_vtt_program(data):
+            result.append(new_data)
+        else:
+            result.append(None)
+    return result
+
+
+def update_composites(font, glyphs=None, vtt_version=6, jobs=1):
+    """Write the component information of the composite glyphs in their VTT
+    assembly, and drop the assembly of simple glyphs which has some.
+
+    Only the given 'glyphs' are updated (by default, all of them), e.g. the
+    set returned by changed_composites. If 'jobs' is not 1, the glyphs are
+    processed by a pool of as many worker processes (0 or None means all the
+    available CPUs).
+
+    Return a CompositesReport with the lists of the glyphs whose assembly was
+    rewritten and of those whose assembly was dropped; programs which are
+    already up to date are left untouched.
+    """
+    glyph_ids = font.getReverseGlyphMap()
     if glyphs is None:
-        glyphs = glyph_order
+        glyphs = font.getGlyphOrder()
+    else:
+        # in glyph order, whatever the order (or lack of) of 'glyphs'
+        glyphs = sorted(glyphs, key=glyph_ids.__getitem__)
     glyf_table = font["glyf"]
+    items = []
     for glyph_name in glyphs:
         glyph = glyf_table[glyph_name]
-        vtt_components = []
         try:
             data = get_glyph_assembly(font, glyph_name)
         except KeyError:
             # the glyph is not in the TSI1 table; create a new one
-            data = ""
+            data = None
+        if glyph.isComposite():
+            items.append((glyph_name, data, _composite_records(glyph, glyph_ids)))
+        elif data:
+            items.append((glyph_name, data, None))
+
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(items) < 2:
+        results = _update_composite_chunk(items, vtt_version)
+    else:
+        from functools import partial
+
+        func = partial(_update_composite_chunk, vtt_version=vtt_version)
+        results = [
+            new_data for chunk in _map_chunks(func, items, jobs) for new_data in chunk
+        ]
+
+    report = CompositesReport([], [])
+    for (glyph_name, _, records), new_data in zip(items, results):
+        if new_data is None:
+            continue
+        if records is None:
+            log.warning(
+                "Glyph '%s' contains components in VTT assembly but not "
+                "in glyf table; drop assembly" % glyph_name
+            )
+            report.dropped.append(glyph_name)
         else:
-            # found glyph in TSI1 table; check it contains any VTT components;
-            # 'vtt_components' list is updated in place; we don't care about
-            # the return value (i.e. transformed FontTools assembly) here
-            try:
-                transform_assembly(data, components=vtt_components)
-            except ParseException as e:
-                log_program_error(glyph_name, e)
-                raise VTTLibError(e)
-        if not glyph.isComposite():
-            if vtt_components:
-                log.warning(
-                    "Glyph '%s' contains components in VTT assembly but not"
-                    "in glyf table; drop assembly" % glyph_name
+            report.rewritten.append(glyph_name)
+        set_glyph_assembly(font, glyph_name, new_data)
+    return report
+
+
+def _compile_glyph_chunk(glyph_assemblies, timed=False):
+    # runs in a worker process: return bytecode rather than Program objects to
+    # keep the pickled results small
+    result = []
+    for glyph_name, data in glyph_assemblies:
+        if timed:
+            program, components, timings = _make_glyph_program_timed(data, glyph_name)
+        else:
+            program, components = make_glyph_program(data, glyph_name)
+            timings = None
+        result.append((glyph_name, program.getBytecode(), components, timings))
+    return result
+
+
+_GLYPH_STAGES = ("glyphs.tokenize", "glyphs.transform", "glyphs.assemble")
+
+
+def _record_glyph_timings(profile, glyph_name, timings):
+    for stage, seconds in zip(_GLYPH_STAGES, timings):
+        profile.add_stage(stage, seconds)
+    profile.add_glyph(glyph_name, sum(timings))
+
+
+def _program_from_bytecode(bytecode):
+    program = Program()
+    program.fromBytecode(bytecode)
+    return program
+
+
+def _make_cached_program(vtt_assembly, name, cache=None):
+    if cache is None:
+        return make_program(vtt_assembly, name)
+    key = cache.key(vtt_assembly, name)
+    entry = cache.get(key)
+    if entry is not None:
+        return _program_from_bytecode(entry[0])
+    program = make_program(vtt_assembly, name)
+    cache.set(key, program.getBytecode(), [])
+    return program
+
+
+def _make_glyph_programs(glyph_assemblies, jobs=1, cache=None, profile=None):
+    """Yield (glyph name, program, components) for each (name, assembly) pair,
+    in the same order as the input.
+
+    If 'cache' is a CompileCache, previously compiled programs are taken from
+    it and only the remaining ones are compiled (and then stored).
+    """
+    if cache is None:
+        yield from _compile_glyph_programs(glyph_assemblies, jobs, profile)
+        return
+
+    results = {}
+    keys = {}
+    misses = []
+    for glyph_name, data in glyph_assemblies:
+        key = cache.key(data)
+        entry = cache.get(key)
+        if entry is None:
+            keys[glyph_name] = key
+            misses.append((glyph_name, data))
+        else:
+            bytecode, components = entry
+            results[glyph_name] = _program_from_bytecode(bytecode), components
+    for glyph_name, program, components in _compile_glyph_programs(
+        misses, jobs, profile
+    ):
+        cache.set(keys[glyph_name], program.getBytecode(), components)
+        results[glyph_name] = program, components
+
+    for glyph_name, _ in glyph_assemblies:
+        program, components = results[glyph_name]
+        yield glyph_name, program, components
+
+
+def _compile_glyph_programs(glyph_assemblies, jobs=1, profile=None):
+    """Yield (glyph name, program, components) for each (name, assembly) pair,
+    in the same order as the input.
+
+    If 'jobs' is greater than 1, the glyph programs are compiled in chunks by a
+    pool of as many worker processes; a value of 0 or None means using all the
+    available CPUs.
+
+    If 'profile' is a CompileProfile, the compile time of each program is
+    recorded in it.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(glyph_assemblies) < 2:
+        for glyph_name, data in glyph_assemblies:
+            if profile is None:
+                program, components = make_glyph_program(data, glyph_name)
+            else:
+                program, components, timings = _make_glyph_program_timed(
+                    data, glyph_name
                 )
-                set_glyph_assembly(font, glyph_name, "")
+                _record_glyph_timings(profile, glyph_name, timings)
+            yield glyph_name, program, components
+        return
+
+    from functools import partial
+
+    worker = partial(_compile_glyph_chunk, timed=profile is not None)
+    for result in _map_chunks(worker, glyph_assemblies, jobs):
+        for glyph_name, bytecode, components, timings in result:
+            if timings is not None:
+                _record_glyph_timings(profile, glyph_name, timings)
+            yield glyph_name, _program_from_bytecode(bytecode), components
+
+
+def _map_chunks(func, items, jobs):
+    """Split the 'items' list in chunks and yield the result of calling 'func'
+    with each of them, in order, using a pool of 'jobs' worker processes.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    # a few chunks per worker to balance the load between them
+    chunk_size = max(1, -(-len(items) // (jobs * 4)))
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(func, chunks)
+
+
+def _function_key(tokens):
+    # a representation of the tokens of a function which doesn't depend on the
+    # tokenizer engine, to key the compile cache
+    return repr(
+        [
+            (
+                t.mnemonic,
+                t.flags,
+                list(t.stack_items),
+                [list(d) for d in t.deltas],
+                list(t.assignment) if t.assignment else None,
+            )
+            for t in tokens
+        ]
+    )
+
+
+def _compile_function(tokens):
+    """Return an (is_fdef, number, bytecode) tuple for the tokens of a single
+    FDEF or IDEF as returned by split_functions.
+
+    The bytecode runs from the FDEF or IDEF instruction to ENDF; the function
+    number is pushed separately, with all the others, by _assemble_functions.
+    """
+    # functions are transformed individually, since different functions may
+    # refer to jump variables with the same name, however the relative jumps
+    # must occur within the same functions (I think...)
+    stack = []
+    rows = iter(_transform_stream(tokens))
+    for row in rows:
+        if not row:
             continue
-        new_data = "".join(write_composite_info(glyph, glyph_order, data, vtt_version))
-        set_glyph_assembly(font, glyph_name, new_data)
+        instruction = row[0]
+        if instruction.startswith(("PUSH", "NPUSH")):
+            stack.extend(row[1:])
+            continue
+        if instruction.startswith(("FDEF", "IDEF")):
+            number = stack.pop()
+            body = [row]
+            for row in rows:
+                if not row:
+                    continue
+                body.append(row)
+                if row[0].startswith("ENDF"):
+                    break
+            return instruction.startswith("FDEF"), number, _assemble_stream(body)
+        assert 0, "Unexpected token in fpgm: %s" % instruction
+    assert 0, "Missing FDEF or IDEF in fpgm function"
+
+
+def _compile_function_chunk(functions):
+    return [_compile_function(tokens) for tokens in functions]
+
+
+def _compile_functions(functions, jobs=1, cache=None):
+    """Return a list of (is_fdef, number, bytecode) tuples for the tokens of
+    each function in 'functions' (see _compile_function).
+
+    If 'jobs' is greater than 1, the functions are compiled by a pool of as
+    many worker processes; a value of 0 or None means using all the available
+    CPUs. If 'cache' is a CompileCache, previously compiled functions are taken
+    from it, and the others are stored.
+    """
+    results = [None] * len(functions)
+    keys = {}
+    misses = []
+    for i, tokens in enumerate(functions):
+        if cache is not None:
+            keys[i] = cache.key(_function_key(tokens), "fpgm function")
+            results[i] = cache.get_function(keys[i])
+        if results[i] is None:
+            misses.append(i)
+
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(misses) < 2:
+        compiled = [_compile_function(functions[i]) for i in misses]
+    else:
+        compiled = itertools.chain.from_iterable(
+            _map_chunks(_compile_function_chunk, [functions[i] for i in misses], jobs)
+        )
+    for i, result in zip(misses, compiled):
+        results[i] = result
+        if cache is not None:
+            cache.set_function(keys[i], *result)
+    return results
 
 
-def compile_instructions(font, ship=True, keep_cvar=False):
+def _assemble_functions(functions, include=None):
+    """Return the bytecode of a font program defining the compiled functions,
+    ordered by number like merge_functions does.
+
+    If 'include' is not None, only the FDEFs with a number in it are kept.
+    """
+    funcs = {}
+    idefs = {}
+    for is_fdef, number, bytecode in functions:
+        if is_fdef:
+            if include is None or number in include:
+                funcs[number] = bytecode
+        else:
+            idefs[number] = bytecode
+    result = [_assemble_stream([["PUSH[]"] + sorted(funcs, reverse=True)])]
+    result.extend(funcs[number] for number in sorted(funcs))
+    result.append(_assemble_stream([["PUSH[]"] + sorted(idefs, reverse=True)]))
+    result.extend(idefs[number] for number in sorted(idefs))
+    return b"".join(result)
+
+
+def _make_font_program(vtt_assembly, jobs=1, cache=None, include=None):
+    """Compile the 'fpgm' VTT assembly one function at a time, optionally in
+    parallel and reusing the functions found in the cache.
+
+    If 'include' is not None, only the FDEFs with a number in it are kept.
+    """
+    if include is not None:
+        include = frozenset(include)
+    if cache is not None:
+        name = "fpgm" if include is None else "fpgm %s" % sorted(include)
+        key = cache.key(vtt_assembly, name)
+        entry = cache.get(key)
+        if entry is not None:
+            return _program_from_bytecode(entry[0])
+    data = vtt_assembly.strip()
+    try:
+        functions = split_functions(tokenize(data)) if data else []
+    except vttLib.parser.ParseException as e:
+        log_program_error("fpgm", e)
+        raise VTTLibError(e)
+    bytecode = _assemble_functions(_compile_functions(functions, jobs, cache), include)
+    if cache is not None:
+        cache.set(key, bytecode, [])
+    return _program_from_bytecode(bytecode)
+
+
+def make_cvar_variations(tsic, cvts, use_numpy=None):
+    """Return the list of 'cvar' TupleVariations for the CVT values 'cvts' and
+    the master CVT values defined in the 'TSIC' table data 'tsic'.
+
+    The deltas are computed with NumPy if it is installed, or in pure Python
+    otherwise; 'use_numpy' can be set to True or False to force either. Both
+    produce the same results.
+    """
+    if use_numpy is None or use_numpy:
+        try:
+            import numpy
+        except ImportError:
+            if use_numpy:
+                raise
+            numpy = None
+    else:
+        numpy = None
+
+    from fontTools.ttLib.tables.TupleVariation import TupleVariation
+    from fontTools.varLib import models
+
+    # Compute variations
+    locs = [{axis_tag: 0.0 for axis_tag in tsic.AxisArray}]  # default instance
+    locs += [
+        {axis_tag: val for axis_tag, val in zip(tsic.AxisArray, loc.Axis)}
+        for loc in tsic.RecordLocations
+    ]
+    model = models.VariationModel(locs)
+    if numpy is not None:
+        compute_deltas = _compute_cvt_deltas_numpy
+    else:
+        compute_deltas = _compute_cvt_deltas
+    variations = []
+    for delta, support in zip(compute_deltas(model, tsic, cvts), model.supports[1:]):
+        if delta is None:
+            continue
+        var = TupleVariation(support, delta)
+        variations.append(var)
+    return variations
+
+
+def _compute_cvt_deltas(model, tsic, cvts):
+    """Yield the list of CVT deltas of each non-default master, in the order
+    of the model's supports, with None for the CVTs not specified in the TSIC
+    record; or yield None if none of the CVTs vary at that master.
+    """
+    n_cvts = len(cvts)
+    # Gather the full set of cvts (not just those in TSIC) for all locations
+    cvt_sets = [Vector(cvts)]
+    for record in tsic.Record:
+        cvt_set = list(cvts)
+        for i, v in zip(record.CVTArray, record.CVTValueArray):
+            if i < n_cvts:
+                cvt_set[i] = v
+        cvt_sets.append(Vector(cvt_set))
+
+    deltas = model.getDeltas(cvt_sets)
+    for i, delta in enumerate(deltas[1:]):
+        delta = [otRound(d) for d in delta]
+        if not any(delta):
+            yield None
+            continue
+        # Remove any deltas that weren't specified in TSIC at this location
+        # TODO: Just replace optimizaton with getting rid of 0 deltas?
+        tsic_rec_index = model.reverseMapping[i + 1] - 1  # Map back to TSIC records
+        cvt_indices = set(tsic.Record[tsic_rec_index].CVTArray)
+        yield [d if j in cvt_indices and d != 0 else None for j, d in enumerate(delta)]
+
+
+def _compute_cvt_deltas_numpy(model, tsic, cvts):
+    import numpy
+
+    n_cvts = len(cvts)
+    masters = numpy.empty((len(tsic.Record) + 1, n_cvts), dtype=numpy.float64)
+    masters[:] = numpy.asarray(cvts, dtype=numpy.float64)
+    defined = numpy.zeros((len(tsic.Record) + 1, n_cvts), dtype=bool)
+    for row, record in enumerate(tsic.Record, start=1):
+        indices = numpy.asarray(record.CVTArray, dtype=numpy.intp)
+        values = numpy.asarray(record.CVTValueArray, dtype=numpy.float64)
+        in_range = indices < n_cvts
+        indices = indices[in_range]
+        masters[row, indices] = values[in_range]
+        defined[row, indices] = True
+
+    # the model subtracts deltas in place, on the rows of 'masters'
+    deltas = model.getDeltas(list(masters))
+    for i, delta in enumerate(deltas[1:]):
+        # same as otRound
+        delta = numpy.floor(delta + 0.5).astype(numpy.int64)
+        if not delta.any():
+            yield None
+            continue
+        tsic_rec_index = model.reverseMapping[i + 1] - 1  # Map back to TSIC records
+        keep = defined[tsic_rec_index + 1] & (delta != 0)
+        yield [d if k else None for d, k in zip(delta.tolist(), keep.tolist())]
+
+
+def make_compile_manifest(font, strip_unused_functions=False, optimize=False):
+    """Return a JSON-serializable mapping of hashes identifying the compiled
+    result of each VTT program in the font, to be used as a reference for
+    incremental compilation.
+
+    The hashes depend on the VTT assembly and the vttLib and fontTools
+    versions; missing programs have a None hash. The compile_instructions
+    options the font is compiled with are recorded under 'options', so that
+    programs are only reused by a compilation with matching options. None means
+    unknown: the reference's 'fpgm' is then checked for missing functions, and
+    its glyph programs are assumed to be optimized like the compiled font's.
+    """
+    manifest = {
+        "glyphs": {},
+        "options": {
+            "strip_unused_functions": strip_unused_functions,
+            "optimize": optimize,
+        },
+    }
+    for tag in ("cvt", "prep", "fpgm"):
+        try:
+            data = get_extra_assembly(font, tag)
+        except KeyError:
+            manifest[tag] = None
+        else:
+            manifest[tag] = vttLib.cache.program_key(data, tag)
+    glyph_programs = vttLib.lazy.load_lazy_table(font, "TSI1").glyphPrograms
+    for glyph_name in font.getGlyphOrder():
+        if glyph_name in glyph_programs:
+            data = get_glyph_assembly(font, glyph_name)
+            manifest["glyphs"][glyph_name] = vttLib.cache.program_key(data)
+    return manifest
+
+
+# component flags which compile_instructions() sets from the VTT assembly
+_VTT_COMPONENT_FLAGS = (
+    USE_MY_METRICS
+    | ROUND_XY_TO_GRID
+    | SCALED_COMPONENT_OFFSET
+    | UNSCALED_COMPONENT_OFFSET
+)
+
+
+def _component_structure(glyph, glyph_ids):
+    structure = []
+    for comp in glyph.components:
+        structure.append(
+            (
+                glyph_ids.get(comp.glyphName),
+                getattr(comp, "x", None),
+                getattr(comp, "y", None),
+                getattr(comp, "firstPt", None),
+                getattr(comp, "secondPt", None),
+                getattr(comp, "transform", None),
+                comp.flags & ~_VTT_COMPONENT_FLAGS,
+            )
+        )
+    return structure
+
+
+class _ReferenceFont(object):
+    """Copy compiled programs from a reference font whose VTT sources are
+    unchanged, for incremental compilation.
+    """
+
+    def __init__(self, font, reference, manifest=None, optimize=False):
+        if manifest is None:
+            if "TSI1" not in reference:
+                raise VTTLibError(
+                    "The reference font contains no 'TSI1' table; either pass "
+                    "its manifest or compile it without shipping"
+                )
+            # the options the reference was compiled with aren't recorded in
+            # its tables
+            manifest = make_compile_manifest(
+                reference, strip_unused_functions=None, optimize=None
+            )
+        self.font = font
+        self.reference = reference
+        self.manifest = manifest
+        # manifests made by older versions have no options
+        self.options = manifest.get("options", {})
+        self.optimize = optimize
+        # whether the glyph programs were optimized can't be told from them, so
+        # if unknown the reference is assumed to be compiled like this font
+        self.optimized = self.options.get("optimize")
+        if self.optimized is None:
+            self.optimized = optimize
+        self.glyph_ids = font.getReverseGlyphMap()
+        self.reference_glyph_ids = reference.getReverseGlyphMap()
+        self.reused = 0
+
+    def copy_program(self, tag, data):
+        """Copy the 'fpgm' or 'prep' program from the reference font if its
+        source is unchanged and return True, or return False.
+        """
+        if tag not in self.reference or (
+            self.manifest.get(tag) != vttLib.cache.program_key(data, tag)
+        ):
+            return False
+        program = self.reference[tag].program
+        if tag == "fpgm" and self._is_stripped(data, program):
+            # the unused functions are missing from the reference's 'fpgm'
+            return False
+        self.font[tag].program = _program_from_bytecode(program.getBytecode())
+        return True
+
+    def _is_stripped(self, data, program):
+        stripped = self.options.get("strip_unused_functions")
+        if stripped is None:
+            data = data.strip()
+            defined = sum(
+                1
+                for tokens in (split_functions(tokenize(data)) if data else [])
+                if tokens[0].mnemonic.startswith("FDEF")
+            )
+            compiled = sum(1 for line in program.getAssembly() if line == "FDEF[ ]")
+            stripped = compiled < defined
+        return stripped
+
+    def copy_glyph_program(self, glyph_name, data):
+        """Copy the compiled program and component flags of a glyph from the
+        reference font if its source and component structure are unchanged
+        and return True, or return False.
+        """
+        if self.optimized and not self.optimize:
+            return False
+        if self.manifest["glyphs"].get(glyph_name) != vttLib.cache.program_key(data):
+            return False
+        reference_glyf = self.reference["glyf"]
+        if glyph_name not in reference_glyf:
+            return False
+        glyph = self.font["glyf"][glyph_name]
+        reference_glyph = reference_glyf[glyph_name]
+        if glyph.isComposite() != reference_glyph.isComposite():
+            return False
+        if glyph.isComposite():
+            # the component indices in the VTT assembly must still match the
+            # glyph order, so that shifted base glyphs are checked again
+            if _component_structure(glyph, self.glyph_ids) != _component_structure(
+                reference_glyph, self.reference_glyph_ids
+            ):
+                return False
+            for comp, reference_comp in zip(
+                glyph.components, reference_glyph.components
+            ):
+                comp.flags = (comp.flags & ~_VTT_COMPONENT_FLAGS) | (
+                    reference_comp.flags & _VTT_COMPONENT_FLAGS
+                )
+        program = getattr(reference_glyph, "program", None)
+        if program:
+            glyph.program = _program_from_bytecode(program.getBytecode())
+        self.reused += 1
+        return True
+
+
+def compile_instructions(
+    font,
+    ship=True,
+    keep_cvar=False,
+    jobs=1,
+    cache=None,
+    reference=None,
+    reference_manifest=None,
+    profile=None,
+    strip_unused_functions=False,
+    optimize=False,
+):
+    """Compile the VTT sources in the font's TSI* tables to TrueType 'fpgm',
+    'prep', 'cvt ', 'cvar' and glyph programs.
+
+    If a 'reference' font compiled from an earlier version of the same VTT
+    sources is given, the programs whose sources did not change are copied
+    from it instead of being compiled again. Its manifest (see
+    make_compile_manifest) is computed from its TSI1 table, unless it is passed
+    as 'reference_manifest'; a computed manifest assumes the reference was
+    compiled with the same 'optimize' option.
+
+    If 'profile' is a vttLib.profile.CompileProfile, the time spent in each
+    stage of the compilation and in compiling each glyph program is recorded in
+    it.
+
+    If 'strip_unused_functions' is True, the functions that are never called
+    from the 'prep' or any glyph program (see vttLib.callgraph) are left out of
+    the 'fpgm', and 'maxp.maxFunctionDefs' is reduced accordingly. Return the
+    vttLib.callgraph.FunctionUsage the decision was based on.
+
+    If 'optimize' is True, the compiled glyph programs are made smaller with the
+    safe rewrites of vttLib.peephole.optimize_glyph_programs; the bytes saved
+    are logged for each glyph.
+    """
     if "glyf" not in font:
         raise VTTLibError("Missing 'glyf' table; not a TrueType font")
     if "TSI1" not in font:
@@ -727,85 +1693,170 @@ def compile_instructions(font, ship=True, keep_cvar=False):
         raise VTTLibError(
             "The keep_cvar parameter is set, but the cvar table is missing from the font"
         )
+    if reference is not None:
+        reference = _ReferenceFont(font, reference, reference_manifest, optimize)
+    if profile is not None:
+        stage = profile.stage
+    else:
 
-    control_program = get_extra_assembly(font, "cvt")
-    set_cvt_table(font, control_program)
-    if "TSIC" in font and not keep_cvar:
-        # Compile TSIC
-        tsic = font["TSIC"].table
-        cvts = font["cvt "].values
-        # Gather the full set of cvts (not just those in TSIC) for all locations
-        cvt_sets = [Vector(cvts)]
-        for record in tsic.Record:
-            cvt_local = {i: v for i, v in zip(record.CVTArray, record.CVTValueArray)}
-            cvt_set = [
-                cvt_local[i] if i in cvt_local else cvt for i, cvt in enumerate(cvts)
-            ]
-            cvt_sets.append(Vector(cvt_set))
-
-        # Compute variations
-        locs = [{axis_tag: 0.0 for axis_tag in tsic.AxisArray}]  # default instance
-        locs += [
-            {axis_tag: val for axis_tag, val in zip(tsic.AxisArray, loc.Axis)}
-            for loc in tsic.RecordLocations
-        ]
-        model = models.VariationModel(locs)
-        variations = []
-        deltas, supports = model.getDeltasAndSupports(cvt_sets)
-        for i, (delta, support) in enumerate(zip(deltas[1:], supports[1:])):
-            delta = [otRound(d) for d in delta]
-            if all(abs(v) <= 0.5 for v in delta):
-                continue
-            # Remove any deltas that weren't specified in TSIC at this location
-            # TODO: Just replace optimizaton with getting rid of 0 deltas?
-            tsic_rec_index = model.reverseMapping[i + 1] - 1  # Map back to TSIC records
-            delta = [
-                d if j in tsic.Record[tsic_rec_index].CVTArray and d != 0 else None
-                for j, d in enumerate(delta)
-            ]
-            var = TupleVariation(support, delta)
-            variations.append(var)
+        def stage(name):
+            return contextlib.nullcontext()
 
+    with stage("cvt"):
+        control_program = get_extra_assembly(font, "cvt")
+        set_cvt_table(font, control_program)
+    if "TSIC" in font and not keep_cvar:
+        with stage("cvar"):
+            variations = make_cvar_variations(font["TSIC"].table, font["cvt "].values)
         if variations:
             cvar = font["cvar"] = newTable("cvar")
             cvar.version = 1
             cvar.variations = variations
 
+    include = usage = None
+    if strip_unused_functions:
+        with stage("callgraph"):
+            usage = vttLib.callgraph.find_function_usage(font)
+        _log_function_usage(usage)
+        include = usage.defined.difference(usage.unused)
+
     for tag in ("prep", "fpgm"):
         if tag not in font:
             font[tag] = newTable(tag)
         data = get_extra_assembly(font, tag)
-        font[tag].program = make_program(data, tag)
-
+        with stage(tag):
+            if tag == "fpgm" and include is not None:
+                # the reference font's fpgm may define a different set
+                font[tag].program = _make_font_program(data, jobs, cache, include)
+                continue
+            if reference is not None and reference.copy_program(tag, data):
+                continue
+            if tag == "fpgm":
+                font[tag].program = _make_font_program(data, jobs, cache)
+            else:
+                font[tag].program = _make_cached_program(data, tag, cache)
+    if usage is not None and usage.unused and "maxp" in font:
+        maxp = font["maxp"]
+        max_function_defs = max(include, default=-1) + 1
+        if max_function_defs < maxp.maxFunctionDefs:
+            maxp.maxFunctionDefs = max_function_defs
+
+    glyphs_start = time.perf_counter()
     glyph_order = font.getGlyphOrder()
-    glyf_table = font["glyf"]
+    glyph_ids = font.getReverseGlyphMap()
+    glyph_assemblies = []
+    source_glyphs = []
     for glyph_name in glyph_order:
         try:
             data = get_glyph_assembly(font, glyph_name)
         except KeyError:
             continue
-        program, components = make_glyph_program(data, glyph_name)
-        if program or components:
-            glyph = glyf_table[glyph_name]
-            if components:
-                if not glyph.isComposite():
-                    log.warning(
-                        "Glyph '%s' contains components in VTT assembly but "
-                        "not in glyf table; drop assembly and skip "
-                        "compilation" % glyph_name
-                    )
-                    set_glyph_assembly(font, glyph_name, "")
-                else:
-                    check_composite_info(glyph_name, glyph, components, glyph_order)
-                    set_components_flags(glyph, components)
-            if program:
-                glyph.program = program
+        source_glyphs.append(glyph_name)
+        if reference is not None and reference.copy_glyph_program(glyph_name, data):
+            continue
+        glyph_assemblies.append((glyph_name, data))
+    if reference is not None:
+        log.info(
+            "Reused %d glyph programs from the reference font; compiling %d",
+            reference.reused,
+            len(glyph_assemblies),
+        )
+
+    for glyph_name, program, components in _make_glyph_programs(
+        glyph_assemblies, jobs, cache, profile
+    ):
+        _set_glyph_program(font, glyph_name, program, components, glyph_ids, stage)
+    if profile is not None:
+        profile.add_stage("glyphs", time.perf_counter() - glyphs_start)
+
+    if optimize:
+        if reference is not None and reference.optimized:
+            # the programs copied from the reference font are optimized already
+            source_glyphs = [glyph_name for glyph_name, _ in glyph_assemblies]
+        with stage("optimize"):
+            saved = vttLib.peephole.optimize_glyph_programs(font, source_glyphs)
+        log.info(
+            "Peephole optimization saved %d bytes in %d glyph programs",
+            sum(saved.values()),
+            len(saved),
+        )
+
+    if cache is not None:
+        log.debug("Compile cache: %d hits, %d misses", cache.hits, cache.misses)
+        cache.prune()
 
     if ship:
         for tag in ("TSI%s" % i for i in (0, 1, 2, 3, 5, "C")):
             if tag in font:
                 del font[tag]
 
+    return usage
+
+
+def _set_glyph_program(font, glyph_name, program, components, glyph_ids, stage):
+    # set the compiled program of a glyph and the flags of its components
+    if not (program or components):
+        return
+    glyph = font["glyf"][glyph_name]
+    if components:
+        with stage("glyphs.composites"):
+            if not glyph.isComposite():
+                log.warning(
+                    "Glyph '%s' contains components in VTT assembly but "
+                    "not in glyf table; drop assembly and skip "
+                    "compilation" % glyph_name
+                )
+                set_glyph_assembly(font, glyph_name, "")
+            else:
+                check_composite_info(glyph_name, glyph, components, glyph_ids)
+                set_components_flags(glyph, components)
+    if program:
+        glyph.program = program
+
+
+def compile_glyph_instructions(font, glyph_name, cache=None):
+    """Compile the VTT assembly of a single glyph to its TrueType program,
+    like compile_instructions does for all of them, and return the program.
+
+    The font's 'fpgm', 'prep' and 'cvt ' aren't compiled again, so the glyph
+    program must only use functions and control values which are unchanged
+    since they were last compiled.
+    """
+    if "glyf" not in font:
+        raise VTTLibError("Missing 'glyf' table; not a TrueType font")
+    data = get_glyph_assembly(font, glyph_name)
+    ((_, program, components),) = _make_glyph_programs(
+        [(glyph_name, data)], cache=cache
+    )
+    _set_glyph_program(
+        font,
+        glyph_name,
+        program,
+        components,
+        font.getReverseGlyphMap(),
+        lambda name: contextlib.nullcontext(),
+    )
+    return program
+
+
+def _log_function_usage(usage):
+    if usage.dynamic_calls:
+        log.warning(
+            "Keeping all %d functions: can't resolve the function numbers of "
+            "some calls in %s",
+            len(usage.defined),
+            ", ".join(usage.dynamic_calls),
+        )
+    elif usage.unused:
+        log.info(
+            "Removing %d of %d functions that are never called: %s",
+            len(usage.unused),
+            len(usage.defined),
+            ", ".join(str(n) for n in usage.unused),
+        )
+    else:
+        log.info("All %d functions are used", len(usage.defined))
+
 
 comment_re = r"/\*%s\*/[\r\n]*"
 # strip the timestamps
@@ -815,71 +1866,160 @@ vtt_compiler_re = re.compile(  # keep the VTT version
 )
 # strip glyph indexes
 glyph_re = re.compile(comment_re % (r" (?:TT|VTTTalk) glyph [0-9]+.*?"))
+# the three of them in a single pass, over glyph programs and talks
+glyph_program_re = re.compile(
+    comment_re
+    % (r" (?:(VTT [0-9]+\.[0-9][0-9A-Z]* compiler) |(?:TT|VTTTalk) glyph [0-9]+).*?")
+)
+glyph_talk_re = re.compile(
+    comment_re
+    % (
+        r" (?:(VTT [0-9]+\.[0-9][0-9A-Z]* compiler) |(?:TT|VTTTalk) glyph [0-9]+"
+        r"|GUI generated ).*?"
+    )
+)
+
+
+def _normalized_comment(m):
+    compiler = m.group(1)
+    return "/* %s */\r" % compiler if compiler else ""
+
+
+def _normalize_extra_program(data):
+    return vtt_compiler_re.sub(r"/* \1 */\n", data)
+
 
+def _normalize_glyph_program(data, is_talk=False):
+    if "/*" not in data:
+        return data
+    pattern = glyph_talk_re if is_talk else glyph_program_re
+    return pattern.sub(_normalized_comment, data)
 
-def normalize_vtt_programs(font):
+
+def _normalize_program_chunk(items, is_talk=False):
+    # return the normalized program of each (name, program) item, or None if
+    # it's unchanged; 'program' is as stored in the TSI1 or TSI3 table
+    result = []
+    for _, data in items:
+        new_data = _format_vtt_program(_normalize_glyph_program(data, is_talk))
+        result.append(new_data if new_data != data else None)
+    return result
+
+
+def normalize_vtt_programs(font, jobs=1):
+    """Strip the timestamps and glyph indices that VTT writes in comments
+    from the programs of the TSI1 and TSI3 tables, which then only differ
+    when the programs do.
+
+    The glyph programs are normalized in a single pass each, and only those
+    which change are written back. If 'jobs' is not 1, they are normalized
+    by a pool of as many worker processes (0 or None means all the available
+    CPUs).
+    """
     for tag in ("cvt", "ppgm", "fpgm"):
         try:
             program = get_extra_assembly(font, tag)
         except KeyError:
             # extra program missing; nothing to normalize
             continue
-        program = vtt_compiler_re.sub(r"/* \1 */\n", program)
-        set_extra_assembly(font, tag, program)
+        set_extra_assembly(font, tag, _normalize_extra_program(program))
 
+    if not jobs:
+        jobs = os.cpu_count() or 1
     glyph_order = font.getGlyphOrder()
-    for name in glyph_order:
-        for is_talk in (True, False):
-            try:
-                program = get_vtt_program(font, name, is_talk, is_glyph=True)
-            except KeyError:
-                continue
-            if is_talk:
-                program = gui_generated_re.sub("", program)
-            program = vtt_compiler_re.sub(r"/* \1 */\r", program)
-            program = glyph_re.sub("", program)
-            set_vtt_program(font, name, program, is_talk, is_glyph=True)
+    for tag in ("TSI3", "TSI1"):
+        if tag not in font:
+            raise VTTLibError("%s table not found" % tag)
+        programs = vttLib.lazy.load_lazy_table(font, tag).glyphPrograms
+        items = [(name, programs[name]) for name in glyph_order if name in programs]
+        is_talk = tag == "TSI3"
+        if jobs == 1 or len(items) < 2:
+            results = _normalize_program_chunk(items, is_talk)
+        else:
+            from functools import partial
 
-    if len(font["TSI3"].extraPrograms):
+            func = partial(_normalize_program_chunk, is_talk=is_talk)
+            results = [
+                data for chunk in _map_chunks(func, items, jobs) for data in chunk
+            ]
+        for (name, _), data in zip(items, results):
+            if data is not None:
+                programs[name] = data
+
+    tsi3 = vttLib.lazy.load_lazy_table(font, "TSI3")
+    if len(tsi3.extraPrograms):
         # VTT sometimes stores 'reserved' data in TSI3 which isn't needed
-        font["TSI3"].extraPrograms = {}
+        tsi3.extraPrograms = {}
 
 
 def subset_vtt_glyph_programs(font, glyph_names):
+    """Only keep the TSI1, TSI3 and TSI5 data of the glyphs in 'glyph_names'
+    (preferably a set). The tables are rebuilt with the programs kept, so
+    the TSI0 and TSI2 index tables are rebuilt when the font is saved, even
+    if the glyph order changed. See vttLib.subset.subset_font to subset a
+    whole font.
+    """
+    if not isinstance(glyph_names, (set, frozenset, Mapping)):
+        glyph_names = frozenset(glyph_names)
     for tag in ("TSI1", "TSI3"):
-        programs = font[tag].glyphPrograms
-        for name in list(programs.keys()):
-            if name not in glyph_names:
-                del programs[name]
-
-    groups = font["TSI5"].glyphGrouping
-    for name in list(groups.keys()):
-        if name not in glyph_names:
-            del groups[name]
-
-
-def vtt_dump_file(infile, outfile=None, **_):
-    """Write VTT data from a TTF to a TTX dump."""
+        if tag not in font:
+            continue
+        table = vttLib.lazy.load_lazy_table(font, tag)
+        programs = table.glyphPrograms
+        table.glyphPrograms = {
+            name: programs[name] for name in programs if name in glyph_names
+        }
+
+    if "TSI5" in font:
+        tsi5 = font["TSI5"]
+        tsi5.glyphGrouping = {
+            name: group
+            for name, group in tsi5.glyphGrouping.items()
+            if name in glyph_names
+        }
+
+
+def vtt_dump_file(infile, outfile=None, file_format="ttx", **_):
+    """Write VTT data from a TTF to a TTX dump, or to a binary sidecar if
+    'file_format' is "binary".
+    """
     if not os.path.exists(infile):
         raise vttLib.VTTLibArgumentError("'%s' not found" % infile)
+    if file_format not in vttLib.transfer.DUMP_FORMATS:
+        raise vttLib.VTTLibArgumentError("Unknown dump format '%s'" % file_format)
 
     if outfile is None:
-        outfile = os.path.splitext(infile)[0] + "_VTT_Hinting.ttx"
+        extension = ".vttb" if file_format == "binary" else ".ttx"
+        outfile = os.path.splitext(infile)[0] + "_VTT_Hinting" + extension
 
-    font = TTFont(infile)
-    vttLib.transfer.dump_to_file(font, outfile)
+    # only the dumped tables need decompiling
+    font = TTFont(infile, lazy=True)
+    if file_format == "binary":
+        vttLib.transfer.dump_to_sidecar(font, outfile)
+    else:
+        vttLib.transfer.dump_to_file(font, outfile)
 
 
-def vtt_merge_file(infile, outfile=None, keep_cvar=False, **_):
-    """Write VTT data from a TTX dump to a TTF."""
+def vtt_merge_file(infile, outfile=None, keep_cvar=False, file_format=None, **_):
+    """Write VTT data from a TTX dump, or a binary sidecar, to a TTF. The
+    format is detected from the file's contents unless 'file_format' is given.
+    """
     if not os.path.exists(infile):
         raise vttLib.VTTLibArgumentError("Input file '%s' not found" % infile)
 
     if not os.path.exists(outfile):
         raise vttLib.VTTLibArgumentError("Output file '%s' not found" % outfile)
 
+    if file_format is None:
+        file_format = "binary" if vttLib.sidecar.is_sidecar(infile) else "ttx"
+    elif file_format not in vttLib.transfer.DUMP_FORMATS:
+        raise vttLib.VTTLibArgumentError("Unknown dump format '%s'" % file_format)
+
     font = TTFont(outfile)
-    vttLib.transfer.merge_from_file(font, infile, keep_cvar=keep_cvar)
+    if file_format == "binary":
+        vttLib.transfer.merge_from_sidecar(font, infile, keep_cvar=keep_cvar)
+    else:
+        vttLib.transfer.merge_from_file(font, infile, keep_cvar=keep_cvar)
     font.save(outfile)
 
 
@@ -893,6 +2033,8 @@ def vtt_move_ufo_data_to_file(infile, outfile=None, **_):
     if outfile is None:
         outfile = os.path.splitext(infile)[0] + "_VTT_Hinting.ttx"
 
+    import ufoLib2
+
     ufo = ufoLib2.Font.open(infile)
     vttLib.transfer.copy_from_ufo_data_to_file(ufo, outfile)
     ufo.save()
@@ -905,10 +2047,24 @@ def vtt_compile(
     inplace=None,
     force_overwrite=False,
     keep_cvar=False,
+    jobs=1,
+    cache_dir=None,
+    incremental_from=None,
+    profile=False,
+    profile_output=None,
+    strip_unused_functions=False,
+    optimize=False,
     **_,
 ):
     if not os.path.exists(infile):
         raise vttLib.VTTLibArgumentError("Input TTF '%s' not found." % infile)
+    if incremental_from is not None and not os.path.exists(incremental_from):
+        raise vttLib.VTTLibArgumentError(
+            "Reference TTF '%s' not found." % incremental_from
+        )
+
+    if jobs is not None and jobs < 0:
+        raise vttLib.VTTLibArgumentError("The number of jobs must not be negative.")
 
     font = TTFont(infile)
 
@@ -934,5 +2090,198 @@ def vtt_compile(
 
         outfile = makeOutputFileName(infile, None, ".ttf")
 
-    vttLib.compile_instructions(font, ship=ship, keep_cvar=keep_cvar)
+    cache = vttLib.cache.CompileCache(cache_dir) if cache_dir else None
+    reference = None
+    if incremental_from is not None:
+        reference = TTFont(incremental_from)
+        if "TSI1" not in reference:
+            raise vttLib.VTTLibArgumentError(
+                "Reference TTF '%s' contains no 'TSI1' table; it must be "
+                "compiled without --ship." % incremental_from
+            )
+    compile_profile = None
+    if profile or profile_output:
+        compile_profile = vttLib.profile.CompileProfile()
+    vttLib.compile_instructions(
+        font,
+        ship=ship,
+        keep_cvar=keep_cvar,
+        jobs=jobs,
+        cache=cache,
+        reference=reference,
+        profile=compile_profile,
+        strip_unused_functions=strip_unused_functions,
+        optimize=optimize,
+    )
     font.save(outfile)
+    if profile_output:
+        compile_profile.save(profile_output)
+    elif profile:
+        print(compile_profile.format_summary())
+    return outfile
+
+
+def vtt_serve(infile=None, socket_path=None, jobs=1, **_):
+    """Run a compile server for the font 'infile' (see vttLib.server), on the
+    Unix socket 'socket_path' if given, otherwise on stdin and stdout.
+    """
+    import vttLib.server
+
+    if jobs is not None and jobs < 0:
+        raise vttLib.VTTLibArgumentError("The number of jobs must not be negative.")
+    session = vttLib.server.CompileSession(infile, jobs=jobs)
+    if socket_path is not None:
+        vttLib.server.serve_unix_socket(session, socket_path)
+    else:
+        vttLib.server.serve_stdio(session)
+
+
+def vtt_subset(
+    infile, outfile=None, glyphs=None, unicodes=None, ship=False, jobs=1, **_
+):
+    """Subset a TTF with VTT sources to the 'glyphs' (names separated by
+    commas or whitespace) and the 'unicodes' (as parsed by fontTools'
+    subsetter, e.g. "41-5A,61-7A"), keeping its VTT sources in step (see
+    vttLib.subset). If 'ship' is true, the subset is compiled, without the
+    'fpgm' functions which are no longer used, and saved without its TSI*
+    tables.
+    """
+    from fontTools import subset
+
+    if not os.path.exists(infile):
+        raise vttLib.VTTLibArgumentError("Input TTF '%s' not found." % infile)
+    if not glyphs and not unicodes:
+        raise vttLib.VTTLibArgumentError("No glyphs or unicodes to keep.")
+    if jobs is not None and jobs < 0:
+        raise vttLib.VTTLibArgumentError("The number of jobs must not be negative.")
+
+    font = TTFont(infile)
+    if "TSI1" not in font:
+        raise vttLib.VTTLibArgumentError(
+            "Input TTF '%s' contains no 'TSI1' table." % infile
+        )
+    if outfile is None:
+        outfile = os.path.splitext(infile)[0] + "_subset.ttf"
+
+    options = subset.Options()
+    options.glyph_names = True
+    options.notdef_outline = True
+    vttLib.subset.subset_font(
+        font,
+        glyphs=subset.parse_glyphs(glyphs) if glyphs else (),
+        unicodes=subset.parse_unicodes(unicodes) if unicodes else (),
+        options=options,
+    )
+    if ship:
+        vttLib.compile_instructions(
+            font, ship=True, jobs=jobs, strip_unused_functions=True
+        )
+    font.save(outfile)
+    return outfile
+
+
+CompileResult = namedtuple("CompileResult", ["infile", "outfile", "seconds", "error"])
+
+
+def read_batch_manifest(path):
+    """Return the list of font paths in a batch manifest file.
+
+    The manifest lists one path per line; blank lines and lines starting
+    with '#' are ignored, and relative paths are relative to the manifest.
+    """
+    basedir = os.path.dirname(os.path.abspath(path))
+    infiles = []
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            infiles.append(os.path.join(basedir, line))
+    return infiles
+
+
+def _compile_batch_item(infile, outfile, options):
+    start = time.perf_counter()
+    try:
+        outfile = vtt_compile(infile, outfile, **options)
+    except Exception as e:  # report all failures, don't abort the batch
+        log.debug("Failed to compile '%s'", infile, exc_info=True)
+        error = "%s: %s" % (type(e).__name__, e)
+        return CompileResult(infile, outfile, time.perf_counter() - start, error)
+    return CompileResult(infile, outfile, time.perf_counter() - start, None)
+
+
+def vtt_compile_many(
+    infiles=(),
+    manifest=None,
+    output_dir=None,
+    ship=False,
+    force_overwrite=False,
+    keep_cvar=False,
+    jobs=1,
+    cache_dir=None,
+    **_,
+):
+    """Compile many TTFs in one process, or with one pool of worker processes
+    if 'jobs' is not 1, and return a list of CompileResult tuples.
+
+    Fonts are read from 'infiles' and from the 'manifest' file if given. The
+    compiled fonts are saved to 'output_dir' if given, otherwise like
+    vtt_compile does. Failing fonts don't stop the batch; their CompileResult
+    holds the error message.
+    """
+    infiles = list(infiles)
+    if manifest is not None:
+        if not os.path.exists(manifest):
+            raise vttLib.VTTLibArgumentError("Manifest '%s' not found." % manifest)
+        infiles.extend(read_batch_manifest(manifest))
+    if not infiles:
+        raise vttLib.VTTLibArgumentError("No input fonts to compile.")
+    if jobs is not None and jobs < 0:
+        raise vttLib.VTTLibArgumentError("The number of jobs must not be negative.")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    options = dict(
+        ship=ship,
+        force_overwrite=force_overwrite,
+        keep_cvar=keep_cvar,
+        cache_dir=cache_dir,
+    )
+    outfiles = [
+        os.path.join(output_dir, os.path.basename(infile)) if output_dir else None
+        for infile in infiles
+    ]
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(infiles) == 1:
+        # compile the fonts in turn, spreading the glyphs of a lone font over
+        # all the workers
+        options["jobs"] = jobs
+        results = [
+            _compile_batch_item(infile, outfile, options)
+            for infile, outfile in zip(infiles, outfiles)
+        ]
+    else:
+        # compile one font per worker process
+        from concurrent.futures import ProcessPoolExecutor
+
+        options["jobs"] = 1
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(_compile_batch_item, infile, outfile, options)
+                for infile, outfile in zip(infiles, outfiles)
+            ]
+            results = [future.result() for future in futures]
+
+    for result in results:
+        if result.error is None:
+            log.info(
+                "Compiled '%s' to '%s' in %.2f s",
+                result.infile,
+                result.outfile,
+                result.seconds,
+            )
+        else:
+            log.error("Failed to compile '%s': %s", result.infile, result.error)
+    return results
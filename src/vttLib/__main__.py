@@ -5,6 +5,20 @@ from argparse import ArgumentParser
 import vttLib
 
 
+def compile_batch(**kwargs):
+    results = vttLib.vtt_compile_many(**kwargs)
+    failed = [result for result in results if result.error is not None]
+    total = sum(result.seconds for result in results)
+    vttLib.log.info(
+        "Compiled %d of %d fonts (%.2f s in total)",
+        len(results) - len(failed),
+        len(results),
+        total,
+    )
+    if failed:
+        sys.exit(1)
+
+
 def main(args=None):
     parser = ArgumentParser(
         prog="python -m vttLib",
@@ -14,11 +28,16 @@ def main(args=None):
     parser_group = parser.add_subparsers(title="sub-commands")
     parser_dumpfile = parser_group.add_parser(
         "dumpfile",
-        description="Export VTT tables and 'maxp' values from a TTF into a TTX dump",
+        description=(
+            "Export VTT tables and 'maxp' values from a TTF into a TTX dump or a "
+            "binary sidecar."
+        ),
     )
     parser_mergefile = parser_group.add_parser(
         "mergefile",
-        description="Import VTT source data stored in a TTX dump into a TTF.",
+        description=(
+            "Import VTT source data stored in a TTX dump or a binary sidecar into a TTF."
+        ),
     )
     parser_compile = parser_group.add_parser(
         "compile",
@@ -26,11 +45,36 @@ def main(args=None):
             "Generate 'fpgm', 'prep', 'cvt ' and 'glyf' programs from VTT assembly."
         ),
     )
+    parser_compile_batch = parser_group.add_parser(
+        "compile-batch",
+        description=(
+            "Compile VTT assembly in many TTFs in one process, reporting "
+            "per-font timings and failures."
+        ),
+    )
+    parser_serve = parser_group.add_parser(
+        "serve",
+        description=(
+            "Keep a font and its compiled programs in memory and compile glyphs "
+            "or the whole font on request, as JSON-RPC messages read from stdin "
+            "or a Unix socket."
+        ),
+    )
+    parser_subset = parser_group.add_parser(
+        "subset",
+        description=(
+            "Subset a TTF with VTT sources to some glyphs, keeping the VTT "
+            "sources in step, and optionally compile it for shipping."
+        ),
+    )
     parser_dumpfile_from_ufo = parser_group.add_parser(
         "dumpfile_from_ufo", description="Export VTT data from UFO3 data to a TTX dump."
     )
     for subparser in (
         parser_compile,
+        parser_compile_batch,
+        parser_serve,
+        parser_subset,
         parser_dumpfile,
         parser_mergefile,
         parser_dumpfile_from_ufo,
@@ -51,9 +95,25 @@ def main(args=None):
 
     parser_dumpfile.add_argument("infile", metavar="INPUT.ttf")
     parser_dumpfile.add_argument("outfile", nargs="?", metavar="OUTPUT.ttx")
+    parser_dumpfile.add_argument(
+        "--format",
+        dest="file_format",
+        choices=vttLib.transfer.DUMP_FORMATS,
+        default="ttx",
+        help=(
+            "write a TTX dump (default), or a compact binary sidecar which "
+            "can be read one program at a time."
+        ),
+    )
     parser_dumpfile.set_defaults(func=vttLib.vtt_dump_file)
 
     parser_mergefile.add_argument("--keep-cvar", action="store_true")
+    parser_mergefile.add_argument(
+        "--format",
+        dest="file_format",
+        choices=vttLib.transfer.DUMP_FORMATS,
+        help="the format of INPUT; detected from its contents by default.",
+    )
     parser_mergefile.add_argument("infile", metavar="INPUT.ttx")
     parser_mergefile.add_argument("outfile", metavar="OUTPUT.ttf")
     parser_mergefile.set_defaults(func=vttLib.vtt_merge_file)
@@ -69,6 +129,64 @@ def main(args=None):
         action="store_true",
         help="remove all the TSI* tables from the output font.",
     )
+    parser_compile.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "compile glyph programs using N worker processes (default: 1; "
+            "0 means use all available CPUs)."
+        ),
+    )
+    parser_compile.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help=(
+            "cache compiled programs in DIR and reuse them in later builds "
+            "when the VTT assembly is unchanged."
+        ),
+    )
+    parser_compile.add_argument(
+        "--incremental-from",
+        metavar="PREVIOUS.ttf",
+        help=(
+            "copy the compiled programs whose VTT sources are unchanged from "
+            "PREVIOUS.ttf, a font compiled from an earlier version of INPUT "
+            "without --ship and with the same --optimize option."
+        ),
+    )
+    parser_compile.add_argument(
+        "--strip-unused-functions",
+        action="store_true",
+        help=(
+            "remove the 'fpgm' functions that are never called from the 'prep' "
+            "or any glyph program, and list them."
+        ),
+    )
+    parser_compile.add_argument(
+        "--optimize",
+        action="store_true",
+        help=(
+            "shrink the compiled glyph programs with safe peephole rewrites, "
+            "e.g. removing redundant SVTCA or SRP0 and merging pushes; the "
+            "bytes saved per glyph are logged with --verbose."
+        ),
+    )
+    parser_compile.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "print the time spent in each stage of the compilation and the "
+            "slowest glyph programs."
+        ),
+    )
+    parser_compile.add_argument(
+        "--profile-output",
+        metavar="PROFILE.json",
+        help="write the profile summary to PROFILE.json instead of printing it.",
+    )
     parser_compile.set_defaults(func=vttLib.vtt_compile)
     output_group = parser_compile.add_mutually_exclusive_group()
     output_group.add_argument(
@@ -93,6 +211,124 @@ def main(args=None):
         help="overwrite existing input file (CAUTION!)",
     )
 
+    parser_subset.add_argument(
+        "infile",
+        metavar="INPUT.ttf",
+        help="the source TTF font containing VTT TSI* tables",
+    )
+    parser_subset.add_argument(
+        "outfile",
+        nargs="?",
+        metavar="OUTPUT.ttf",
+        help='the subset TTF (default: INPUT + "_subset.ttf").',
+    )
+    parser_subset.add_argument(
+        "--glyphs",
+        metavar="NAMES",
+        help="the names of the glyphs to keep, separated by commas or spaces.",
+    )
+    parser_subset.add_argument(
+        "--unicodes",
+        metavar="UNICODES",
+        help='the code points to keep, in hexadecimal, e.g. "41-5A,61-7A".',
+    )
+    parser_subset.add_argument(
+        "--ship",
+        action="store_true",
+        help=(
+            "compile the subset, leaving out the unused 'fpgm' functions, and "
+            "remove all the TSI* tables from it."
+        ),
+    )
+    parser_subset.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "compile glyph programs using N worker processes (default: 1; "
+            "0 means use all available CPUs)."
+        ),
+    )
+    parser_subset.set_defaults(func=vttLib.vtt_subset)
+
+    parser_compile_batch.add_argument(
+        "infiles",
+        nargs="*",
+        metavar="INPUT.ttf",
+        help="the source TTF fonts containing VTT TSI* tables",
+    )
+    parser_compile_batch.add_argument(
+        "-m",
+        "--manifest",
+        metavar="FILE",
+        help="read the source TTF paths from FILE, one per line",
+    )
+    parser_compile_batch.add_argument(
+        "-d",
+        "--output-dir",
+        metavar="DIR",
+        help=(
+            "save the compiled fonts in DIR, with the same file names as the "
+            'inputs (default: INPUT + "#{n}.ttf").'
+        ),
+    )
+    parser_compile_batch.add_argument(
+        "-f",
+        "--force-overwrite",
+        action="store_true",
+        help="overwrite existing input files when no --output-dir is given",
+    )
+    parser_compile_batch.add_argument(
+        "--ship",
+        action="store_true",
+        help="remove all the TSI* tables from the output fonts.",
+    )
+    parser_compile_batch.add_argument("--keep-cvar", action="store_true")
+    parser_compile_batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "compile up to N fonts at a time in worker processes (default: 1; "
+            "0 means use all available CPUs)."
+        ),
+    )
+    parser_compile_batch.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="cache compiled programs in DIR, shared by all the fonts.",
+    )
+    parser_compile_batch.set_defaults(func=compile_batch)
+
+    parser_serve.add_argument(
+        "infile",
+        nargs="?",
+        metavar="INPUT.ttf",
+        help="the TTF font containing VTT TSI* tables to open first",
+    )
+    parser_serve.add_argument(
+        "--socket",
+        dest="socket_path",
+        metavar="PATH",
+        help="listen on the Unix socket PATH instead of stdin and stdout.",
+    )
+    parser_serve.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "compile glyph programs using N worker processes (default: 1; "
+            "0 means use all available CPUs)."
+        ),
+    )
+    parser_serve.set_defaults(func=vttLib.vtt_serve)
+
     parser_dumpfile_from_ufo.add_argument("infile", metavar="SOURCE.ufo")
     parser_dumpfile_from_ufo.add_argument("outfile", nargs="?", metavar="OUTPUT.ttx")
     parser_dumpfile_from_ufo.set_defaults(func=vttLib.vtt_move_ufo_data_to_file)
@@ -0,0 +1,241 @@
+"""On-disk cache of compiled VTT programs.
+
+Entries are addressed by a hash of the VTT assembly, the kind of program and
+the versions of vttLib and fontTools, and hold the assembled bytecode and the
+list of VTT components parsed from the program, or, for the functions of the
+font program, the function number and the bytecode of its body. The cache is
+bounded in size and evicts the least recently used entries first.
+
+MemoryCache is the same kind of cache held in memory, for a long running
+process such as the compile server (see vttLib.server).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+import fontTools
+
+import vttLib
+
+__all__ = ["CompileCache", "MemoryCache", "program_key"]
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024  # bytes
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def program_key(data, name=None):
+    """Return a hash identifying the result of compiling the VTT assembly
+    'data' with the current versions of vttLib and fontTools.
+
+    Glyph programs are compiled independently of the glyph name, so identical
+    programs share the same key; 'name' is only significant for the 'fpgm' and
+    'prep' programs.
+    """
+    h = hashlib.sha256()
+    for part in (vttLib.__version__, fontTools.version, name or "", data):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class CompileCache(object):
+    key = staticmethod(program_key)
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = os.fspath(path)
+        self.max_size = max_size
+        self.hits = self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def __repr__(self):
+        return "{}({!r}, max_size={})".format(
+            type(self).__name__, self.path, self.max_size
+        )
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return a (bytecode, components) tuple, or None if 'key' is missing
+        or the entry can't be read.
+        """
+        return self._read(
+            key,
+            lambda entry: (
+                bytes.fromhex(entry["bytecode"]),
+                [_load_component(c) for c in entry["components"]],
+            ),
+        )
+
+    def set(self, key, bytecode, components):
+        self._write(
+            key,
+            {
+                "bytecode": bytes(bytecode).hex(),
+                "components": [_dump_component(c) for c in components],
+            },
+        )
+
+    def get_function(self, key):
+        """Return an (is_fdef, number, bytecode) tuple for a function of the
+        font program, or None if 'key' is missing or the entry can't be read.
+        """
+        return self._read(
+            key,
+            lambda entry: (
+                bool(entry["is_fdef"]),
+                int(entry["number"]),
+                bytes.fromhex(entry["bytecode"]),
+            ),
+        )
+
+    def set_function(self, key, is_fdef, number, bytecode):
+        self._write(
+            key,
+            {
+                "is_fdef": is_fdef,
+                "number": number,
+                "bytecode": bytes(bytecode).hex(),
+            },
+        )
+
+    def _read(self, key, load):
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                result = load(json.load(fp))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring invalid cache entry '%s': %s", path, e)
+            self.misses += 1
+            return None
+        try:
+            # mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def _write(self, key, entry):
+        path = self._entry_path(key)
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        # write to a temporary file first so concurrent readers never see a
+        # partially written entry
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(entry, fp, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def prune(self):
+        """Remove the least recently used entries until the total size of the
+        cache is within 'max_size'. Return the number of removed entries.
+        """
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        if total <= self.max_size:
+            return removed
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            total -= size
+            if total <= self.max_size:
+                break
+        log.debug("Evicted %d entries from compile cache", removed)
+        return removed
+
+
+class MemoryCache(object):
+    """A CompileCache kept in memory, holding up to 'max_entries' entries."""
+
+    key = staticmethod(program_key)
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+
+    def __repr__(self):
+        return "{}(max_entries={})".format(type(self).__name__, self.max_entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _read(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key):
+        """Return a (bytecode, components) tuple, or None if 'key' is missing."""
+        entry = self._read(key)
+        if entry is None:
+            return None
+        bytecode, components = entry
+        return bytecode, list(components)
+
+    def set(self, key, bytecode, components):
+        self._entries[key] = (bytes(bytecode), list(components))
+
+    def get_function(self, key):
+        """Return an (is_fdef, number, bytecode) tuple for a function of the
+        font program, or None if 'key' is missing.
+        """
+        return self._read(key)
+
+    def set_function(self, key, is_fdef, number, bytecode):
+        self._entries[key] = (is_fdef, number, bytes(bytecode))
+
+    def prune(self):
+        """Remove the least recently used entries until there are at most
+        'max_entries'. Return the number of removed entries.
+        """
+        removed = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            removed += 1
+        return removed
+
+
+def _dump_component(component):
+    return [type(component).__name__, list(component)]
+
+
+def _load_component(data):
+    type_name, fields = data
+    if type_name == "OffsetComponent":
+        return vttLib.OffsetComponent(*fields)
+    elif type_name == "AnchorComponent":
+        return vttLib.AnchorComponent(*fields)
+    raise ValueError("Unknown component type: %r" % type_name)
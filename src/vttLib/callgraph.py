@@ -0,0 +1,146 @@
+"""Static analysis of the calls to the functions defined in the 'fpgm'.
+
+A function is used if it's called, directly or through other functions, from
+the 'prep', from any glyph program or from an instruction definition (IDEF,
+which is always kept). Calls are only followed when the number of the called
+function is pushed statically, i.e. it's the last stack item of the CALL or
+LOOPCALL instruction itself, or of the #PUSH or PUSH instruction right before
+it; if a call in a used program can't be resolved, every function is
+considered used. The glyphs with no VTT assembly keep their compiled programs,
+so the calls in those are found the same way in the bytecode.
+"""
+from collections import namedtuple
+
+import vttLib
+
+__all__ = ["FunctionUsage", "find_calls", "find_program_calls", "find_function_usage"]
+
+CALL_INSTRUCTIONS = frozenset(["CALL", "LOOPCALL"])
+PUSH_INSTRUCTIONS = frozenset(["#PUSH", "PUSHB", "PUSHW", "NPUSHB", "NPUSHW"])
+
+# 'defined' and 'used' are sets of function numbers, 'unused' the sorted list of
+# the functions that can be removed, and 'dynamic_calls' the sorted names of the
+# used programs containing calls which can't be resolved
+FunctionUsage = namedtuple(
+    "FunctionUsage", ["defined", "used", "unused", "dynamic_calls"]
+)
+
+
+def _static_number(stack_items):
+    if stack_items and isinstance(stack_items[-1], int):
+        return stack_items[-1]
+    return None
+
+
+def find_calls(tokens):
+    """Return the set of function numbers called by the VTT assembly tokens,
+    and whether any of the calls can't be resolved statically.
+    """
+    numbers = set()
+    dynamic = False
+    previous = None
+    for t in tokens:
+        if t.mnemonic in CALL_INSTRUCTIONS:
+            number = _static_number(list(t.stack_items))
+            if number is None and not t.stack_items and previous is not None:
+                if previous.mnemonic in PUSH_INSTRUCTIONS:
+                    number = _static_number(list(previous.stack_items))
+            if number is None:
+                dynamic = True
+            else:
+                numbers.add(number)
+        previous = t
+    return numbers, dynamic
+
+
+def find_program_calls(program):
+    """Return the set of function numbers called by the compiled fontTools
+    Program, and whether any of the calls can't be resolved statically.
+    """
+    numbers = set()
+    dynamic = False
+    pushed = None
+    for line in program.getAssembly():
+        mnemonic, bracket, _ = line.partition("[")
+        if not bracket:
+            # the values of the push instruction before
+            pushed = int(line.split()[-1])
+            continue
+        if mnemonic in CALL_INSTRUCTIONS:
+            if pushed is None:
+                dynamic = True
+            else:
+                numbers.add(pushed)
+        pushed = None
+    return numbers, dynamic
+
+
+def _tokenize(data):
+    data = data.strip()
+    return vttLib.tokenize(data) if data else []
+
+
+def find_function_usage(font):
+    """Return a FunctionUsage describing which of the functions defined in the
+    font's 'fpgm' VTT assembly are called by its 'prep' and glyph programs.
+    """
+    functions = {}
+    dynamic_calls = set()
+    pending = set()
+    for tokens in vttLib.split_functions(
+        _tokenize(vttLib.get_extra_assembly(font, "fpgm"))
+    ):
+        if tokens[0].mnemonic.startswith("IDEF"):
+            # instruction definitions are always kept, so what they call is
+            # used like what the 'prep' and glyph programs call
+            numbers, dynamic = find_calls(tokens)
+            pending |= numbers
+            if dynamic:
+                number = _static_number(list(tokens[0].stack_items))
+                dynamic_calls.add(
+                    "fpgm instruction %s" % (number if number is not None else "?")
+                )
+            continue
+        if not tokens[0].mnemonic.startswith("FDEF"):
+            continue
+        number = _static_number(list(tokens[0].stack_items))
+        if number is None:
+            # can't tell which function this is
+            dynamic_calls.add("fpgm")
+            continue
+        functions[number] = find_calls(tokens)
+    defined = set(functions)
+
+    calls = [("prep", find_calls(_tokenize(vttLib.get_extra_assembly(font, "prep"))))]
+    glyf = font["glyf"] if "glyf" in font else None
+    for glyph_name in font.getGlyphOrder():
+        try:
+            data = vttLib.get_glyph_assembly(font, glyph_name)
+        except KeyError:
+            # compile_instructions keeps the compiled program of the glyph
+            program = getattr(glyf[glyph_name], "program", None) if glyf else None
+            if program:
+                calls.append((glyph_name, find_program_calls(program)))
+            continue
+        calls.append((glyph_name, find_calls(_tokenize(data))))
+    for name, (numbers, dynamic) in calls:
+        pending |= numbers
+        if dynamic:
+            dynamic_calls.add(name)
+
+    used = set()
+    while pending:
+        number = pending.pop()
+        if number in used or number not in functions:
+            continue
+        used.add(number)
+        numbers, dynamic = functions[number]
+        pending |= numbers
+        if dynamic:
+            dynamic_calls.add("fpgm function %d" % number)
+
+    if dynamic_calls:
+        unused = []
+    else:
+        unused = sorted(defined - used)
+    return FunctionUsage(defined, used, unused, sorted(dynamic_calls))
@@ -0,0 +1,194 @@
+"""Parsing of the VTT control program, which defines the control values.
+
+Control values are defined as colon-separated INDEX: VALUE pairs, optionally
+followed by their relation to a parent control value, which is either
+'~ PARENT @ PPEM' (the value is relative to the parent's, and rounds to it
+below PPEM) or '= PARENT @ PPEM' (the value is the parent's below PPEM).
+Lines holding a single name set the attributes of the control values which
+follow: their group, color, direction and category, e.g.:
+
+    UpperCase
+      Grey
+      Y
+      RoundHeight
+          3:    11 ~   2 @ 58 /* cap height overshoot */
+
+parse_control_program reads the whole program in a single pass, and returns a
+ControlValueTable with the array of the values of the 'cvt ' table and the
+ControlValue of each index defined. Parsing the same program again returns
+the same ControlValueTable, so it's parsed once however many times it's used.
+"""
+import array
+import functools
+import re
+from collections import namedtuple
+
+from fontTools.ttLib import newTable
+
+__all__ = ["ControlValue", "ControlValueTable", "parse_control_program"]
+
+# 'relation' is '~', '=' or None, with the 'parent' index and 'ppem' if any
+ControlValue = namedtuple(
+    "ControlValue",
+    [
+        "index",
+        "value",
+        "group",
+        "color",
+        "direction",
+        "category",
+        "relation",
+        "parent",
+        "ppem",
+    ],
+)
+
+GROUPS = frozenset(["AnyGroup", "UpperCase", "LowerCase", "Figure", "Other"])
+COLORS = frozenset(["AnyColor", "Black", "Grey", "White"])
+DIRECTIONS = frozenset(["AnyDirection", "X", "Y", "Diag"])
+
+_COMMENT = r"/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+_SPACE = r"(?:\s|%s)*" % _COMMENT
+# the statements the parser is interested in only start lines (maybe after
+# comments); other comments are matched so that their contents are skipped,
+# and so are the comments following a control value on its line
+_CONTROL_PROGRAM_RE = re.compile(
+    r"""
+    ^(?:[ \t]|{comment})*
+    (?:
+        ([0-9]+){space}:{space}(-?[0-9]+)
+        (?:{space}([~=]){space}([0-9]+){space}@{space}([0-9]+))?
+        (?:[ \t]|{comment})*
+      | (CATEGORY|GROUP)[ \t]+([A-Za-z_][A-Za-z0-9_]*)
+      | ([A-Za-z_][A-Za-z0-9_]*)[ \t]*(?=$|/\*)
+    )
+    | {comment}
+    """.replace(
+        "{comment}", _COMMENT
+    ).replace(
+        "{space}", _SPACE
+    ),
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+class ControlValueTable(object):
+    """The control values defined in a VTT control program.
+
+    'values' is the array of the values of the 'cvt ' table, where missing
+    indices are zero; 'entries' maps the indices defined to their ControlValue,
+    in the order they are first defined in the program. 'groups' and
+    'categories' are the sets of the names declared with GROUP and CATEGORY.
+
+    The table may be shared (see parse_control_program), so it must not be
+    modified.
+    """
+
+    def __init__(self, values, entries, groups=(), categories=()):
+        self.values = values
+        self.entries = entries
+        self.groups = frozenset(groups)
+        self.categories = frozenset(categories)
+
+    def __repr__(self):
+        return "<{} values={} entries={}>".format(
+            type(self).__name__, len(self.values), len(self.entries)
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, index):
+        return index in self.entries
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def indices(self, **attributes):
+        """Return the sorted indices of the control values with the given
+        attributes, e.g. indices(group="UpperCase", category="RoundHeight").
+        """
+        for key in attributes:
+            if key not in ControlValue._fields:
+                raise TypeError("Unknown control value attribute: %r" % key)
+        return sorted(
+            entry.index
+            for entry in self.entries.values()
+            if all(getattr(entry, k) == v for k, v in attributes.items())
+        )
+
+    def to_table(self):
+        """Return a new 'cvt ' table with the values."""
+        table = newTable("cvt ")
+        table.values = array.array("h", self.values)
+        return table
+
+
+def _parse_control_program(data):
+    groups = set()
+    categories = set()
+    group = color = direction = category = None
+    entries = {}
+    max_index = -1
+    # unmatched groups are empty strings
+    for (
+        index,
+        value,
+        relation,
+        parent,
+        ppem,
+        declaration,
+        name,
+        attribute,
+    ) in _CONTROL_PROGRAM_RE.findall(data):
+        if index:
+            index = int(index)
+            if relation:
+                parent, ppem = int(parent), int(ppem)
+            else:
+                relation = parent = ppem = None
+            entries[index] = ControlValue(
+                index,
+                int(value),
+                group,
+                color,
+                direction,
+                category,
+                relation,
+                parent,
+                ppem,
+            )
+            if index > max_index:
+                max_index = index
+        elif attribute:
+            if attribute in COLORS:
+                color = attribute
+            elif attribute in DIRECTIONS:
+                direction = attribute
+            elif attribute in GROUPS or attribute in groups:
+                group = attribute
+            else:
+                # VTT's own categories, and those declared with CATEGORY
+                category = attribute
+        elif declaration == "GROUP":
+            groups.add(name)
+        elif declaration == "CATEGORY":
+            categories.add(name)
+
+    # missing CV indexes default to zero; a control value defined again
+    # replaces the former definition
+    values = array.array("h", [0]) * (max_index + 1)
+    for index, entry in entries.items():
+        values[index] = entry.value
+    return ControlValueTable(values, entries, groups, categories)
+
+
+@functools.lru_cache(maxsize=8)
+def parse_control_program(data):
+    """Return the ControlValueTable of the control values defined in the VTT
+    control program 'data'. The result is cached, so it must not be modified.
+    """
+    return _parse_control_program(data)
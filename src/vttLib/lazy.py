@@ -0,0 +1,276 @@
+"""Lazy access to the VTT programs in the TSI1 and TSI3 tables.
+
+fontTools decodes every program of a TSI1 or TSI3 table into a string when
+the table is first accessed, which for fonts with tens of thousands of glyphs
+means a lot of text that is mostly never looked at. load_lazy_table instead
+reads the offsets of the programs from the TSI0 or TSI2 index table, and
+decodes each program from the raw table data when it is requested. When the
+font was opened with TTFont(..., lazy=True) from an uncompressed font file,
+the table data is memory-mapped rather than read (otherwise fontTools holds
+the whole file in memory anyway).
+
+The lazy table replaces the fontTools one in the font, so everything using
+'glyphPrograms' and 'extraPrograms' keeps working, and programs can be set or
+deleted as usual. The table is compiled from its programs when it was changed,
+or copied unchanged otherwise.
+"""
+import array
+import io
+import logging
+import mmap
+import struct
+from collections.abc import MutableMapping
+
+from fontTools.ttLib import TTLibError, getTableClass, newTable
+
+__all__ = ["LazyPrograms", "load_lazy_table"]
+
+log = logging.getLogger(__name__)
+
+INDEX_TABLES = {"TSI1": "TSI0", "TSI3": "TSI2"}
+
+_INDEX_RECORD = struct.Struct(">HHL")
+_MAGIC_RECORD = (0xFFFE, 0, 0xABFC1F34)
+
+
+class LazyPrograms(MutableMapping):
+    """A {name: program} mapping which decodes the programs from 'data'
+    on access.
+
+    The program of the name 'names[i]' is found at 'offsets[i]', and is
+    'lengths[i]' bytes long, or missing if that's 0; 'indices' maps the names
+    back to 'i' (for the glyph programs, these are the font's glyph order and
+    reverse glyph map). Programs which are set are kept in memory.
+    """
+
+    def __init__(self, data, names, indices, offsets, lengths):
+        self._data = data
+        self._names = names
+        self._indices = indices
+        self._offsets = offsets
+        self._lengths = lengths
+        self._programs = {}
+        self.modified = False
+
+    def __repr__(self):
+        return "<{} programs={} modified={}>".format(
+            type(self).__name__, len(self), self.modified
+        )
+
+    def _index(self, name):
+        # the index of the program of 'name' in the data, or None if missing
+        i = self._indices.get(name)
+        if i is None or i >= len(self._lengths) or not self._lengths[i]:
+            return None
+        return i
+
+    def __getitem__(self, name):
+        try:
+            return self._programs[name]
+        except KeyError:
+            i = self._index(name)
+            if i is None:
+                raise
+        offset = self._offsets[i]
+        return str(self._data[offset : offset + self._lengths[i]], "utf-8")
+
+    def __setitem__(self, name, data):
+        self._programs[name] = data
+        self.modified = True
+
+    def __delitem__(self, name):
+        i = self._index(name)
+        if i is not None:
+            self._lengths[i] = 0
+        if self._programs.pop(name, None) is None and i is None:
+            raise KeyError(name)
+        self.modified = True
+
+    def __contains__(self, name):
+        return name in self._programs or self._index(name) is not None
+
+    def __iter__(self):
+        for i, length in enumerate(self._lengths):
+            if length:
+                yield self._names[i]
+        for name in self._programs:
+            if self._index(name) is None:
+                yield name
+
+    def __len__(self):
+        return sum(1 for length in self._lengths if length) + sum(
+            1 for name in self._programs if self._index(name) is None
+        )
+
+    def _detach(self, data):
+        self._data = data
+
+
+def _read_index(data):
+    """Return the (glyph index, length, offset) records of a TSI0 or TSI2
+    table, as a list for the glyph programs and one for the extra programs.
+    """
+    records = list(_INDEX_RECORD.iter_unpack(data))
+    if len(records) < 5 or records[-5] != _MAGIC_RECORD:
+        raise ValueError("bad magic number")
+    return records[:-5], records[-4:]
+
+
+def _program_locations(index_data, start, stop, base, size, next_offset, data_size):
+    """Return arrays of the offsets and lengths of the programs of the index
+    records 'start' to 'stop' in 'index_data', indexed by their glyph index
+    minus 'base'; there are 'size' of them. 'next_offset' is where the program
+    after the last one would start.
+    """
+    offsets = array.array("I", [0]) * size
+    lengths = array.array("I", [0]) * size
+    unpack = _INDEX_RECORD.unpack_from
+    record_size = _INDEX_RECORD.size
+    # the same rules as in fontTools' TSI1 decompile for the 0x8000 lengths
+    for i in range(start, stop):
+        index, length, offset = unpack(index_data, i * record_size)
+        index -= base
+        if not 0 <= index < size:
+            log.warning("Program index %d out of range; skipped", index + base)
+            continue
+        if offset > data_size:
+            log.warning("textOffset > totalLength; program %d skipped", index + base)
+            continue
+        if length == 0x8000:
+            if i + 1 < stop:
+                length = unpack(index_data, (i + 1) * record_size)[2] - offset
+            else:
+                length = next_offset - offset
+        elif length > 0x8000:
+            raise ValueError(
+                "Program %d textLength (%d) must not be > 32768"
+                % (index + base, length)
+            )
+        offsets[index] = offset
+        lengths[index] = max(0, min(length, data_size - offset))
+    return offsets, lengths
+
+
+def _table_data(font, tag):
+    """Return the raw data of the table, memory-mapped if possible."""
+    reader = font.reader
+    if reader.flavor is None:
+        entry = reader.tables[tag]
+        try:
+            fileno = reader.file.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            pass
+        else:
+            if entry.length:
+                mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+                return memoryview(mapped)[entry.offset : entry.offset + entry.length]
+    return reader[tag]
+
+
+def _make_lazy_table_class(tag):
+    superclass = getTableClass(tag)
+
+    class LazyTable(superclass):
+        """A TSI1 or TSI3 table whose programs are decoded on access."""
+
+        def compile(self, ttFont):
+            if not ttFont.isLoaded(self.indextable):
+                # rebuilt below, rather than decompiled from the font file
+                ttFont[self.indextable] = newTable(self.indextable)
+            unchanged = (
+                self.glyphPrograms is self._lazyGlyphPrograms
+                and self.extraPrograms is self._lazyExtraPrograms
+                and not self.glyphPrograms.modified
+                and not self.extraPrograms.modified
+            )
+            if unchanged:
+                data = bytes(self._data)
+                ttFont[self.indextable].set(*_read_index(self._indexData))
+            else:
+                data = super().compile(ttFont)
+            # the font may be saved over the file which is mapped
+            self._detach()
+            return data
+
+        def _detach(self):
+            if isinstance(self._data, memoryview):
+                data = bytes(self._data)
+                self._data.release()
+                self._data = data
+                for programs in (self._lazyGlyphPrograms, self._lazyExtraPrograms):
+                    programs._detach(data)
+
+    LazyTable.__name__ = "Lazy" + superclass.__name__
+    return LazyTable
+
+
+_LAZY_TABLE_CLASSES = {tag: _make_lazy_table_class(tag) for tag in INDEX_TABLES}
+
+
+def load_lazy_table(font, tag):
+    """Return the font's TSI1 or TSI3 table (according to 'tag'), making it a
+    lazy table if it wasn't loaded yet.
+
+    If the table was already loaded, or isn't in the file the font was read
+    from, font[tag] is returned as is.
+    """
+    index_tag = INDEX_TABLES[tag]
+    reader = font.reader
+    if (
+        font.isLoaded(tag)
+        or reader is None
+        or tag not in reader
+        or index_tag not in reader
+    ):
+        return font[tag]
+
+    index_data = reader[index_tag]
+    n_records = len(index_data) // _INDEX_RECORD.size
+    if (
+        n_records < 5
+        or _INDEX_RECORD.unpack_from(index_data, (n_records - 5) * _INDEX_RECORD.size)
+        != _MAGIC_RECORD
+    ):
+        raise TTLibError("bad magic number in '%s' table" % index_tag)
+
+    table = _LAZY_TABLE_CLASSES[tag](tag)
+    table._indexData = index_data
+    data = table._data = _table_data(font, tag)
+    data_size = len(data)
+    first_extra_offset = _INDEX_RECORD.unpack_from(
+        index_data, (n_records - 4) * _INDEX_RECORD.size
+    )[2]
+
+    glyph_order = font.getGlyphOrder()
+    table._lazyGlyphPrograms = table.glyphPrograms = LazyPrograms(
+        data,
+        glyph_order,
+        font.getReverseGlyphMap(),
+        *_program_locations(
+            index_data,
+            0,
+            n_records - 5,
+            0,
+            len(glyph_order),
+            first_extra_offset,
+            data_size,
+        ),
+    )
+    codes = sorted(table.extras)
+    extra_names = [table.extras[code] for code in codes]
+    table._lazyExtraPrograms = table.extraPrograms = LazyPrograms(
+        data,
+        extra_names,
+        {name: i for i, name in enumerate(extra_names)},
+        *_program_locations(
+            index_data,
+            n_records - 4,
+            n_records,
+            codes[0],
+            len(codes),
+            data_size,
+            data_size,
+        ),
+    )
+    font[tag] = table
+    return table
@@ -1,26 +1,12 @@
+"""The pyparsing grammar of VTT assembly.
+
+The grammar is only built (and pyparsing imported) on first use, via
+get_parser() or the AssemblyParser attribute of this module.
+"""
 import string
 
-from pyparsing import (
-    Combine,
-    Group,
-    Literal,
-    OneOrMore,
-    Optional,
-    ParseException,
-    Regex,
-    Suppress,
-    Word,
-    alphanums,
-    alphas,
-    cStyleComment,
-    nestedExpr,
-    nums,
-    oneOf,
-    pyparsing_common,
-    tokenMap,
-)
-
-__all__ = ["AssemblyParser", "ParseException"]
+# AssemblyParser and ParseException are provided by __getattr__
+__all__ = ["AssemblyParser", "ParseException", "get_parser"]  # noqa: F822
 
 
 VTT_MNEMONIC_FLAGS = {
@@ -49,80 +35,126 @@ VTT_MNEMONIC_FLAGS = {
 }
 
 
-alpha_upper = string.ascii_uppercase
-
-mnemonic = Word(alpha_upper, bodyChars=alpha_upper + nums).setResultsName("mnemonic")
-
-# XXX can't use pyparsing_common.signedInteger as the latest pyparsing 2.1.5
-# has a bug which always converts them to floats. Remove this once 2.1.6 is
-# published on PyPI.
-signed_integer = (
-    Regex(r"[+-]?\d+").setName("signed integer").setParseAction(tokenMap(int))
-)
-
-variable = Word(alphas, bodyChars=alphanums)
-
-stack_item = Suppress(",") + (signed_integer | Suppress("*") | variable)
-
-flag = oneOf(list(VTT_MNEMONIC_FLAGS.keys()))
-# convert flag to binary string
-flag.setParseAction(tokenMap(lambda t: VTT_MNEMONIC_FLAGS[t]))
-flags = Combine(OneOrMore(flag)).setResultsName("flags")
-
-delta_point_index = pyparsing_common.integer.setResultsName("point_index")
-delta_rel_ppem = pyparsing_common.integer.setResultsName("rel_ppem")
-delta_step_no = signed_integer.setResultsName("step_no")
-# the step denominator is only used in VTT's DELTA[CP]* instructions,
-# and must always be 8 (sic!), so we can suppress it.
-delta_spec = (
-    delta_point_index
-    + Suppress("@")
-    + delta_rel_ppem
-    + delta_step_no
-    + Optional(Literal("/8")).suppress()
-)
-
-# NOTE: The type-ignore is weird, the docs at
-# https://pyparsing-docs.readthedocs.io/en/latest/pyparsing.html?highlight=nestedExpr#pyparsing.nested_expr
-# say that passing None is okay, but the typing says something else.
-delta = nestedExpr("(", ")", delta_spec, ignoreExpr=None)  # type: ignore
-
-deltas = Group(OneOrMore(delta)).setResultsName("deltas")
-
-args = deltas | flags
-
-stack_items = OneOrMore(stack_item).setResultsName("stack_items")
-
-instruction = Group(
-    mnemonic + Suppress("[") + Optional(args) + Suppress("]") + Optional(stack_items)
-)
-
-label = Word("#", alphanums)
-jump_label = Group(Combine(label + Literal(":")).setResultsName("mnemonic"))
-assignment = Group(
-    variable.setResultsName("variable")
-    + Literal("=").suppress()
-    + label.setResultsName("label")
-).setResultsName("assignment")
-jump_mnemonic = oneOf(["JMPR", "JROT", "JROF"]).setResultsName("mnemonic")
-jump = Group(
-    jump_mnemonic
-    + Suppress("[")
-    + Suppress("]")
-    + Suppress(",")
-    + Suppress("(")
-    + assignment
-    + Suppress(")")
-)
-
-pragma_memonic = Word("#", bodyChars=alpha_upper).setResultsName("mnemonic")
-
-pragma = Group(pragma_memonic + Optional(stack_items))
-
-comment = cStyleComment.suppress()
+def _build_parser():
+    from pyparsing import (
+        Combine,
+        Group,
+        Literal,
+        OneOrMore,
+        Optional,
+        Regex,
+        Suppress,
+        Word,
+        alphanums,
+        alphas,
+        cStyleComment,
+        nestedExpr,
+        nums,
+        oneOf,
+        pyparsing_common,
+        tokenMap,
+    )
+
+    alpha_upper = string.ascii_uppercase
+
+    mnemonic = Word(alpha_upper, bodyChars=alpha_upper + nums).setResultsName(
+        "mnemonic"
+    )
+
+    # XXX can't use pyparsing_common.signedInteger as the latest pyparsing 2.1.5
+    # has a bug which always converts them to floats. Remove this once 2.1.6 is
+    # published on PyPI.
+    signed_integer = (
+        Regex(r"[+-]?\d+").setName("signed integer").setParseAction(tokenMap(int))
+    )
+
+    variable = Word(alphas, bodyChars=alphanums)
+
+    stack_item = Suppress(",") + (signed_integer | Suppress("*") | variable)
+
+    flag = oneOf(list(VTT_MNEMONIC_FLAGS.keys()))
+    # convert flag to binary string
+    flag.setParseAction(tokenMap(lambda t: VTT_MNEMONIC_FLAGS[t]))
+    flags = Combine(OneOrMore(flag)).setResultsName("flags")
+
+    delta_point_index = pyparsing_common.integer.setResultsName("point_index")
+    delta_rel_ppem = pyparsing_common.integer.setResultsName("rel_ppem")
+    delta_step_no = signed_integer.setResultsName("step_no")
+    # the step denominator is only used in VTT's DELTA[CP]* instructions,
+    # and must always be 8 (sic!), so we can suppress it.
+    delta_spec = (
+        delta_point_index
+        + Suppress("@")
+        + delta_rel_ppem
+        + delta_step_no
+        + Optional(Literal("/8")).suppress()
+    )
+
+    # NOTE: The type-ignore is weird, the docs at
+    # https://pyparsing-docs.readthedocs.io/en/latest/pyparsing.html?highlight=nestedExpr#pyparsing.nested_expr
+    # say that passing None is okay, but the typing says something else.
+    delta = nestedExpr("(", ")", delta_spec, ignoreExpr=None)  # type: ignore
+
+    deltas = Group(OneOrMore(delta)).setResultsName("deltas")
+
+    args = deltas | flags
+
+    stack_items = OneOrMore(stack_item).setResultsName("stack_items")
+
+    instruction = Group(
+        mnemonic
+        + Suppress("[")
+        + Optional(args)
+        + Suppress("]")
+        + Optional(stack_items)
+    )
+
+    label = Word("#", alphanums)
+    jump_label = Group(Combine(label + Literal(":")).setResultsName("mnemonic"))
+    assignment = Group(
+        variable.setResultsName("variable")
+        + Literal("=").suppress()
+        + label.setResultsName("label")
+    ).setResultsName("assignment")
+    jump_mnemonic = oneOf(["JMPR", "JROT", "JROF"]).setResultsName("mnemonic")
+    jump = Group(
+        jump_mnemonic
+        + Suppress("[")
+        + Suppress("]")
+        + Suppress(",")
+        + Suppress("(")
+        + assignment
+        + Suppress(")")
+    )
+
+    pragma_memonic = Word("#", bodyChars=alpha_upper).setResultsName("mnemonic")
+
+    pragma = Group(pragma_memonic + Optional(stack_items))
+
+    comment = cStyleComment.suppress()
+
+    return OneOrMore(comment | jump_label | pragma | jump | instruction)
+
+
+_parser = None
+
+
+def get_parser():
+    """Return the pyparsing grammar of VTT assembly, building it on first use."""
+    global _parser
+    if _parser is None:
+        _parser = _build_parser()
+    return _parser
+
+
+def __getattr__(name):
+    if name == "AssemblyParser":
+        return get_parser()
+    if name == "ParseException":
+        from pyparsing import ParseException
 
-# this is the only public class
-AssemblyParser = OneOrMore(comment | jump_label | pragma | jump | instruction)
+        return ParseException
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 if __name__ == "__main__":
@@ -132,7 +164,7 @@ if __name__ == "__main__":
     with open(infile, "r") as fp:
         data = fp.read()
 
-    tokens = AssemblyParser.parseString(data, parseAll=True)
+    tokens = get_parser().parseString(data, parseAll=True)
 
     for i, t in enumerate(tokens):
         print(i, repr(t))
@@ -0,0 +1,299 @@
+"""Peephole optimization of compiled TrueType programs.
+
+The rewrites only rely on the stack effects of the instructions and on which
+parts of the graphics state they set, so they are safe without executing the
+program:
+
+- a graphics state setter is removed, along with the pushed values it would
+  pop, when the setters right after it (possibly with pushes in between) set
+  everything it sets again without reading it, e.g. the first of two SVTCA,
+  or an SRP0 followed by another SRP0;
+- a POP of a pushed value is removed along with the value;
+- consecutive pushes are merged, when that makes them smaller.
+
+Pushed values can only be removed when it's known which instruction pushed
+them; instructions whose stack effect isn't fixed (CALL, IF, DELTAP1, SHP,
+etc.) stop the tracking. Programs containing jumps are left untouched, since
+the relative offsets would change.
+"""
+import logging
+
+from fontTools.ttLib.tables.ttProgram import Program, instructions, streamOpcodeDict
+
+import vttLib
+
+__all__ = ["optimize_bytecode", "optimize_program", "optimize_glyph_programs"]
+
+log = logging.getLogger(__name__)
+
+
+def _expand_opcodes():
+    mnemonics = {}
+    effects = {}
+    for op, mnemonic, arg_bits, _, pops, pushes in instructions:
+        for opcode in range(op, op + (1 << arg_bits)):
+            mnemonics[opcode] = mnemonic
+            if pops >= 0 and pushes >= 0:
+                effects[opcode] = (pops, pushes)
+    return mnemonics, effects
+
+
+_MNEMONICS, _STACK_EFFECTS = _expand_opcodes()
+
+# instructions with a fixed stack effect according to fontTools, but which also
+# depend on or change the stack beyond it, or the flow of control
+for _mnemonic in (
+    "CALL",
+    "LOOPCALL",
+    "CINDEX",
+    "MINDEX",
+    "DEPTH",
+    "IF",
+    "ELSE",
+    "EIF",
+    "FDEF",
+    "IDEF",
+    "ENDF",
+    "JMPR",
+    "JROT",
+    "JROF",
+):
+    for _opcode, _name in list(_MNEMONICS.items()):
+        if _name == _mnemonic:
+            _STACK_EFFECTS.pop(_opcode, None)
+
+JUMP_INSTRUCTIONS = frozenset(["JMPR", "JROT", "JROF"])
+
+# the parts of the graphics state set by each instruction
+_VECTORS = frozenset(["pv", "dpv"])
+_ROUND = frozenset(["round"])
+STATE_WRITES = {
+    "SVTCA": frozenset(["pv", "dpv", "fv"]),
+    "SPVTCA": _VECTORS,
+    "SPVTL": _VECTORS,
+    "SPVFS": _VECTORS,
+    "SDPVTL": _VECTORS,
+    "SFVTCA": frozenset(["fv"]),
+    "SFVTL": frozenset(["fv"]),
+    "SFVFS": frozenset(["fv"]),
+    "SFVTPV": frozenset(["fv"]),
+    "RTG": _ROUND,
+    "RTHG": _ROUND,
+    "RTDG": _ROUND,
+    "RDTG": _ROUND,
+    "RUTG": _ROUND,
+    "ROFF": _ROUND,
+    "SROUND": _ROUND,
+    "S45ROUND": _ROUND,
+    "SRP0": frozenset(["rp0"]),
+    "SRP1": frozenset(["rp1"]),
+    "SRP2": frozenset(["rp2"]),
+    "SZP0": frozenset(["zp0"]),
+    "SZP1": frozenset(["zp1"]),
+    "SZP2": frozenset(["zp2"]),
+    "SZPS": frozenset(["zp0", "zp1", "zp2"]),
+    "SLOOP": frozenset(["loop"]),
+    "SMD": frozenset(["minimum_distance"]),
+    "SCVTCI": frozenset(["control_value_cut_in"]),
+    "SSWCI": frozenset(["single_width_cut_in"]),
+    "SSW": frozenset(["single_width_value"]),
+    "SDB": frozenset(["delta_base"]),
+    "SDS": frozenset(["delta_shift"]),
+    "SANGW": frozenset(["angle_weight"]),
+    "FLIPON": frozenset(["auto_flip"]),
+    "FLIPOFF": frozenset(["auto_flip"]),
+    "SCANCTRL": frozenset(["scan_control"]),
+    "SCANTYPE": frozenset(["scan_type"]),
+}
+# the parts of the graphics state read by the setters above
+STATE_READS = {
+    "SFVTPV": frozenset(["pv"]),
+    "SPVTL": frozenset(["zp1", "zp2"]),
+    "SFVTL": frozenset(["zp1", "zp2"]),
+    "SDPVTL": frozenset(["zp1", "zp2"]),
+}
+
+
+def _decode(bytecode):
+    """Return a list of [opcode, values, data] items, where 'values' is the
+    list of pushed values for push instructions, or None, and 'data' the
+    encoded instruction.
+    """
+    result = []
+    i = 0
+    n = len(bytecode)
+    while i < n:
+        start = i
+        op = bytecode[i]
+        i += 1
+        if op not in streamOpcodeDict:
+            result.append([op, None, bytecode[start:i]])
+            continue
+        mnemonic, arg_bits, arg_offset, _ = streamOpcodeDict[op]
+        if arg_bits:
+            count = op - arg_offset + 1
+        else:
+            count = bytecode[i]
+            i += 1
+        values = []
+        if mnemonic.endswith("W"):
+            for _ in range(count):
+                value = (bytecode[i] << 8) | bytecode[i + 1]
+                values.append(value - 0x10000 if value & 0x8000 else value)
+                i += 2
+        else:
+            values.extend(bytecode[i : i + count])
+            i += count
+        result.append([op, values, bytecode[start:i]])
+    return result
+
+
+def _encode_values(values):
+    bytecode = []
+    offset = 0
+    for n_words, n_bytes in vttLib._split_push(values):
+        if n_words:
+            mnemonic = "PUSHW" if n_words <= 8 else "NPUSHW"
+            vttLib._encode_push(mnemonic, values[offset : offset + n_words], bytecode)
+            offset += n_words
+        if n_bytes:
+            mnemonic = "PUSHB" if n_bytes <= 8 else "NPUSHB"
+            vttLib._encode_push(mnemonic, values[offset : offset + n_bytes], bytecode)
+            offset += n_bytes
+    return bytes(bytecode)
+
+
+def _is_dead_setter(mnemonics, index):
+    """Return whether the state set by the instruction at 'index' in the list
+    of 'mnemonics' is set again by the setters after it before anything reads
+    it.
+    """
+    writes = STATE_WRITES.get(mnemonics[index])
+    if writes is None:
+        return False
+    pending = set(writes)
+    for next_index in range(index + 1, len(mnemonics)):
+        next_mnemonic = mnemonics[next_index]
+        next_writes = STATE_WRITES.get(next_mnemonic)
+        if next_writes is None or pending & STATE_READS.get(next_mnemonic, set()):
+            return False
+        pending -= next_writes
+        if not pending:
+            return True
+    return False
+
+
+def _find_removals(items):
+    """Return the set of the indices of the removable instructions, and the
+    set of (push index, value index) of the removable pushed values.
+    """
+    removed = set()
+    removed_values = set()
+    # the mnemonics of the instructions other than pushes, in order, and the
+    # index of each instruction in that list
+    mnemonics = []
+    positions = {}
+    for i, (op, values, _) in enumerate(items):
+        if values is None:
+            positions[i] = len(mnemonics)
+            mnemonics.append(_MNEMONICS.get(op))
+
+    # the pushed values on the stack, as (push index, value index), or None
+    # where it's not known which push they come from
+    stack = []
+    for i, (op, values, _) in enumerate(items):
+        if values is not None:
+            stack.extend((i, j) for j in range(len(values)))
+            continue
+        effect = _STACK_EFFECTS.get(op)
+        if effect is None:
+            stack = []
+            continue
+        pops, pushes = effect
+        args = []
+        for _ in range(pops):
+            args.append(stack.pop() if stack else None)
+        stack.extend([None] * pushes)
+        if None in args:
+            continue
+        if _MNEMONICS[op] == "POP" or _is_dead_setter(mnemonics, positions[i]):
+            removed.add(i)
+            removed_values.update(args)
+    return removed, removed_values
+
+
+def optimize_bytecode(bytecode):
+    """Return the optimized bytecode, or the input if it can't be made any
+    smaller.
+    """
+    bytecode = bytes(bytecode)
+    items = _decode(bytecode)
+    if any(
+        _MNEMONICS.get(op) in JUMP_INSTRUCTIONS
+        for op, values, _ in items
+        if values is None
+    ):
+        return bytecode
+    removed, removed_values = _find_removals(items)
+
+    result = []
+    pending = []  # consecutive pushes: (values, data or None if changed)
+    for i, (op, values, data) in enumerate(items):
+        if values is not None:
+            kept = [v for j, v in enumerate(values) if (i, j) not in removed_values]
+            if kept:
+                pending.append((kept, data if len(kept) == len(values) else None))
+            continue
+        if pending:
+            result.append(_encode_pushes(pending))
+            pending = []
+        if i not in removed:
+            result.append(data)
+    if pending:
+        result.append(_encode_pushes(pending))
+
+    optimized = b"".join(result)
+    if len(optimized) < len(bytecode):
+        return optimized
+    return bytecode
+
+
+def _encode_pushes(pushes):
+    separate = b"".join(
+        data if data is not None else _encode_values(values) for values, data in pushes
+    )
+    if len(pushes) == 1:
+        return separate
+    merged = _encode_values([v for values, _ in pushes for v in values])
+    return merged if len(merged) < len(separate) else separate
+
+
+def optimize_program(program):
+    """Return an optimized copy of the fontTools Program."""
+    optimized = Program()
+    optimized.fromBytecode(optimize_bytecode(program.getBytecode()))
+    return optimized
+
+
+def optimize_glyph_programs(font, glyph_names=None):
+    """Optimize the programs of the given glyphs (default: all) in the font's
+    'glyf' table. Return a {glyph name: bytes saved} dict of the glyphs whose
+    program got smaller.
+    """
+    glyf = font["glyf"]
+    if glyph_names is None:
+        glyph_names = font.getGlyphOrder()
+    saved = {}
+    for glyph_name in glyph_names:
+        glyph = glyf[glyph_name]
+        program = getattr(glyph, "program", None)
+        if not program:
+            continue
+        bytecode = program.getBytecode()
+        optimized = optimize_bytecode(bytecode)
+        if len(optimized) < len(bytecode):
+            glyph.program = Program()
+            glyph.program.fromBytecode(optimized)
+            saved[glyph_name] = len(bytecode) - len(optimized)
+            log.debug("Saved %d bytes in glyph '%s'", saved[glyph_name], glyph_name)
+    return saved
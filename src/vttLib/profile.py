@@ -0,0 +1,93 @@
+"""Timing of the stages of compile_instructions.
+
+Pass a CompileProfile instance as the 'profile' argument of
+compile_instructions to record how long each stage takes:
+
+- "cvt": parsing the control values and building the 'cvt ' table
+- "cvar": modelling the 'cvar' variations from the 'TSIC' table
+- "callgraph": finding the unused functions, if they are stripped
+- "prep" and "fpgm": compiling (or copying) the respective programs
+- "glyphs": compiling (or copying) all the glyph programs, in wall time
+- "glyphs.tokenize", "glyphs.transform" (which includes resolving jumps) and
+  "glyphs.assemble": the time spent in each step of compiling the glyph
+  programs, summed over all glyphs (and all worker processes)
+- "glyphs.composites": checking the components of composite glyphs
+- "optimize": the peephole optimization of the glyph programs, if enabled
+
+The compile time of each glyph program is recorded too. Glyph programs that
+are taken from a cache or a reference font are not timed.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+__all__ = ["CompileProfile"]
+
+
+class CompileProfile(object):
+    def __init__(self):
+        # stage name -> seconds, in the order the stages first ran
+        self.stages = {}
+        # glyph name -> seconds
+        self.glyphs = {}
+
+    def __repr__(self):
+        return "<{} stages={} glyphs={}>".format(
+            type(self).__name__, len(self.stages), len(self.glyphs)
+        )
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_glyph(self, glyph_name, seconds):
+        self.glyphs[glyph_name] = seconds
+
+    def slowest_glyphs(self, n=10):
+        """Return the 'n' slowest (glyph name, seconds) pairs, slowest first."""
+        return sorted(self.glyphs.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def summary(self, top=10):
+        """Return a JSON-serializable dict with the stage timings, the total
+        time spent compiling glyph programs and the 'top' slowest of them.
+        """
+        return {
+            "stages": dict(self.stages),
+            "glyphs": {
+                "count": len(self.glyphs),
+                "seconds": sum(self.glyphs.values()),
+            },
+            "slowest_glyphs": [
+                {"name": name, "seconds": seconds}
+                for name, seconds in self.slowest_glyphs(top)
+            ],
+        }
+
+    def format_summary(self, top=10):
+        """Return the summary as human readable text."""
+        summary = self.summary(top)
+        lines = ["Stage                          Time (ms)"]
+        for name, seconds in summary["stages"].items():
+            lines.append("  %-26s %10.3f" % (name, seconds * 1000))
+        glyphs = summary["glyphs"]
+        lines.append(
+            "Compiled %d glyph programs in %.3f ms"
+            % (glyphs["count"], glyphs["seconds"] * 1000)
+        )
+        if summary["slowest_glyphs"]:
+            lines.append("Slowest glyph programs         Time (ms)")
+            for item in summary["slowest_glyphs"]:
+                lines.append("  %-26s %10.3f" % (item["name"], item["seconds"] * 1000))
+        return "\n".join(lines)
+
+    def save(self, path, top=10):
+        """Write the summary to 'path' as JSON."""
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(self.summary(top), fp, indent=2)
@@ -0,0 +1,316 @@
+"""A long running compile server keeping a font and its compiled programs warm.
+
+The server holds a CompileSession: the font read once, with vttLib, fontTools
+and the assembly grammar imported, and a MemoryCache of the compiled glyph
+programs and 'fpgm' functions, so that compiling a glyph again, or the whole
+font after editing a few programs, only compiles what changed.
+
+Requests are JSON-RPC 2.0 messages, one per line, read from stdin (answered on
+stdout) or from the connections to a Unix socket. The methods are those of
+CompileSession listed in CompileSession.METHODS, called with named or
+positional params, e.g.:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "compile_glyph",
+     "params": {"glyph": "A", "assembly": "SVTCA[Y]\\nMIAP[R], 1, 2"}}
+
+    {"jsonrpc": "2.0", "id": 2, "method": "compile_font",
+     "params": {"outfile": "Font-hinted.ttf", "ship": true}}
+
+Errors raised while handling a request are returned as JSON-RPC errors with
+code -32000, and the server keeps running.
+"""
+import inspect
+import json
+import logging
+import os
+import socketserver
+import stat
+import sys
+import time
+
+from fontTools.ttLib import TTFont, newTable
+
+import vttLib
+import vttLib.cache
+import vttLib.lazy
+
+__all__ = ["CompileSession", "handle_request", "serve_stdio", "serve_unix_socket"]
+
+log = logging.getLogger(__name__)
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+TSI_TABLES = ("TSI0", "TSI1", "TSI2", "TSI3", "TSI5", "TSIC")
+
+
+class CompileSession(object):
+    """A font with VTT sources and the state kept between compilations."""
+
+    METHODS = (
+        "open",
+        "reload",
+        "status",
+        "get_glyph_assembly",
+        "set_extra_assembly",
+        "compile_glyph",
+        "compile_font",
+        "save",
+        "shutdown",
+    )
+
+    def __init__(self, path=None, cache=None, jobs=1):
+        # 'cache' is a vttLib.cache.MemoryCache, by default a new one
+        self.path = None
+        self.font = None
+        self.cache = cache if cache is not None else vttLib.cache.MemoryCache()
+        self.jobs = jobs
+        self.running = True
+        if path is not None:
+            self.open(path)
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self.path)
+
+    def _font(self):
+        if self.font is None:
+            raise vttLib.VTTLibArgumentError("No font is open")
+        return self.font
+
+    def open(self, path):
+        """Read the font at 'path', which must contain VTT sources."""
+        if not os.path.exists(path):
+            raise vttLib.VTTLibArgumentError("Input TTF '%s' not found." % path)
+        font = TTFont(path)
+        if "TSI1" not in font:
+            raise vttLib.VTTLibError("The font contains no 'TSI1' table")
+        self.path = os.fspath(path)
+        self.font = font
+        return self.status()
+
+    def reload(self):
+        """Read the font again, e.g. after it was saved from VTT."""
+        self._font()
+        return self.open(self.path)
+
+    def status(self):
+        font = self.font
+        return {
+            "path": self.path,
+            "glyphs": len(font.getGlyphOrder()) if font is not None else 0,
+            "cache": {
+                "entries": len(self.cache),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+        }
+
+    def get_glyph_assembly(self, glyph):
+        return {"assembly": vttLib.get_glyph_assembly(self._font(), glyph)}
+
+    def set_extra_assembly(self, name, assembly):
+        """Set the VTT source of the 'fpgm', 'prep' or 'cvt' program; it is
+        compiled with the next compile_font.
+        """
+        vttLib.set_extra_assembly(self._font(), name, assembly)
+
+    def compile_glyph(self, glyph, assembly=None):
+        """Compile the glyph program, after setting its VTT assembly if given.
+        The 'fpgm', 'prep' and 'cvt' are those of the last compile_font.
+        """
+        font = self._font()
+        start = time.perf_counter()
+        if assembly is not None:
+            vttLib.set_glyph_assembly(font, glyph, assembly)
+        program = vttLib.compile_glyph_instructions(font, glyph, self.cache)
+        bytecode = program.getBytecode() if program else b""
+        return {
+            "glyph": glyph,
+            "bytecode": bytecode.hex(),
+            "size": len(bytecode),
+            "seconds": time.perf_counter() - start,
+        }
+
+    def compile_font(
+        self,
+        outfile=None,
+        ship=False,
+        keep_cvar=False,
+        strip_unused_functions=False,
+        optimize=False,
+    ):
+        """Compile all the VTT programs of the font, and save it to 'outfile'
+        if given, without the TSI* tables if 'ship' is true. The font keeps
+        its VTT sources in any case.
+        """
+        font = self._font()
+        start = time.perf_counter()
+        hits, misses = self.cache.hits, self.cache.misses
+        vttLib.compile_instructions(
+            font,
+            ship=False,
+            keep_cvar=keep_cvar,
+            jobs=self.jobs,
+            cache=self.cache,
+            strip_unused_functions=strip_unused_functions,
+            optimize=optimize,
+        )
+        if outfile is not None:
+            if ship:
+                _save_without_tables(font, outfile, TSI_TABLES)
+            else:
+                font.save(outfile)
+        return {
+            "outfile": outfile,
+            "seconds": time.perf_counter() - start,
+            "cache": {
+                "hits": self.cache.hits - hits,
+                "misses": self.cache.misses - misses,
+            },
+        }
+
+    def save(self, path=None):
+        """Save the font with its VTT sources, by default where it was read."""
+        font = self._font()
+        path = self.path if path is None else path
+        font.save(path)
+        return {"path": path}
+
+    def shutdown(self):
+        self.running = False
+
+
+def _save_without_tables(font, path, tags):
+    # save the font without the tables, but keep them in the font
+    for tag in vttLib.lazy.INDEX_TABLES:
+        if tag in tags and tag in font:
+            # before its index table is removed from the font file
+            vttLib.lazy.load_lazy_table(font, tag)
+    removed = {}
+    for tag in tags:
+        if tag not in font:
+            continue
+        if tag in vttLib.lazy.INDEX_TABLES.values():
+            # rebuilt when the programs tables are compiled
+            removed[tag] = newTable(tag)
+        else:
+            removed[tag] = font[tag]
+        del font[tag]
+    try:
+        font.save(path)
+    finally:
+        for tag, table in removed.items():
+            font[tag] = table
+
+
+def _error(request_id, code, message):
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def _call(session, request):
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return _error(None, INVALID_REQUEST, "Invalid request")
+    request_id = request.get("id")
+    method = request["method"]
+    params = request.get("params", {})
+    if method not in session.METHODS:
+        return _error(request_id, METHOD_NOT_FOUND, "Unknown method: %s" % method)
+    func = getattr(session, method)
+    if isinstance(params, list):
+        args, kwargs = params, {}
+    elif isinstance(params, dict):
+        args, kwargs = [], params
+    else:
+        return _error(request_id, INVALID_PARAMS, "params must be an array or object")
+    try:
+        inspect.signature(func).bind(*args, **kwargs)
+    except TypeError as e:
+        return _error(request_id, INVALID_PARAMS, "Invalid params: %s" % e)
+
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:  # report the error, keep serving
+        log.debug("Request %r failed", method, exc_info=True)
+        message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+        return _error(request_id, SERVER_ERROR, message)
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def handle_request(session, line):
+    """Handle a JSON-RPC request line; return the response as a dict, or
+    None for notifications (requests without an id).
+    """
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return _error(None, PARSE_ERROR, "Parse error: %s" % e)
+    response = _call(session, request)
+    if isinstance(request, dict) and "id" not in request:
+        return None
+    return response
+
+
+def _serve_lines(session, lines, write):
+    for line in lines:
+        if not line.strip():
+            continue
+        response = handle_request(session, line)
+        if response is not None:
+            write(json.dumps(response) + "\n")
+        if not session.running:
+            break
+
+
+def serve_stdio(session, stdin=None, stdout=None):
+    """Answer the requests read from 'stdin' on 'stdout' (by default, those
+    of the process) until the input ends or a shutdown is requested.
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+
+    def write(data):
+        stdout.write(data)
+        stdout.flush()
+
+    _serve_lines(session, stdin, write)
+
+
+def serve_unix_socket(session, path):
+    """Answer the requests sent to the Unix socket at 'path', one connection
+    at a time, until a shutdown is requested.
+    """
+    if not hasattr(socketserver, "UnixStreamServer"):
+        raise vttLib.VTTLibArgumentError("Unix sockets are not supported here")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (line.decode("utf-8") for line in self.rfile)
+
+            def write(data):
+                try:
+                    self.wfile.write(data.encode("utf-8"))
+                    self.wfile.flush()
+                except BrokenPipeError:
+                    log.debug("Client disconnected before the response")
+
+            _serve_lines(session, lines, write)
+
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise vttLib.VTTLibArgumentError("'%s' exists and is not a socket" % path)
+        # left over by a server which didn't exit cleanly
+        os.remove(path)
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        log.info("Listening on '%s'", path)
+        try:
+            while session.running:
+                server.handle_request()
+        finally:
+            os.remove(path)
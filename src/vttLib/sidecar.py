@@ -0,0 +1,178 @@
+"""A compact binary container for the VTT sources of a font.
+
+The sidecar holds named entries of bytes, packed into zlib-compressed blocks
+of about BLOCK_SIZE bytes, so that small programs compress well together but
+any entry can be read by decompressing only its block. The layout is:
+
+- MAGIC, the last byte of which is the format version
+- the header: a zlib-compressed JSON object, with the caller's metadata under
+  "metadata" and the (offset, compressed size) of each block under "blocks"
+- the index: the zlib-compressed entry names, UTF-8 encoded and separated by
+  NUL characters, followed by the (block, offset, size) of each entry as
+  little-endian 32-bit integers
+- the blocks
+
+The header and the index are each preceded by their size, as a little-endian
+32-bit integer. See vttLib.transfer.dump_to_sidecar for the entries holding
+the VTT sources.
+"""
+import json
+import struct
+import zlib
+from collections import OrderedDict
+
+__all__ = ["SidecarError", "write_sidecar", "Sidecar", "is_sidecar"]
+
+MAGIC = b"vttLib\x00\x01"
+BLOCK_SIZE = 0x10000
+# the number of decompressed blocks a Sidecar keeps, most recently used first
+CACHED_BLOCKS = 4
+
+_SIZE = struct.Struct("<I")
+
+
+class SidecarError(Exception):
+    pass
+
+
+def is_sidecar(path):
+    """Return whether the file at 'path' starts like a sidecar."""
+    with open(path, "rb") as fp:
+        return fp.read(len(MAGIC) - 1) == MAGIC[:-1]
+
+
+def write_sidecar(path, entries, metadata=None):
+    """Write the (name, bytes) 'entries' to a sidecar file at 'path', in
+    order, along with the JSON-serializable 'metadata'.
+    """
+    blocks = []
+    locations = []
+    names = []
+    block = []
+    block_size = 0
+    for name, data in entries:
+        names.append(name)
+        locations.extend((len(blocks), block_size, len(data)))
+        block.append(data)
+        block_size += len(data)
+        if block_size >= BLOCK_SIZE:
+            blocks.append(zlib.compress(b"".join(block)))
+            block = []
+            block_size = 0
+    if block:
+        blocks.append(zlib.compress(b"".join(block)))
+
+    names_data = "\0".join(names).encode("utf-8")
+    index = zlib.compress(
+        _SIZE.pack(len(names_data))
+        + names_data
+        + struct.pack("<%dI" % len(locations), *locations)
+    )
+    block_table = []
+    offset = 0
+    for data in blocks:
+        block_table.append((offset, len(data)))
+        offset += len(data)
+    header = zlib.compress(
+        json.dumps({"metadata": metadata, "blocks": block_table}).encode("utf-8")
+    )
+    with open(path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(_SIZE.pack(len(header)))
+        fp.write(header)
+        fp.write(_SIZE.pack(len(index)))
+        fp.write(index)
+        for data in blocks:
+            fp.write(data)
+
+
+class Sidecar(object):
+    """Read the entries of a sidecar file.
+
+    Only the header and the index are read when the file is opened; each block
+    is read and decompressed when one of its entries is requested, and the
+    CACHED_BLOCKS most recently used blocks are kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = open(path, "rb")
+        try:
+            self._read_index()
+        except (struct.error, zlib.error, ValueError) as e:
+            self._fp.close()
+            raise SidecarError("'%s' is not a valid sidecar file: %s" % (path, e))
+        except SidecarError:
+            self._fp.close()
+            raise
+        self._blocks = OrderedDict()
+
+    def __repr__(self):
+        return "<{} {!r} entries={}>".format(
+            type(self).__name__, self.path, len(self._entries)
+        )
+
+    def _read_chunk(self):
+        (size,) = _SIZE.unpack(self._fp.read(_SIZE.size))
+        return zlib.decompress(self._fp.read(size))
+
+    def _read_index(self):
+        magic = self._fp.read(len(MAGIC))
+        if magic[:-1] != MAGIC[:-1]:
+            raise SidecarError("'%s' is not a sidecar file" % self.path)
+        if magic[-1:] > MAGIC[-1:]:
+            raise SidecarError(
+                "Unsupported sidecar version %d in '%s'" % (magic[-1], self.path)
+            )
+        header = json.loads(self._read_chunk())
+        self.metadata = header["metadata"]
+        index = self._read_chunk()
+        data_start = self._fp.tell()
+        self._block_table = [
+            (data_start + offset, size) for offset, size in header["blocks"]
+        ]
+
+        (names_size,) = _SIZE.unpack_from(index)
+        names_end = _SIZE.size + names_size
+        names = index[_SIZE.size : names_end].decode("utf-8").split("\0")
+        if not names_size:
+            names = []
+        locations = struct.unpack_from("<%dI" % (3 * len(names)), index, names_end)
+        self._entries = {
+            name: locations[i : i + 3]
+            for name, i in zip(names, range(0, len(locations), 3))
+        }
+
+    def close(self):
+        self._fp.close()
+        self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def names(self):
+        """Return the list of entry names, in the order they were written."""
+        return list(self._entries)
+
+    def _block(self, number):
+        data = self._blocks.get(number)
+        if data is not None:
+            self._blocks.move_to_end(number)
+            return data
+        offset, size = self._block_table[number]
+        self._fp.seek(offset)
+        data = self._blocks[number] = zlib.decompress(self._fp.read(size))
+        if len(self._blocks) > CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return data
+
+    def read(self, name):
+        """Return the bytes of the entry 'name'; raise KeyError if missing."""
+        block, offset, size = self._entries[name]
+        return self._block(block)[offset : offset + size]
@@ -0,0 +1,87 @@
+"""Subsetting of fonts with VTT sources.
+
+subset_font runs the fontTools subsetter on a font, keeping its VTT sources in
+step: the TSI1, TSI3 and TSI5 tables are rebuilt for the glyphs retained, the
+TSI0 and TSI2 index tables are rebuilt from them when the font is saved, and
+the component instructions of the composite glyphs are rewritten for the new
+glyph indices. The subset can then be compiled like any font with VTT sources;
+compile_instructions(..., strip_unused_functions=True) leaves out the 'fpgm'
+functions which only the removed glyphs called, and lowers
+'maxp.maxFunctionDefs' accordingly.
+
+The control values are kept as they are: they are numbered in the 'prep',
+the 'fpgm' functions and the 'TSIC' table, and are mostly passed to the
+functions as plain numbers, so which ones the removed glyphs used can't be
+told reliably.
+"""
+import copy
+import logging
+
+import vttLib
+import vttLib.lazy
+
+__all__ = ["TSI_TABLES", "subset_font"]
+
+log = logging.getLogger(__name__)
+
+TSI_TABLES = ("TSI0", "TSI1", "TSI2", "TSI3", "TSI5", "TSIC")
+
+
+def _subsetter_options(options):
+    # the fontTools subsetter drops the tables it doesn't know how to subset;
+    # the TSI tables are kept as they are, and subset afterwards
+    from fontTools import subset
+
+    options = copy.copy(options) if options is not None else subset.Options()
+    if options.hinting:
+        options.no_subset_tables = list(options.no_subset_tables) + list(TSI_TABLES)
+        options.drop_tables = [t for t in options.drop_tables if t not in TSI_TABLES]
+    else:
+        options.drop_tables = list(options.drop_tables) + list(TSI_TABLES)
+    return options
+
+
+def subset_font(font, glyphs=(), unicodes=(), options=None):
+    """Subset the font, and its VTT sources, to the 'glyphs' (names) and the
+    'unicodes', with the fontTools subsetter configured by 'options' (a
+    fontTools.subset.Options). The VTT sources are dropped if the options
+    don't keep the hinting.
+
+    Return the set of the names of the glyphs retained.
+    """
+    from fontTools import subset
+
+    options = _subsetter_options(options)
+    if options.hinting:
+        # the programs are indexed by glyph ID in the font file, so they must
+        # be read before the glyph order changes
+        for tag in vttLib.lazy.INDEX_TABLES:
+            if tag in font:
+                vttLib.lazy.load_lazy_table(font, tag)
+        if "TSI5" in font:
+            font["TSI5"]
+
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(glyphs=glyphs, unicodes=unicodes)
+    subsetter.subset(font)
+    retained = set(subsetter.glyphs_retained)
+
+    if options.hinting and "TSI1" in font:
+        vttLib.subset_vtt_glyph_programs(font, retained)
+        programs = font["TSI1"].glyphPrograms
+        glyf_table = font["glyf"]
+        # only the programs holding component instructions are rewritten
+        composites = [
+            name
+            for name in font.getGlyphOrder()
+            if name in programs
+            and glyf_table[name].isComposite()
+            and vttLib.scan_components(vttLib.get_glyph_assembly(font, name))
+        ]
+        report = vttLib.update_composites(font, composites)
+        log.info(
+            "Subset VTT sources to %d glyphs; rewrote the components of %d",
+            len(programs),
+            len(report.rewritten),
+        )
+    return retained
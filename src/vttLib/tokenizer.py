@@ -0,0 +1,169 @@
+"""Single-pass scanner for VTT assembly.
+
+This is a hand-written alternative to the pyparsing grammar in
+:mod:`vttLib.parser`, which is kept as the reference implementation. The
+scanner accepts the same language and produces tokens exposing the same
+attributes (``mnemonic``, ``flags``, ``stack_items``, ``deltas`` and
+``assignment``) as the pyparsing results, so they can be fed to
+:func:`vttLib.transform` interchangeably.
+"""
+import re
+from collections import namedtuple
+
+from vttLib.parser import VTT_MNEMONIC_FLAGS
+
+__all__ = ["Token", "scan", "scan_statement"]
+
+
+Token = namedtuple(
+    "Token", ["mnemonic", "flags", "stack_items", "deltas", "assignment"]
+)
+
+# pyparsing's default whitespace characters
+_WS = r"[ \t\r\n]*"
+_INT = r"[0-9]+(?![0-9])"
+_SIGNED_INT = r"[+-]?[0-9]+(?![0-9])"
+_VARIABLE = r"[A-Za-z][A-Za-z0-9]*"
+
+# whitespace and C-style comments between statements
+_SKIP_RE = re.compile(r"(?:[ \t\r\n]+|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)*")
+_LABEL_RE = re.compile(r"#[A-Za-z0-9]*:")
+_PRAGMA_RE = re.compile(r"#[A-Z]*")
+_JUMP_RE = re.compile(
+    r"(JMPR|JROT|JROF){ws}\[{ws}\]{ws},{ws}\({ws}({var}){ws}={ws}"
+    r"(#[A-Za-z0-9]*){ws}\)".format(ws=_WS, var=_VARIABLE)
+)
+_INSTRUCTION_RE = re.compile(
+    r"([A-Z][A-Z0-9]*){ws}\[{ws}((?:Gr|Bl|Wh|[XYONRrMm12<>])*){ws}".format(ws=_WS)
+)
+_CLOSE_BRACKET_RE = re.compile(_WS + r"\]")
+_FLAG_RE = re.compile(r"Gr|Bl|Wh|.")
+_DELTA_SPEC = r"({int}){ws}@{ws}({int}){ws}({sint})(?:{ws}/8)?".format(
+    int=_INT, sint=_SIGNED_INT, ws=_WS
+)
+_DELTA_RE = re.compile(
+    r"{ws}\({ws}((?:{spec}{ws})*)\)".format(spec=_DELTA_SPEC, ws=_WS)
+)
+_DELTA_SPEC_RE = re.compile(_DELTA_SPEC)
+_STACK_ITEMS_RE = re.compile(
+    r"(?:{ws},{ws}(?:{sint}|\*|{var}))+".format(ws=_WS, sint=_SIGNED_INT, var=_VARIABLE)
+)
+
+_flags_cache = {"": ""}
+
+
+def _convert_flags(flags):
+    try:
+        return _flags_cache[flags]
+    except KeyError:
+        result = _flags_cache[flags] = "".join(
+            VTT_MNEMONIC_FLAGS[f] for f in _FLAG_RE.findall(flags)
+        )
+        return result
+
+
+def _convert_stack_items(text):
+    items = []
+    for item in text.split(",")[1:]:
+        item = item.strip(" \t\r\n")
+        if item == "*":
+            # VTT's "current value" placeholder is dropped, like the grammar does
+            continue
+        if item[0].isalpha():
+            items.append(item)
+        else:
+            items.append(int(item))
+    return items
+
+
+def _scan_stack_items(data, pos):
+    m = _STACK_ITEMS_RE.match(data, pos)
+    if m is None:
+        return [], pos
+    return _convert_stack_items(m.group()), m.end()
+
+
+def _scan_deltas(data, pos):
+    deltas = []
+    while True:
+        m = _DELTA_RE.match(data, pos)
+        if m is None:
+            return deltas, pos
+        delta = []
+        for point_index, rel_ppem, step_no in _DELTA_SPEC_RE.findall(m.group(1)):
+            delta.extend((int(point_index), int(rel_ppem), int(step_no)))
+        deltas.append(delta)
+        pos = m.end()
+
+
+def scan_statement(data, pos):
+    """Return the token of the statement starting at 'pos' in 'data' and the
+    position following it, or None and the position at which parsing failed.
+    """
+    if data.startswith("#", pos):
+        m = _LABEL_RE.match(data, pos)
+        if m is not None:
+            return Token(m.group(), "", [], [], None), m.end()
+        m = _PRAGMA_RE.match(data, pos)
+        stack_items, end = _scan_stack_items(data, m.end())
+        return Token(m.group(), "", stack_items, [], None), end
+
+    if data.startswith("J", pos):
+        m = _JUMP_RE.match(data, pos)
+        if m is not None:
+            mnemonic, variable, label = m.groups()
+            return Token(mnemonic, "", [], [], [variable, label]), m.end()
+
+    m = _INSTRUCTION_RE.match(data, pos)
+    if m is None:
+        return None, pos
+    mnemonic, flags = m.groups()
+    end = m.end()
+    deltas = []
+    if not flags:
+        deltas, end = _scan_deltas(data, end)
+    m = _CLOSE_BRACKET_RE.match(data, end)
+    if m is None:
+        return None, _SKIP_RE.match(data, end).end()
+    stack_items, end = _scan_stack_items(data, m.end())
+    return Token(mnemonic, _convert_flags(flags), stack_items, deltas, None), end
+
+
+def scan(data, parseAll=True):
+    """Tokenize VTT assembly 'data' into a list of Token objects.
+
+    Raises ParseException if 'data' contains no statement at all, or if
+    'parseAll' is True and some trailing input cannot be parsed.
+    """
+    tokens = []
+    pos = error_pos = 0
+    end = len(data)
+    parsed_any = False
+    while True:
+        skipped = _SKIP_RE.match(data, pos).end()
+        if skipped != pos:
+            # a lone comment counts as a (suppressed) statement
+            parsed_any = parsed_any or "/" in data[pos:skipped]
+            pos = skipped
+        if pos == end:
+            break
+        token, new_pos = scan_statement(data, pos)
+        if token is None:
+            error_pos = new_pos
+            break
+        tokens.append(token)
+        parsed_any = True
+        pos = error_pos = new_pos
+
+    if not parsed_any:
+        _raise_parse_error(data, error_pos, "Expected VTT assembly statement")
+    if parseAll and pos != end:
+        _raise_parse_error(data, error_pos, "Invalid VTT assembly statement")
+    return tokens
+
+
+def _raise_parse_error(data, pos, msg):
+    # pyparsing is only imported when there is an error to report
+    from pyparsing import ParseException
+
+    raise ParseException(data, pos, msg)
@@ -1,12 +1,21 @@
 import io
+import json
 import logging
 import os
+from typing import TYPE_CHECKING, Any, List
+from xml.parsers.expat import ParserCreate
 
 import fontTools
 import fontTools.ttLib
-import ufoLib2
+from fontTools.misc import xmlWriter
+from fontTools.misc.textTools import tostr
+from fontTools.misc.xmlReader import BUFSIZE, XMLReader
 
 import vttLib
+import vttLib.sidecar
+
+if TYPE_CHECKING:
+    import ufoLib2
 
 logger = logging.Logger(__name__)
 
@@ -24,7 +33,41 @@ def dump_to_file(font: fontTools.ttLib.TTFont, path: os.PathLike) -> None:
 
     TSI0 and TSI2 are filled in by fontTools. cvar can be rebuilt from TSIC but
     is dumped for historical reasons.
+
+    The TSI1 and TSI3 programs are normalized (see vttLib.normalize_vtt_programs)
+    while they are written out, leaving the font itself untouched. Only the
+    dumped tables are decompiled, so the font may be loaded lazily.
     """
+    tables_to_dump = _tables_to_dump(font)
+
+    writer = xmlWriter.XMLWriter(path, newlinestr="\n")
+    try:
+        writer.begintag(
+            "ttFont",
+            sfntVersion=repr(tostr(font.sfntVersion))[1:-1],
+            ttLibVersion=".".join(fontTools.version.split(".")[:2]),
+        )
+        writer.newline()
+        writer.newline()
+        glyph_names = set(font.getGlyphOrder())
+        for table_tag in tables_to_dump:
+            xml_tag = fontTools.ttLib.tagToXML(table_tag)
+            writer.begintag(xml_tag)
+            writer.newline()
+            if table_tag in ("TSI1", "TSI3"):
+                _write_normalized_programs(writer, font[table_tag], glyph_names)
+            else:
+                font[table_tag].toXML(writer, font)
+            writer.endtag(xml_tag)
+            writer.newline()
+            writer.newline()
+        writer.endtag("ttFont")
+        writer.newline()
+    finally:
+        writer.close()
+
+
+def _tables_to_dump(font):
     tables_to_dump = ["TSI1", "TSI3", "TSI5", "maxp"]
 
     for table_tag in tables_to_dump:
@@ -43,9 +86,92 @@ def dump_to_file(font: fontTools.ttLib.TTFont, path: os.PathLike) -> None:
             vttLib.set_cvt_table(font, control_program)
         tables_to_dump.append("cvt ")
         tables_to_dump.append("cvar")
+    return tables_to_dump
+
+
+def _normalized_programs(table, glyph_names):
+    """Yield the (element, name, text) of the non-empty programs of a TSI1 or
+    TSI3 table in the order its toXML method writes them, normalizing each
+    program on the fly. The text uses '\\n' newlines.
+    """
+    is_talk = table.tableTag == "TSI3"
+    for name in sorted(table.glyphPrograms):
+        text = table.glyphPrograms[name].replace("\r", "\n")
+        if name in glyph_names:
+            text = vttLib._normalize_glyph_program(text, is_talk)
+            text = vttLib._format_vtt_program(text, newline="\n")
+        if text:
+            yield "glyphProgram", name, text
+    if is_talk:
+        # VTT sometimes stores 'reserved' data in TSI3 which isn't needed
+        return
+    for name in sorted(table.extraPrograms):
+        text = table.extraPrograms[name].replace("\r", "\n")
+        if name in ("cvt", "ppgm", "fpgm"):
+            text = vttLib._normalize_extra_program(text)
+            text = vttLib._format_vtt_program(text, newline="\n")
+        if text:
+            yield "extraProgram", name, text
+
+
+def _write_normalized_programs(writer, table, glyph_names):
+    """Write the programs of a TSI1 or TSI3 table like its toXML method does,
+    but normalizing each program on the fly.
+    """
+    writer.newline()
+    for element, name, text in _normalized_programs(table, glyph_names):
+        _write_program(writer, element, name, text)
+
+
+def _write_program(writer, element, name, text):
+    writer.begintag(element, name=name)
+    writer.newline()
+    writer.write_noindent(text)
+    writer.newline()
+    writer.endtag(element)
+    writer.newline()
+    writer.newline()
+
+
+class _SelectiveXMLReader(XMLReader):
+    """A TTX reader which only builds the tables in 'tags'.
 
-    vttLib.normalize_vtt_programs(font)
-    font.saveXML(path, tables=tables_to_dump)
+    The elements of the other tables are skipped as they are parsed, without
+    keeping their content around. Text is buffered by the XML parser, so that
+    each program is passed in one piece rather than line by line.
+    """
+
+    def __init__(self, fileOrPath, ttFont, tags):
+        super().__init__(fileOrPath, ttFont)
+        self.tags = frozenset(tags)
+        self._skipping = 0
+
+    def _parseFile(self, file):
+        parser = ParserCreate()
+        parser.StartElementHandler = self._startElementHandler
+        parser.EndElementHandler = self._endElementHandler
+        parser.CharacterDataHandler = self._characterDataHandler
+        parser.buffer_text = True
+        parser.buffer_size = BUFSIZE
+        parser.ParseFile(file)
+
+    def _startElementHandler(self, name, attrs):
+        if self._skipping:
+            self._skipping += 1
+        elif self.stackSize == 1 and fontTools.ttLib.xmlToTag(name) not in self.tags:
+            self._skipping = 1
+        else:
+            super()._startElementHandler(name, attrs)
+
+    def _endElementHandler(self, name):
+        if self._skipping:
+            self._skipping -= 1
+        else:
+            super()._endElementHandler(name)
+
+    def _characterDataHandler(self, data):
+        if not self._skipping:
+            super()._characterDataHandler(data)
 
 
 def merge_from_file(
@@ -55,36 +181,205 @@ def merge_from_file(
 
     The 'maxp' table is only partially merged, as we want to import only data
     related to TrueType instructions, so it needs to pre-exist.
+
+    The TTX dump is parsed incrementally, and only the tables that are merged
+    are built; everything else in it (including its TSI0 and TSI2, which are
+    rebuilt by fontTools) is skipped.
     """
     if "maxp" not in font:
         raise vttLib.VTTLibArgumentError("'maxp' table not found in target font.")
 
+    ttx_dump = fontTools.ttLib.TTFont()
+    # Import here so we can selectively merge maxp into font.
+    reader = _SelectiveXMLReader(path, ttx_dump, _tables_to_merge(keep_cvar))
+    reader.read()
+    _merge_dump(font, ttx_dump, keep_cvar, "TTX file")
+
+
+def _tables_to_merge(keep_cvar):
+    tables = ["TSI1", "TSI3", "TSI5", "maxp", "TSIC"]
+    if keep_cvar:
+        # 'cvar' is read in terms of the 'cvt '
+        tables.extend(["cvt ", "cvar"])
+    return tables
+
+
+def _merge_dump(font, dump, keep_cvar, file_type):
     TABLES_TO_MERGE = ("TSI0", "TSI1", "TSI2", "TSI3", "TSI5")
     tables_to_merge_optional = ["TSIC"]
     if keep_cvar:
         tables_to_merge_optional.extend(["cvar", "cvt "])
 
-    ttx_dump = fontTools.ttLib.TTFont()
-    ttx_dump.importXML(path)  # Import here so we can selectively merge maxp into font.
-    ttx_dump["TSI0"] = fontTools.ttLib.newTable("TSI0")
-    ttx_dump["TSI2"] = fontTools.ttLib.newTable("TSI2")
+    dump["TSI0"] = fontTools.ttLib.newTable("TSI0")
+    dump["TSI2"] = fontTools.ttLib.newTable("TSI2")
 
-    if keep_cvar and "cvar" not in ttx_dump:
+    if keep_cvar and "cvar" not in dump:
         vttLib.log.warning(
-            "The keep_cvar option was specified, but the TTX file did not include a cvar table."
+            "The keep_cvar option was specified, but the %s did not include a "
+            "cvar table." % file_type
         )
 
     for tsi_table in TABLES_TO_MERGE:
-        font[tsi_table] = ttx_dump[tsi_table]
+        font[tsi_table] = dump[tsi_table]
     for tsi_table in tables_to_merge_optional:
-        if tsi_table in ttx_dump:
-            font[tsi_table] = ttx_dump[tsi_table]
+        if tsi_table in dump:
+            font[tsi_table] = dump[tsi_table]
 
     for maxp_attr in vttLib.MAXP_ATTRS:
-        setattr(font["maxp"], maxp_attr, getattr(ttx_dump["maxp"], maxp_attr))
+        setattr(font["maxp"], maxp_attr, getattr(dump["maxp"], maxp_attr))
+
+
+# The entries of the sidecar written by dump_to_sidecar:
+#
+# - "TSI1/glyphs/NAME", "TSI1/extras/NAME" and "TSI3/glyphs/NAME": the UTF-8
+#   text of each program, with '\r' newlines like in the TSI tables
+# - "TSI5.json": the glyph groups
+# - "maxp.json": the values of the instruction related 'maxp' fields
+# - "tables/TAG": the TSIC, 'cvt ' and 'cvar' tables, compiled
+#
+# The metadata holds the font's sfntVersion and the tags of the dumped tables.
+DUMP_FORMATS = ("ttx", "binary")
+_PROGRAM_DIRS = {"glyphProgram": "glyphs", "extraProgram": "extras"}
+
+
+def _program_entry(tag, element, name):
+    return "%s/%s/%s" % (tag, _PROGRAM_DIRS[element], name)
+
+
+def _sidecar_entries(font, tables_to_dump):
+    glyph_names = set(font.getGlyphOrder())
+    for tag in tables_to_dump:
+        table = font[tag]
+        if tag in ("TSI1", "TSI3"):
+            for element, name, text in _normalized_programs(table, glyph_names):
+                data = text.replace("\n", "\r").encode("utf-8")
+                yield _program_entry(tag, element, name), data
+        elif tag == "TSI5":
+            yield "TSI5.json", json.dumps(table.glyphGrouping).encode("utf-8")
+        elif tag == "maxp":
+            values = {attr: getattr(table, attr) for attr in vttLib.MAXP_ATTRS}
+            yield "maxp.json", json.dumps(values, sort_keys=True).encode("utf-8")
+        else:
+            yield "tables/" + tag, table.compile(font)
+
+
+def dump_to_sidecar(font: fontTools.ttLib.TTFont, path: os.PathLike) -> None:
+    """Dump the same VTT data as dump_to_file to a binary sidecar file (see
+    vttLib.sidecar).
+
+    Merging the sidecar with merge_from_sidecar gives the same tables as
+    merging the TTX dump of the same font.
+    """
+    tables_to_dump = _tables_to_dump(font)
+    metadata = {
+        "sfntVersion": tostr(font.sfntVersion, encoding="latin-1"),
+        "tables": tables_to_dump,
+    }
+    vttLib.sidecar.write_sidecar(path, _sidecar_entries(font, tables_to_dump), metadata)
+
+
+class SidecarReader:
+    """Read the VTT data in a sidecar written by dump_to_sidecar.
+
+    Programs are read one at a time, when requested, without loading the
+    rest of the sidecar.
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        try:
+            self.sidecar = vttLib.sidecar.Sidecar(path)
+        except vttLib.sidecar.SidecarError as e:
+            raise vttLib.VTTLibArgumentError(str(e))
+        self.tables = self.sidecar.metadata["tables"]
+
+    def close(self) -> None:
+        self.sidecar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def program_names(self, tag: str, is_glyph: bool = True) -> List[str]:
+        """Return the names of the glyph (or extra) programs in the 'tag'
+        table, in the order they were dumped.
+        """
+        prefix = "%s/%s/" % (tag, "glyphs" if is_glyph else "extras")
+        return [
+            name[len(prefix) :]
+            for name in self.sidecar.names()
+            if name.startswith(prefix)
+        ]
+
+    def get_program(self, tag: str, name: str, is_glyph: bool = True) -> str:
+        """Return the text of a program, with '\\r' newlines like in the
+        'tag' table. Raise KeyError if it wasn't dumped.
+        """
+        element = "glyphProgram" if is_glyph else "extraProgram"
+        try:
+            data = self.sidecar.read(_program_entry(tag, element, name))
+        except KeyError:
+            raise KeyError(
+                "%s program missing from %s: '%s'"
+                % ("Glyph" if is_glyph else "Extra", tag, name)
+            )
+        return data.decode("utf-8")
+
+    def get_glyph_assembly(self, name: str) -> str:
+        return self.get_program("TSI1", name).replace("\r", "\n")
+
+    def get_glyph_talk(self, name: str) -> str:
+        return self.get_program("TSI3", name).replace("\r", "\n")
+
+    def get_extra_assembly(self, name: str) -> str:
+        return self.get_program("TSI1", name, is_glyph=False).replace("\r", "\n")
+
+    def read_table(self, tag: str, font: fontTools.ttLib.TTFont) -> Any:
+        """Return the 'tag' table rebuilt from the sidecar. Compiled tables are
+        decompiled against 'font', which must hold the 'fvar' and 'cvt ' tables
+        they depend on.
+        """
+        table = fontTools.ttLib.newTable(tag)
+        if tag in ("TSI1", "TSI3"):
+            table.glyphPrograms = {
+                name: self.get_program(tag, name) for name in self.program_names(tag)
+            }
+            table.extraPrograms = {
+                name: self.get_program(tag, name, is_glyph=False)
+                for name in self.program_names(tag, is_glyph=False)
+            }
+        elif tag == "TSI5":
+            table.glyphGrouping = json.loads(self.sidecar.read("TSI5.json"))
+        elif tag == "maxp":
+            for attr, value in json.loads(self.sidecar.read("maxp.json")).items():
+                setattr(table, attr, value)
+        else:
+            table.decompile(self.sidecar.read("tables/" + tag), font)
+        return table
+
+
+def merge_from_sidecar(
+    font: fontTools.ttLib.TTFont, path: os.PathLike, keep_cvar: bool = False
+) -> None:
+    """Merge VTT data from a sidecar written by dump_to_sidecar into the font,
+    like merge_from_file does for a TTX dump.
+    """
+    if "maxp" not in font:
+        raise vttLib.VTTLibArgumentError("'maxp' table not found in target font.")
+
+    dump = fontTools.ttLib.TTFont()
+    if "fvar" in font:
+        # needed to decompile the 'cvar' table
+        dump["fvar"] = font["fvar"]
+    with SidecarReader(path) as reader:
+        for tag in _tables_to_merge(keep_cvar):
+            if tag in reader.tables:
+                dump[tag] = reader.read_table(tag, dump)
+    _merge_dump(font, dump, keep_cvar, "sidecar file")
 
 
-def copy_from_ufo_data_to_file(ufo: ufoLib2.Font, path: os.PathLike) -> None:
+def copy_from_ufo_data_to_file(ufo: "ufoLib2.Font", path: os.PathLike) -> None:
     """Dump VTT data stored in a UFO's data/ structure into a file.
 
     This is used to convert data from Legacy Projects to The New Way.
@@ -0,0 +1,139 @@
+import os
+import shutil
+
+import pytest
+
+import vttLib
+from vttLib.cache import CompileCache, MemoryCache
+
+
+def test_roundtrip(tmp_path):
+    cache = CompileCache(tmp_path)
+    components = [
+        vttLib.OffsetComponent(1, 10, -20, True, False, None),
+        vttLib.AnchorComponent(2, 3, 4, True, False),
+    ]
+    key = cache.key("OFFSET[R], 1, 10, -20")
+
+    assert cache.get(key) is None
+    cache.set(key, b"\x01\x02", components)
+    assert cache.get(key) == (b"\x01\x02", components)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key():
+    assert CompileCache.key("SVTCA[X]") == CompileCache.key("SVTCA[X]")
+    assert CompileCache.key("SVTCA[X]") != CompileCache.key("SVTCA[Y]")
+    assert CompileCache.key("SVTCA[X]") != CompileCache.key("SVTCA[X]", "fpgm")
+
+
+def test_invalid_entry(tmp_path):
+    cache = CompileCache(tmp_path)
+    key = cache.key("SVTCA[X]")
+    cache.set(key, b"\x01", [])
+    path = cache._entry_path(key)
+    with open(path, "w") as fp:
+        fp.write("{")
+
+    assert cache.get(key) is None
+
+
+def test_prune_least_recently_used(tmp_path):
+    cache = CompileCache(tmp_path)
+    keys = [cache.key("PROGRAM%d" % i) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.set(key, b"\x00" * 100, [])
+        os.utime(cache._entry_path(key), (1000 + i, 1000 + i))
+    entry_size = os.path.getsize(cache._entry_path(keys[0]))
+    # using the oldest entry makes it the most recently used one
+    cache.get(keys[0])
+
+    cache.max_size = entry_size * 2
+    assert cache.prune() == 2
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is None
+    assert cache.get(keys[3]) is not None
+
+
+def test_warm_compile_skips_tokenization(
+    tmp_path, original_shared_datadir, monkeypatch
+):
+    orig_ttf = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    orig_ttx = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    cache_dir = tmp_path / "cache"
+    source_ttf = tmp_path / "source.ttf"
+    cold_ttf = tmp_path / "cold.ttf"
+    warm_ttf = tmp_path / "warm.ttf"
+    shutil.copyfile(orig_ttf, source_ttf)
+    vttLib.vtt_merge_file(orig_ttx, source_ttf)
+
+    vttLib.vtt_compile(source_ttf, cold_ttf, cache_dir=cache_dir)
+
+    def tokenize(*args, **kwargs):
+        raise AssertionError("tokenize called with a warm cache")
+
+    monkeypatch.setattr(vttLib, "tokenize", tokenize)
+    vttLib.vtt_compile(source_ttf, warm_ttf, cache_dir=cache_dir)
+
+    assert cold_ttf.read_bytes() == warm_ttf.read_bytes()
+
+    with pytest.raises(AssertionError):
+        vttLib.vtt_compile(source_ttf, warm_ttf)
+
+
+def test_function_roundtrip(tmp_path):
+    cache = CompileCache(tmp_path)
+    key = cache.key("FDEF[], 1\nENDF[]", "fpgm function")
+
+    assert cache.get_function(key) is None
+    cache.set_function(key, True, 1, b"\x2c\x2d")
+    assert cache.get_function(key) == (True, 1, b"\x2c\x2d")
+
+
+def test_font_program_reuses_functions(tmp_path, monkeypatch):
+    functions = [
+        "FDEF[], %d\n#BEGIN\n#PUSHOFF\nSVTCA[X]\n#PUSHON\n#END\nENDF[]" % i
+        for i in range(4)
+    ]
+    cache = CompileCache(tmp_path)
+    cold = vttLib._make_font_program("\n".join(functions), cache=cache)
+
+    compiled = []
+    compile_function = vttLib._compile_function
+
+    def counting_compile_function(tokens):
+        compiled.append(tokens[0].stack_items[-1])
+        return compile_function(tokens)
+
+    monkeypatch.setattr(vttLib, "_compile_function", counting_compile_function)
+    functions[2] = functions[2].replace("SVTCA[X]", "SVTCA[Y]")
+    warm = vttLib._make_font_program("\n".join(functions), cache=cache)
+
+    assert compiled == [2]
+    assert warm.getBytecode() != cold.getBytecode()
+    assert (
+        warm.getBytecode()
+        == vttLib.make_program(
+            "\n".join(functions), "fpgm", backend="assembly"
+        ).getBytecode()
+    )
+
+
+def test_memory_cache():
+    cache = MemoryCache(max_entries=2)
+    keys = [cache.key("PROGRAM%d" % i) for i in range(3)]
+    components = [vttLib.OffsetComponent(1, 10, -20, True, False, None)]
+    assert cache.get(keys[0]) is None
+    cache.set(keys[0], bytearray(b"\x01"), components)
+    cache.set_function(keys[1], True, 7, b"\x02")
+    assert cache.get(keys[0]) == (b"\x01", components)
+    assert cache.get_function(keys[1]) == (True, 7, b"\x02")
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.set(keys[2], b"\x03", [])
+    cache.get(keys[0])
+    assert cache.prune() == 1
+    assert len(cache) == 2
+    assert cache.get_function(keys[1]) is None
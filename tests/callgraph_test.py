@@ -0,0 +1,140 @@
+import shutil
+
+import pytest
+from fontTools.ttLib import TTFont, getTableModule, newTable
+
+import vttLib
+from vttLib.callgraph import find_calls, find_function_usage
+
+
+@pytest.mark.parametrize(
+    "vtt_assembly, expected",
+    [
+        ("CALL[], 1, 2, 83", ({83}, False)),
+        ("LOOPCALL[], 7, 3, 85", ({85}, False)),
+        ("#PUSHOFF\n#PUSH, 5, 84\nCALL[]\n#PUSHON", ({84}, False)),
+        ("#PUSHOFF\nPUSHB[], 2, 86\nCALL[]\n#PUSHON", ({86}, False)),
+        ("CALL[]", (set(), True)),
+        ("CALL[], *", (set(), True)),
+        ("#PUSHOFF\n#PUSH, 84\nSWAP[]\nCALL[]\n#PUSHON", (set(), True)),
+        ("CALL[], 1, 83\nSVTCA[X]\nCALL[], 84", ({83, 84}, False)),
+    ],
+)
+def test_find_calls(vtt_assembly, expected):
+    assert find_calls(vttLib.tokenize(vtt_assembly)) == expected
+
+
+def _font(fpgm, prep, glyph_programs):
+    font = TTFont()
+    font.setGlyphOrder(list(glyph_programs))
+    tsi1 = font["TSI1"] = newTable("TSI1")
+    tsi1.glyphPrograms = {}
+    tsi1.extraPrograms = {}
+    vttLib.set_extra_assembly(font, "fpgm", fpgm)
+    vttLib.set_extra_assembly(font, "prep", prep)
+    for name, data in glyph_programs.items():
+        vttLib.set_glyph_assembly(font, name, data)
+    return font
+
+
+FPGM = """\
+FDEF[], 0
+#BEGIN
+#PUSHOFF
+#PUSH, 3
+CALL[]
+#PUSHON
+#END
+ENDF[]
+FDEF[], 1
+ENDF[]
+FDEF[], 2
+ENDF[]
+FDEF[], 3
+ENDF[]
+FDEF[], 4
+CALL[], 1
+ENDF[]
+"""
+
+
+def test_find_function_usage():
+    font = _font(FPGM, "CALL[], 0", {"a": "CALL[], 2", "b": "SVTCA[X]"})
+
+    usage = find_function_usage(font)
+
+    assert usage.defined == {0, 1, 2, 3, 4}
+    assert usage.used == {0, 2, 3}
+    assert usage.unused == [1, 4]
+    assert usage.dynamic_calls == []
+
+
+def test_find_function_usage_dynamic_calls():
+    font = _font(FPGM, "CALL[], 0", {"a": "CALL[], 2", "b": "CALL[]"})
+
+    usage = find_function_usage(font)
+
+    assert usage.unused == []
+    assert usage.dynamic_calls == ["b"]
+
+
+def test_find_function_usage_idef_calls():
+    fpgm = FPGM + "IDEF[], 145\nCALL[], 2\nENDF[]\n"
+    font = _font(fpgm, "CALL[], 0", {"a": "SVTCA[X]"})
+
+    usage = find_function_usage(font)
+
+    assert usage.used == {0, 2, 3}
+    assert usage.unused == [1, 4]
+
+    font = _font(FPGM + "IDEF[], 145\nCALL[]\nENDF[]\n", "", {})
+    usage = find_function_usage(font)
+    assert usage.unused == []
+    assert usage.dynamic_calls == ["fpgm instruction 145"]
+
+
+def test_find_function_usage_compiled_glyph_programs():
+    font = _font(FPGM, "CALL[], 0", {"a": "SVTCA[X]"})
+    font.setGlyphOrder(["a", "b", "c"])
+    glyf = font["glyf"] = newTable("glyf")
+    glyf.glyphOrder = font.getGlyphOrder()
+    glyf.glyphs = {}
+    for name, data in [("a", ""), ("b", "CALL[], 1, 4"), ("c", "")]:
+        glyph = glyf.glyphs[name] = getTableModule("glyf").Glyph()
+        if data:
+            # compiled, but with no VTT assembly
+            glyph.program = vttLib.make_program(data, components=[])
+
+    usage = find_function_usage(font)
+
+    assert usage.used == {0, 1, 3, 4}
+    assert usage.unused == [2]
+
+    glyf["c"].program = vttLib.make_program("CALL[]", components=[])
+    usage = find_function_usage(font)
+    assert usage.unused == []
+    assert usage.dynamic_calls == ["c"]
+
+
+def test_compile_strip_unused_functions(tmp_path, original_shared_datadir):
+    ttf = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", ttf)
+    vttLib.vtt_merge_file(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx", ttf)
+    font = TTFont(ttf)
+    vttLib.compile_instructions(font, ship=False)
+    stripped = TTFont(ttf)
+    usage = vttLib.compile_instructions(
+        stripped, ship=False, strip_unused_functions=True
+    )
+
+    assert usage.unused and not usage.dynamic_calls
+    fpgm = len(font["fpgm"].program.getBytecode())
+    assert len(stripped["fpgm"].program.getBytecode()) < fpgm
+    assert stripped["maxp"].maxFunctionDefs == max(usage.used) + 1
+    assert stripped["maxp"].maxFunctionDefs < font["maxp"].maxFunctionDefs
+    # the same as filtering the merged functions of the textual assembly
+    tokens = vttLib.tokenize(vttLib.get_extra_assembly(font, "fpgm"))
+    funcs = [vttLib.transform(f) for f in vttLib.split_functions(tokens)]
+    expected = vttLib.make_ft_program(vttLib.merge_functions(funcs, include=usage.used))
+    assert stripped["fpgm"].program.getBytecode() == expected.getBytecode()
+    assert stripped["prep"].program.getBytecode() == font["prep"].program.getBytecode()
@@ -1,5 +1,9 @@
+import json
 import shutil
+import subprocess
+import sys
 from pathlib import Path
+from typing import Any
 
 import fontTools.ttLib
 import pytest
@@ -92,6 +96,58 @@ def test_roundtrip_TSIC_cvar(tmp_path: Path, original_shared_datadir: Path) -> N
     assert "TSIC" not in font
 
 
+def test_roundtrip_binary_sidecar(
+    tmp_path: Path, original_shared_datadir: Path
+) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    source = tmp_path / "source.ttf"
+    shutil.copyfile(font_file, source)
+    vttLib.__main__.main(["mergefile", "--keep-cvar", str(font_file_vtt), str(source)])
+
+    vttLib.__main__.main(["dumpfile", str(source), str(tmp_path / "dump.ttx")])
+    vttLib.__main__.main(
+        ["dumpfile", "--format", "binary", str(source), str(tmp_path / "dump.vttb")]
+    )
+    for name in ("dump.ttx", "dump.vttb"):
+        shutil.copyfile(font_file, tmp_path / (name + ".ttf"))
+        vttLib.__main__.main(
+            [
+                "mergefile",
+                "--keep-cvar",
+                str(tmp_path / name),
+                str(tmp_path / (name + ".ttf")),
+            ]
+        )
+    # the merged fonts are identical
+    from_ttx = (tmp_path / "dump.ttx.ttf").read_bytes()
+    assert (tmp_path / "dump.vttb.ttf").read_bytes() == from_ttx
+
+    # and so is a sidecar dumped again from the merged font
+    vttLib.__main__.main(
+        [
+            "dumpfile",
+            "--format",
+            "binary",
+            str(tmp_path / "dump.vttb.ttf"),
+            str(tmp_path / "again.vttb"),
+        ]
+    )
+    expected = (tmp_path / "dump.vttb").read_bytes()
+    assert (tmp_path / "again.vttb").read_bytes() == expected
+
+    with pytest.raises(SystemExit):
+        vttLib.__main__.main(
+            [
+                "mergefile",
+                "--format",
+                "binary",
+                str(tmp_path / "dump.ttx"),
+                str(tmp_path / "dump.ttx.ttf"),
+            ]
+        )
+
+
 def test_merge_keep_cvar(tmp_path: Path, original_shared_datadir: Path) -> None:
     font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
     font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
@@ -183,3 +239,205 @@ def test_maxp_selective_loading(tmp_path: Path, original_shared_datadir: Path) -
     assert font["maxp"].maxTwilightPoints == 9999
     assert font["maxp"].maxZones == 9999
     assert font["maxp"].numGlyphs == 96
+
+
+def test_compile_jobs(tmp_path: Path, original_shared_datadir: Path) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(font_file, font_file_tmp)
+
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    vttLib.__main__.main(
+        ["compile", "-j", "2", str(font_file_tmp), str(font_file_tmp), "--ship"]
+    )
+    font = fontTools.ttLib.TTFont(font_file_tmp)
+    assert "fpgm" in font
+    assert "TSI1" not in font
+    assert any(font["glyf"][name].program for name in font.getGlyphOrder())
+
+    with pytest.raises(SystemExit):
+        vttLib.__main__.main(["compile", "-j", "-1", str(font_file_tmp)])
+
+
+def test_compile_profile(
+    tmp_path: Path, original_shared_datadir: Path, capsys: Any
+) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    profile_path = tmp_path / "profile.json"
+    shutil.copyfile(font_file, font_file_tmp)
+
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    vttLib.__main__.main(["compile", "--profile", str(font_file_tmp), "-f"])
+    assert "glyphs.tokenize" in capsys.readouterr().out
+
+    vttLib.__main__.main(
+        ["compile", "--profile-output", str(profile_path), str(font_file_tmp), "-f"]
+    )
+    assert capsys.readouterr().out == ""
+    profile = json.loads(profile_path.read_text())
+    assert "fpgm" in profile["stages"]
+    assert len(profile["slowest_glyphs"]) == 10
+
+
+def test_compile_strip_unused_functions(
+    tmp_path: Path, original_shared_datadir: Path, caplog: Any
+) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(font_file, font_file_tmp)
+
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    vttLib.__main__.main(
+        ["compile", str(font_file_tmp), str(tmp_path / "full.ttf"), "--ship"]
+    )
+    with caplog.at_level("INFO", logger="vttLib"):
+        vttLib.__main__.main(
+            [
+                "compile",
+                "--strip-unused-functions",
+                str(font_file_tmp),
+                str(tmp_path / "stripped.ttf"),
+                "--ship",
+            ]
+        )
+    assert "never called" in caplog.text
+
+    full = fontTools.ttLib.TTFont(tmp_path / "full.ttf")
+    stripped = fontTools.ttLib.TTFont(tmp_path / "stripped.ttf")
+    assert len(stripped["fpgm"].program.getBytecode()) < len(
+        full["fpgm"].program.getBytecode()
+    )
+
+
+def test_compile_cache_dir(tmp_path: Path, original_shared_datadir: Path) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    cache_dir = tmp_path / "cache"
+    shutil.copyfile(font_file, font_file_tmp)
+
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    for output in ("cold.ttf", "warm.ttf"):
+        vttLib.__main__.main(
+            [
+                "compile",
+                "--cache-dir",
+                str(cache_dir),
+                str(font_file_tmp),
+                str(tmp_path / output),
+            ]
+        )
+
+    assert any(cache_dir.iterdir())
+    assert (tmp_path / "cold.ttf").read_bytes() == (tmp_path / "warm.ttf").read_bytes()
+
+
+def test_compile_incremental_from(
+    tmp_path: Path, original_shared_datadir: Path
+) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    reference = tmp_path / "reference.ttf"
+    shipped = tmp_path / "shipped.ttf"
+    output = tmp_path / "output.ttf"
+    shutil.copyfile(font_file, font_file_tmp)
+
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    vttLib.__main__.main(["compile", str(font_file_tmp), str(reference)])
+    vttLib.__main__.main(
+        [
+            "compile",
+            "--incremental-from",
+            str(reference),
+            str(font_file_tmp),
+            str(output),
+        ]
+    )
+    assert output.read_bytes() == reference.read_bytes()
+
+    vttLib.__main__.main(["compile", "--ship", str(font_file_tmp), str(shipped)])
+    with pytest.raises(SystemExit):
+        vttLib.__main__.main(
+            [
+                "compile",
+                "--incremental-from",
+                str(shipped),
+                str(font_file_tmp),
+                str(output),
+            ]
+        )
+
+
+def test_compile_batch(tmp_path: Path, original_shared_datadir: Path) -> None:
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for name in ("Regular.ttf", "Bold.ttf"):
+        shutil.copyfile(font_file, sources / name)
+        vttLib.__main__.main(["mergefile", str(font_file_vtt), str(sources / name)])
+    manifest = sources / "fonts.txt"
+    manifest.write_text("# comment\nRegular.ttf\n\nBold.ttf\n")
+    output_dir = tmp_path / "output"
+
+    vttLib.__main__.main(
+        ["compile-batch", "-m", str(manifest), "-d", str(output_dir), "--ship"]
+    )
+    for name in ("Regular.ttf", "Bold.ttf"):
+        font = fontTools.ttLib.TTFont(output_dir / name)
+        assert "fpgm" in font
+        assert "TSI1" not in font
+
+    # failures are reported in the exit status, after compiling the rest
+    (output_dir / "Regular.ttf").unlink()
+    with pytest.raises(SystemExit) as exc_info:
+        vttLib.__main__.main(
+            [
+                "compile-batch",
+                "-d",
+                str(output_dir),
+                str(font_file),
+                str(sources / "Regular.ttf"),
+            ]
+        )
+    assert exc_info.value.code == 1
+    assert (output_dir / "Regular.ttf").exists()
+
+    with pytest.raises(SystemExit):
+        vttLib.__main__.main(["compile-batch"])
+
+
+LAZY_MODULES = ("pyparsing", "ufoLib2", "fontTools.varLib")
+
+
+def test_version_lazy_imports() -> None:
+    code = (
+        "import sys, vttLib.__main__\n"
+        "try:\n"
+        "    vttLib.__main__.main(['--version'])\n"
+        "except SystemExit:\n"
+        "    print([m for m in %r if m in sys.modules])\n" % (LAZY_MODULES,)
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert result.stdout.splitlines()[-1] == "[]"
+
+
+def test_parser_built_on_first_use() -> None:
+    code = (
+        "import sys, vttLib\n"
+        "vttLib.tokenize('SVTCA[X]')\n"
+        "print('pyparsing' in sys.modules)\n"
+        "vttLib.tokenize('SVTCA[X]', engine='pyparsing')\n"
+        "print('pyparsing' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert result.stdout.split() == ["False", "True"]
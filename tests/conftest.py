@@ -7,3 +7,10 @@ import pytest
 @pytest.fixture
 def original_shared_datadir(request: Any) -> Path:
     return Path(request.fspath.dirname, "data")
+
+
+@pytest.fixture(autouse=True)
+def reproducible_timestamps(monkeypatch: Any) -> None:
+    # fontTools stamps 'head.modified' with the current time on save, which
+    # makes byte-for-byte comparisons of compiled fonts flaky
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
@@ -0,0 +1,84 @@
+import pytest
+from fontTools.ttLib import TTFont
+
+import vttLib
+from vttLib.cvt import ControlValue, parse_control_program
+
+CONTROL_PROGRAM = """\
+/* Control Program */
+CATEGORY Stroke
+GROUP Accents
+
+/***** Height CVTs *****/
+UpperCase
+  Grey
+  Y
+  SquareHeight
+      2:   714 /* cap height */
+ASM("SVTCA[Y]")
+ASM("CALL[], 2, 89") /* 9: 99 */
+  RoundHeight
+      3:    11 ~   2 @ 58 /* cap height overshoot */
+/*
+      8:   100
+*/
+Accents
+  Black
+  X
+  Stroke
+  /* a comment */ 5 : -3
+      6:    20 =   5 @255
+"""
+
+
+def test_parse_control_program():
+    cvt = parse_control_program(CONTROL_PROGRAM)
+    assert list(cvt.values) == [0, 0, 714, 11, 0, -3, 20]
+    assert len(cvt) == 7
+    assert 2 in cvt and 0 not in cvt and 8 not in cvt
+    assert cvt.groups == {"Accents"} and cvt.categories == {"Stroke"}
+    assert list(cvt) == [
+        ControlValue(
+            2, 714, "UpperCase", "Grey", "Y", "SquareHeight", None, None, None
+        ),
+        ControlValue(3, 11, "UpperCase", "Grey", "Y", "RoundHeight", "~", 2, 58),
+        ControlValue(5, -3, "Accents", "Black", "X", "Stroke", None, None, None),
+        ControlValue(6, 20, "Accents", "Black", "X", "Stroke", "=", 5, 255),
+    ]
+    assert cvt[3].parent == 2
+    assert cvt.indices(group="UpperCase") == [2, 3]
+    assert cvt.indices(color="Black", relation="=") == [6]
+    with pytest.raises(TypeError, match="Unknown control value attribute"):
+        cvt.indices(colour="Black")
+
+    # parsed once
+    assert parse_control_program(CONTROL_PROGRAM) is cvt
+    table = cvt.to_table()
+    assert table.values == cvt.values and table.values is not cvt.values
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ("", []),
+        ("1: 2\n1: 3", [0, 3]),
+        ("/* a\n 3: 4 */\n 1: 2", [0, 2]),
+        ("12\n: 5", [0] * 12 + [5]),
+        ("a 4: 5\n\n\n  2:3", [0, 0, 3]),
+        ('ASM("PUSH[], 1")\n\t2:-1', [0, 0, -1]),
+    ],
+)
+def test_parse_control_program_values(data, expected):
+    assert list(parse_control_program(data).values) == expected
+
+
+def test_set_cvt_table():
+    font = TTFont()
+    cvt = vttLib.set_cvt_table(font, CONTROL_PROGRAM)
+    assert cvt is parse_control_program(CONTROL_PROGRAM)
+    assert list(font["cvt "].values) == list(cvt.values)
+    assert font["cvt "].values is not cvt.values
+
+    cvt = vttLib.set_cvt_table(font, "/* no control values */")
+    assert len(cvt) == 0
+    assert list(font["cvt "].values) == [0, 0, 714, 11, 0, -3, 20]
@@ -0,0 +1,104 @@
+import shutil
+
+import pytest
+from fontTools.ttLib import TTFont, TTLibError, newTable
+
+import vttLib
+from vttLib.lazy import LazyPrograms, load_lazy_table
+
+
+@pytest.fixture
+def merged_ttf(tmp_path, original_shared_datadir):
+    ttf = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", ttf)
+    vttLib.vtt_merge_file(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx", ttf)
+    return ttf
+
+
+def test_lazy_programs(merged_ttf):
+    expected = TTFont(merged_ttf)
+    font = TTFont(merged_ttf)
+    expected_assembly = expected["TSI1"].glyphPrograms["A"].replace("\r", "\n")
+    assert vttLib.get_glyph_assembly(font, "A") == expected_assembly
+    assert not font.isLoaded("TSI3")
+    for tag in ("TSI1", "TSI3"):
+        table = load_lazy_table(font, tag)
+        assert font[tag] is table
+        assert isinstance(table.glyphPrograms, LazyPrograms)
+        assert dict(table.glyphPrograms) == expected[tag].glyphPrograms
+        assert dict(table.extraPrograms) == expected[tag].extraPrograms
+        assert list(table.glyphPrograms) == list(expected[tag].glyphPrograms)
+        assert type(table).__name__ == "Lazy" + type(expected[tag]).__name__
+    with pytest.raises(KeyError, match="Glyph program missing from TSI1: 'missing'"):
+        vttLib.get_glyph_assembly(font, "missing")
+
+
+def test_lazy_programs_loaded_table(merged_ttf):
+    font = TTFont(merged_ttf)
+    table = font["TSI1"]
+    assert load_lazy_table(font, "TSI1") is table
+    assert isinstance(table.glyphPrograms, dict)
+
+    font = TTFont()
+    font["TSI1"] = newTable("TSI1")
+    font["TSI1"].glyphPrograms = {}
+    vttLib.set_glyph_assembly(font, "A", "SVTCA[Y]")
+    assert font["TSI1"].glyphPrograms == {"A": "SVTCA[Y]\r"}
+
+
+def test_lazy_programs_save_unchanged(merged_ttf, tmp_path):
+    font = TTFont(merged_ttf)
+    vttLib.get_glyph_assembly(font, "A")
+    vttLib.get_glyph_talk(font, "A")
+    font.save(tmp_path / "saved.ttf")
+
+    original = TTFont(merged_ttf)
+    saved = TTFont(tmp_path / "saved.ttf")
+    for tag in ("TSI0", "TSI1", "TSI2", "TSI3"):
+        assert saved.reader[tag] == original.reader[tag]
+
+
+def test_lazy_programs_save_changed(merged_ttf):
+    font = TTFont(merged_ttf)
+    expected = dict(TTFont(merged_ttf)["TSI1"].glyphPrograms)
+    vttLib.set_glyph_assembly(font, "A", "SVTCA[Y]\nMDAP[R], 1")
+    del font["TSI1"].glyphPrograms["B"]
+    # saving over the memory-mapped file
+    font.save(merged_ttf)
+    assert vttLib.get_glyph_assembly(font, "C") == expected["C"].replace("\r", "\n")
+
+    expected["A"] = "SVTCA[Y]\rMDAP[R], 1\r"
+    del expected["B"]
+    assert TTFont(merged_ttf)["TSI1"].glyphPrograms == expected
+
+
+def test_lazy_programs_long_program(merged_ttf, tmp_path):
+    font = TTFont(merged_ttf)
+    data = "\n".join("/* %05d */" % i for i in range(4000))
+    assert len(data) > 0x8000
+    vttLib.set_glyph_assembly(font, "A", data)
+    vttLib.set_glyph_assembly(font, "B", "SVTCA[Y]")
+    font.save(tmp_path / "long.ttf")
+
+    font = TTFont(tmp_path / "long.ttf")
+    assert vttLib.get_glyph_assembly(font, "A") == data + "\n"
+    assert vttLib.get_glyph_assembly(font, "B") == "SVTCA[Y]\n"
+
+
+def test_compile_lazy(merged_ttf, tmp_path):
+    vttLib.vtt_compile(merged_ttf, tmp_path / "eager.ttf", ship=True)
+    font = TTFont(merged_ttf)
+    load_lazy_table(font, "TSI1")
+    vttLib.compile_instructions(font, ship=True)
+    font.save(tmp_path / "lazy.ttf")
+    assert (tmp_path / "lazy.ttf").read_bytes() == (tmp_path / "eager.ttf").read_bytes()
+
+
+def test_lazy_programs_bad_index(merged_ttf, tmp_path):
+    font = TTFont(merged_ttf)
+    font["TSI0"] = newTable("TSI0")
+    font["TSI0"].indices = font["TSI0"].extra_indices = []
+    font.save(tmp_path / "bad.ttf")
+    font = TTFont(tmp_path / "bad.ttf")
+    with pytest.raises(TTLibError, match="bad magic number in 'TSI0' table"):
+        vttLib.get_glyph_assembly(font, "A")
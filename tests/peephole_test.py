@@ -0,0 +1,224 @@
+import shutil
+
+import fontTools.ttLib
+import pytest
+from fontTools.ttLib.tables.ttProgram import Program
+
+import vttLib
+import vttLib.__main__
+from vttLib.peephole import (
+    _MNEMONICS,
+    _STACK_EFFECTS,
+    STATE_READS,
+    STATE_WRITES,
+    _decode,
+    optimize_bytecode,
+    optimize_glyph_programs,
+)
+
+
+def _trace(bytecode):
+    """Run the bytecode symbolically: return the graphics state as seen by
+    every instruction which isn't a state setter, with its arguments, and the
+    final state and stack. Two programs with the same trace are equivalent.
+    """
+    stack = []
+    state = {}
+    events = []
+    underflows = 0
+
+    def pop():
+        nonlocal underflows
+        if stack:
+            return stack.pop()
+        underflows += 1
+        return ("underflow", len(events), underflows)
+
+    for op, values, _ in _decode(bytecode):
+        if values is not None:
+            stack.extend(("value", v) for v in values)
+            continue
+        effect = _STACK_EFFECTS.get(op)
+        if effect is None:
+            # unknown effect on the stack: everything on it may be used
+            events.append((op, tuple(stack), tuple(sorted(state.items()))))
+            stack = []
+            continue
+        pops, pushes = effect
+        args = tuple(pop() for _ in range(pops))
+        mnemonic = _MNEMONICS[op]
+        if mnemonic == "POP":
+            continue
+        if mnemonic in STATE_WRITES:
+            reads = tuple(
+                sorted((k, state.get(k)) for k in STATE_READS.get(mnemonic, ()))
+            )
+            for key in STATE_WRITES[mnemonic]:
+                state[key] = (op, args, reads)
+        else:
+            events.append((op, args, tuple(sorted(state.items()))))
+        stack.extend(("result", len(events), i) for i in range(pushes))
+    return events, sorted(state.items()), stack
+
+
+def _bytecode(vtt_assembly):
+    return vttLib.make_program(vtt_assembly, components=[]).getBytecode()
+
+
+def _ft_bytecode(ft_assembly):
+    program = Program()
+    program.fromAssembly(ft_assembly)
+    return program.getBytecode()
+
+
+@pytest.mark.parametrize(
+    "vtt_assembly, expected",
+    [
+        ("SVTCA[X]\nSVTCA[Y]\nMDAP[R], 2", "PUSHB[ ] 2 SVTCA[0] MDAP[1]"),
+        (
+            "SRP0[], 3\nSRP0[], 4\nMDRP[m>RBl], 5",
+            "PUSHB[ ] 5 4 SRP0[ ] MDRP[01101]",
+        ),
+        (
+            "SPVTCA[X]\nSFVTCA[Y]\nSVTCA[X]\nMDAP[R], 2",
+            "PUSHB[ ] 2 SVTCA[1] MDAP[1]",
+        ),
+        (
+            "SZP0[], 0\nSZP1[], 1\nSZP2[], 1\nSZPS[], 1\nMDAP[R], 2",
+            "PUSHB[ ] 2 1 SZPS[ ] MDAP[1]",
+        ),
+        ("RTG[]\nRDTG[]\nMDAP[R], 2", "PUSHB[ ] 2 RDTG[ ] MDAP[1]"),
+        (
+            "#PUSHOFF\nPUSHB[], 1\nPUSHB[], 2\nSRP1[]\nSRP2[]\n#PUSHON",
+            "PUSHB[ ] 1 2 SRP1[ ] SRP2[ ]",
+        ),
+        ("#PUSHOFF\n#PUSH, 7\nPOP[]\n#PUSHON\nSVTCA[X]", "SVTCA[1]"),
+        (
+            "#PUSHOFF\n#PUSH, 300\n#PUSH, 1\nSRP0[]\nSRP0[]\n#PUSHON",
+            "PUSHW[ ] 300 SRP0[ ]",
+        ),
+    ],
+)
+def test_optimize_bytecode(vtt_assembly, expected):
+    bytecode = _bytecode(vtt_assembly)
+    optimized = optimize_bytecode(bytecode)
+    assert optimized == _ft_bytecode(expected)
+    assert _trace(optimized) == _trace(bytecode)
+
+
+@pytest.mark.parametrize(
+    "vtt_assembly",
+    [
+        # the state set first is read by the next instruction
+        "SPVTCA[X]\nSFVTPV[]\nMDAP[R], 2",
+        "SZP1[], 0\nSPVTL[r], 1, 2",
+        # the next instruction doesn't set everything
+        "SVTCA[X]\nSFVTCA[Y]\nMDAP[R], 2",
+        "SZPS[], 0\nSZP0[], 1",
+        # the pushed argument isn't known, after a CALL
+        "CALL[], 3, 4\nSRP0[]\nSRP0[], 4",
+        "#PUSHOFF\n#PUSH, 1, 2\nIF[]\nPOP[]\nEIF[]\n#PUSHON",
+        "",
+    ],
+)
+def test_optimize_bytecode_unchanged(vtt_assembly):
+    bytecode = _bytecode(vtt_assembly)
+    assert optimize_bytecode(bytecode) == bytecode
+
+
+def test_optimize_bytecode_skips_jumps():
+    bytecode = _ft_bytecode("PUSHB[ ] 3 JMPR[ ] SVTCA[1] SVTCA[0]")
+    assert optimize_bytecode(bytecode) == bytecode
+
+
+def test_optimize_bytecode_keeps_larger_merge():
+    # merging a word push with a byte push would need NPUSHW
+    bytecode = _ft_bytecode("PUSHW[ ] 300 PUSHB[ ] 1 2 3 4 5 6 7 SRP0[ ]")
+    assert optimize_bytecode(bytecode) == bytecode
+
+
+def test_optimize_noto_programs(original_shared_datadir):
+    font = fontTools.ttLib.TTFont(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf")
+    font.importXML(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx")
+    programs = []
+    for glyph_name in font.getGlyphOrder():
+        try:
+            data = vttLib.get_glyph_assembly(font, glyph_name)
+        except KeyError:
+            continue
+        programs.append(data)
+        # redundant instructions a hand-written program might contain
+        programs.append("SVTCA[X]\nSRP0[], 3\nRTG[]\nRTG[]\n" + data)
+    for tag in ("prep", "fpgm"):
+        programs.append(vttLib.get_extra_assembly(font, tag))
+
+    saved = 0
+    for data in programs:
+        bytecode = _bytecode(data)
+        optimized = optimize_bytecode(bytecode)
+        assert len(optimized) <= len(bytecode)
+        assert _trace(optimized) == _trace(bytecode)
+        saved += len(bytecode) - len(optimized)
+    assert saved > 0
+
+
+def test_optimize_glyph_programs():
+    font = fontTools.ttLib.TTFont()
+    font.setGlyphOrder([".notdef", "A", "B"])
+    glyf = font["glyf"] = fontTools.ttLib.newTable("glyf")
+    glyf.glyphs = {}
+    glyf.glyphOrder = font.getGlyphOrder()
+    for glyph_name, data in [
+        (".notdef", ""),
+        ("A", "SVTCA[X]\nSVTCA[Y]\nMDAP[R], 2"),
+        ("B", "SVTCA[Y]\nMDAP[R], 2"),
+    ]:
+        glyph = glyf.glyphs[glyph_name] = fontTools.ttLib.getTableModule("glyf").Glyph()
+        if data:
+            glyph.program = vttLib.make_program(data, components=[])
+
+    assert optimize_glyph_programs(font) == {"A": 1}
+    assert glyf["A"].program.getBytecode() == glyf["B"].program.getBytecode()
+    assert optimize_glyph_programs(font) == {}
+
+
+def test_compile_optimize(tmp_path, original_shared_datadir, caplog):
+    font_file = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    font_file_vtt = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    font_file_tmp = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(font_file, font_file_tmp)
+    vttLib.__main__.main(["mergefile", str(font_file_vtt), str(font_file_tmp)])
+    font = fontTools.ttLib.TTFont(font_file_tmp)
+    data = vttLib.get_glyph_assembly(font, "A")
+    vttLib.set_glyph_assembly(font, "A", "SVTCA[X]\nSRP0[], 3\nSRP0[], 4\n" + data)
+    font.save(font_file_tmp)
+
+    vttLib.__main__.main(
+        ["compile", str(font_file_tmp), str(tmp_path / "plain.ttf"), "--ship"]
+    )
+    with caplog.at_level("DEBUG", logger="vttLib"):
+        vttLib.__main__.main(
+            [
+                "compile",
+                "--optimize",
+                str(font_file_tmp),
+                str(tmp_path / "optimized.ttf"),
+                "--ship",
+            ]
+        )
+    assert "Saved 3 bytes in glyph 'A'" in caplog.text
+    assert "saved 3 bytes in 1 glyph programs" in caplog.text
+
+    plain = fontTools.ttLib.TTFont(tmp_path / "plain.ttf")
+    optimized = fontTools.ttLib.TTFont(tmp_path / "optimized.ttf")
+    for glyph_name in plain.getGlyphOrder():
+        glyph = plain["glyf"][glyph_name]
+        if not hasattr(glyph, "program"):
+            continue
+        expected = glyph.program.getBytecode()
+        actual = optimized["glyf"][glyph_name].program.getBytecode()
+        if glyph_name == "A":
+            assert len(actual) == len(expected) - 3
+            assert _trace(actual) == _trace(expected)
+        else:
+            assert actual == expected
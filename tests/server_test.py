@@ -0,0 +1,187 @@
+import io
+import json
+import shutil
+import socket
+import threading
+import time
+
+import pytest
+from fontTools.ttLib import TTFont
+
+import vttLib
+import vttLib.__main__
+from vttLib.server import CompileSession, handle_request, serve_stdio, serve_unix_socket
+
+
+@pytest.fixture
+def merged_ttf(tmp_path, original_shared_datadir):
+    ttf = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", ttf)
+    vttLib.vtt_merge_file(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx", ttf)
+    return ttf
+
+
+def _request(method, request_id=1, **params):
+    return json.dumps(
+        {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+    )
+
+
+def test_compile_font(merged_ttf, tmp_path):
+    expected_ttf = tmp_path / "expected.ttf"
+    vttLib.vtt_compile(merged_ttf, expected_ttf, ship=True)
+
+    session = CompileSession(merged_ttf)
+    result = session.compile_font(str(tmp_path / "shipped.ttf"), ship=True)
+    assert result["cache"]["hits"] == 0
+    assert (tmp_path / "shipped.ttf").read_bytes() == expected_ttf.read_bytes()
+    # the sources are kept, and nothing needs compiling again
+    assert "TSI1" in session.font
+    result = session.compile_font(str(tmp_path / "shipped2.ttf"), ship=True)
+    assert result["cache"]["misses"] == 0
+    assert (tmp_path / "shipped2.ttf").read_bytes() == expected_ttf.read_bytes()
+
+    session.compile_font(str(tmp_path / "unshipped.ttf"))
+    assert "TSI1" in TTFont(tmp_path / "unshipped.ttf")
+
+
+def test_compile_glyph(merged_ttf):
+    session = CompileSession(merged_ttf)
+    session.compile_font()
+    expected = session.font["glyf"]["A"].program.getBytecode()
+    result = session.compile_glyph("A")
+    assert result["bytecode"] == expected.hex()
+    assert result["size"] == len(expected)
+
+    result = session.compile_glyph("A", "SVTCA[Y]\nMDAP[R], 1")
+    assert result["bytecode"] == "b001002f" and result["size"] == 4
+    assert session.font["glyf"]["A"].program.getBytecode() == b"\xb0\x01\x00\x2f"
+    assert session.get_glyph_assembly("A") == {"assembly": "SVTCA[Y]\nMDAP[R], 1\n"}
+
+
+def test_reload_and_save(merged_ttf, tmp_path):
+    session = CompileSession(merged_ttf)
+    session.compile_glyph("A", "SVTCA[Y]")
+    assert session.save(str(tmp_path / "saved.ttf")) == {
+        "path": str(tmp_path / "saved.ttf")
+    }
+    session.reload()
+    assert session.get_glyph_assembly("A")["assembly"] != "SVTCA[Y]\n"
+    session.open(str(tmp_path / "saved.ttf"))
+    assert session.get_glyph_assembly("A")["assembly"] == "SVTCA[Y]\n"
+
+
+def test_handle_request(merged_ttf):
+    session = CompileSession()
+    response = handle_request(session, _request("status"))
+    assert response == {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {
+            "path": None,
+            "glyphs": 0,
+            "cache": {"entries": 0, "hits": 0, "misses": 0},
+        },
+    }
+    response = handle_request(session, _request("compile_font"))
+    assert response["error"] == {"code": -32000, "message": "No font is open"}
+
+    response = handle_request(
+        session,
+        json.dumps(
+            {"jsonrpc": "2.0", "id": 2, "method": "open", "params": [str(merged_ttf)]}
+        ),
+    )
+    assert response["result"]["glyphs"] == len(session.font.getGlyphOrder())
+
+    response = handle_request(session, _request("compile_glyph", glyph="missing"))
+    assert response["error"] == {
+        "code": -32000,
+        "message": "Glyph program missing from TSI1: 'missing'",
+    }
+    response = handle_request(
+        session, _request("compile_glyph", glyph="A", assembly="SVTCA[Z]")
+    )
+    assert response["error"]["code"] == -32000
+    response = handle_request(session, _request("compile_glyph", name="A"))
+    assert response["error"]["code"] == -32602
+    response = handle_request(session, _request("__init__"))
+    assert response["error"] == {"code": -32601, "message": "Unknown method: __init__"}
+    response = handle_request(session, "{")
+    assert response["error"]["code"] == -32700 and response["id"] is None
+    response = handle_request(session, "[]")
+    assert response["error"]["code"] == -32600
+
+    # notifications get no response
+    notification = json.dumps({"jsonrpc": "2.0", "method": "shutdown"})
+    assert handle_request(session, notification) is None
+    assert not session.running
+
+
+def test_serve_stdio(merged_ttf):
+    stdin = io.StringIO(
+        "\n".join(
+            [
+                _request("open", 1, path=str(merged_ttf)),
+                "",
+                _request("compile_glyph", 2, glyph="A", assembly="SVTCA[Y]"),
+                _request("shutdown", 3),
+                _request("status", 4),
+            ]
+        )
+    )
+    stdout = io.StringIO()
+    serve_stdio(CompileSession(), stdin, stdout)
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [1, 2, 3]
+    assert responses[1]["result"]["bytecode"] == "00"
+    assert responses[2]["result"] is None
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="no Unix sockets")
+def test_serve_unix_socket(merged_ttf, tmp_path):
+    path = str(tmp_path / "vttLib.sock")
+    session = CompileSession(merged_ttf)
+
+    thread = threading.Thread(
+        target=serve_unix_socket, args=(session, path), daemon=True
+    )
+    thread.start()
+    try:
+        for _ in range(100):
+            try:
+                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                client.connect(path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                client.close()
+                time.sleep(0.05)
+        with client, client.makefile("rw") as fp:
+            fp.write(
+                _request("compile_glyph", 1, glyph="A", assembly="SVTCA[X]") + "\n"
+            )
+            fp.flush()
+            assert json.loads(fp.readline())["result"]["bytecode"] == "01"
+            fp.write(_request("shutdown", 2) + "\n")
+            fp.flush()
+            assert json.loads(fp.readline())["result"] is None
+    finally:
+        session.running = False
+        thread.join(5)
+    assert not (tmp_path / "vttLib.sock").exists()
+
+
+def test_serve_cli(merged_ttf, monkeypatch, capsys):
+    monkeypatch.setattr(
+        "sys.stdin", io.StringIO(_request("status") + "\n" + _request("shutdown", 2))
+    )
+    vttLib.__main__.main(["serve", str(merged_ttf)])
+    responses = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert responses[0]["result"]["path"] == str(merged_ttf)
+    assert responses[1]["id"] == 2
+
+    (merged_ttf.parent / "file").write_text("")
+    with pytest.raises(SystemExit):
+        vttLib.__main__.main(
+            ["serve", str(merged_ttf), "--socket", str(merged_ttf.parent / "file")]
+        )
@@ -0,0 +1,65 @@
+import pytest
+
+from vttLib.sidecar import (
+    BLOCK_SIZE,
+    CACHED_BLOCKS,
+    MAGIC,
+    Sidecar,
+    SidecarError,
+    is_sidecar,
+    write_sidecar,
+)
+
+
+def test_roundtrip(tmp_path):
+    entries = [
+        ("empty", b""),
+        ("TSI1/glyphs/é", "SVTCA[Y]\r".encode("utf-8")),
+        ("large", bytes(range(256)) * (BLOCK_SIZE // 128)),
+    ] + [("entry%d" % i, b"%d" % i * 100) for i in range(2000)]
+    path = tmp_path / "test.vttb"
+    write_sidecar(path, iter(entries), {"tables": ["TSI1"]})
+    assert is_sidecar(path)
+
+    with Sidecar(path) as sidecar:
+        assert sidecar.metadata == {"tables": ["TSI1"]}
+        assert sidecar.names() == [name for name, _ in entries]
+        assert "large" in sidecar
+        assert "missing" not in sidecar
+        # random access, decompressing only the block holding the entry
+        assert sidecar.read("entry1500") == b"1500" * 100
+        assert len(sidecar._blocks) == 1
+        for name, data in entries:
+            assert sidecar.read(name) == data
+        # only the most recently used blocks stay decompressed
+        assert len(sidecar._block_table) > CACHED_BLOCKS
+        assert len(sidecar._blocks) == CACHED_BLOCKS
+        assert list(sidecar._blocks)[-1] == len(sidecar._block_table) - 1
+        with pytest.raises(KeyError):
+            sidecar.read("missing")
+
+
+def test_no_entries(tmp_path):
+    path = tmp_path / "empty.vttb"
+    write_sidecar(path, [])
+    with Sidecar(path) as sidecar:
+        assert sidecar.metadata is None
+        assert sidecar.names() == []
+
+
+def test_invalid(tmp_path):
+    path = tmp_path / "test.ttx"
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n<ttFont>\n</ttFont>\n')
+    assert not is_sidecar(path)
+    with pytest.raises(SidecarError, match="not a sidecar"):
+        Sidecar(path)
+
+    path = tmp_path / "truncated.vttb"
+    path.write_bytes(MAGIC + b"\x10\x00")
+    with pytest.raises(SidecarError, match="not a valid sidecar"):
+        Sidecar(path)
+
+    path = tmp_path / "future.vttb"
+    path.write_bytes(MAGIC[:-1] + b"\xff")
+    with pytest.raises(SidecarError, match="Unsupported sidecar version 255"):
+        Sidecar(path)
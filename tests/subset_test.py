@@ -0,0 +1,128 @@
+import shutil
+
+import pytest
+from fontTools import subset
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphComponent
+
+import vttLib
+import vttLib.__main__
+from vttLib.subset import subset_font
+
+
+@pytest.fixture
+def merged_ttf(tmp_path, original_shared_datadir):
+    ttf = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", ttf)
+    vttLib.vtt_merge_file(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx", ttf)
+    return ttf
+
+
+def _composite_font():
+    # 'c' is a composite of 'a' and 'b', after 'x' which isn't used by it
+    glyph_order = [".notdef", "x", "a", "b", "c"]
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    glyphs = {name: pen.glyph() for name in glyph_order[:-1]}
+    composite = glyphs["c"] = Glyph()
+    composite.numberOfContours = -1
+    composite.components = []
+    for name, x in (("a", 0), ("b", 100)):
+        component = GlyphComponent()
+        component.glyphName = name
+        component.x, component.y, component.flags = x, 0, 0
+        composite.components.append(component)
+
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (600, 0) for name in glyph_order})
+    fb.setupHorizontalHeader()
+    fb.setupCharacterMap({0x61: "a", 0x62: "b", 0x63: "c", 0x78: "x"})
+    fb.setupMaxp()
+    fb.setupPost()
+    font = fb.font
+    for tag in ("TSI1", "TSI3"):
+        font[tag] = newTable(tag)
+        font[tag].extraPrograms = {}
+        font[tag].glyphPrograms = {}
+    font["TSI1"].extraPrograms = {"fpgm": "", "ppgm": "", "cvt": ""}
+    font["TSI5"] = newTable("TSI5")
+    font["TSI5"].glyphGrouping = {name: 1 for name in glyph_order}
+    for name in ("x", "a"):
+        vttLib.set_glyph_assembly(font, name, "SVTCA[Y]\nMDAP[R], 1")
+        vttLib.set_glyph_talk(font, name, "/* VTTTalk */")
+    vttLib.set_glyph_assembly(font, "c", "OFFSET[r], 2, 0, 0\nOFFSET[r], 3, 100, 0")
+    return font
+
+
+def test_subset_vtt_glyph_programs():
+    font = _composite_font()
+    vttLib.subset_vtt_glyph_programs(font, ["a", "c"])
+    assert sorted(font["TSI1"].glyphPrograms) == ["a", "c"]
+    assert sorted(font["TSI3"].glyphPrograms) == ["a"]
+    assert font["TSI5"].glyphGrouping == {"a": 1, "c": 1}
+
+
+def test_subset_font():
+    font = _composite_font()
+    options = subset.Options()
+    options.glyph_names = True
+    retained = subset_font(font, unicodes=[0x63], options=options)
+    # the components of 'c' are kept, and moved in the glyph order
+    assert retained == {".notdef", "a", "b", "c"}
+    assert font.getGlyphOrder() == [".notdef", "a", "b", "c"]
+    assert sorted(font["TSI1"].glyphPrograms) == ["a", "c"]
+    assert sorted(font["TSI3"].glyphPrograms) == ["a"]
+    assert sorted(font["TSI5"].glyphGrouping) == [".notdef", "a", "b", "c"]
+    assert vttLib.get_glyph_assembly(font, "c") == (
+        "OFFSET[r], 1, 0, 0\nOFFSET[r], 2, 100, 0\n"
+    )
+    vttLib.compile_instructions(font, ship=True)
+
+    font = _composite_font()
+    options.hinting = False
+    subset_font(font, glyphs=["a"], options=options)
+    assert not any(tag in font for tag in vttLib.subset.TSI_TABLES)
+
+
+def test_subset_font_lazy(merged_ttf, tmp_path):
+    font = TTFont(merged_ttf)
+    expected = {
+        name: program
+        for name, program in TTFont(merged_ttf)["TSI1"].glyphPrograms.items()
+        if name in (".notdef", "B", "C")
+    }
+    options = subset.Options()
+    options.glyph_names = True
+    subset_font(font, unicodes=[0x42, 0x43], options=options)
+    # the programs are read before the glyphs are renumbered
+    assert font["TSI1"].glyphPrograms == expected
+    font.save(tmp_path / "subset.ttf")
+    assert TTFont(tmp_path / "subset.ttf")["TSI1"].glyphPrograms == expected
+
+
+def test_subset_cli(merged_ttf, tmp_path):
+    vttLib.__main__.main(
+        [
+            "subset",
+            str(merged_ttf),
+            str(tmp_path / "shipped.ttf"),
+            "--unicodes",
+            "41-43",
+            "--ship",
+        ]
+    )
+    font = TTFont(tmp_path / "shipped.ttf")
+    assert font.getGlyphOrder() == [".notdef", "A", "B", "C"]
+    assert "TSI1" not in font
+    # the functions only the removed glyphs called are left out
+    assert font["maxp"].maxFunctionDefs < TTFont(merged_ttf)["maxp"].maxFunctionDefs
+
+    with pytest.raises(vttLib.VTTLibArgumentError, match="No glyphs or unicodes"):
+        vttLib.vtt_subset(merged_ttf)
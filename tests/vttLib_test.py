@@ -1,17 +1,53 @@
+import json
 import os
 import shutil
 from textwrap import dedent
+from types import SimpleNamespace
 
 import pytest
-from fontTools.ttLib import TTFont
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._g_l_y_f import (
+    ROUND_XY_TO_GRID,
+    USE_MY_METRICS,
+    Glyph,
+    GlyphComponent,
+)
 
+import vttLib
 from vttLib import (
+    CompositesReport,
+    ParseException,
+    VTTLibError,
+    VTTLibInvalidComposite,
+    _calc_push_size,
+    _calc_stream_size,
+    changed_composites,
+    check_composite_info,
+    compile_instructions,
+    composite_state,
+    get_extra_assembly,
+    get_glyph_assembly,
+    make_compile_manifest,
+    make_cvar_variations,
     make_ft_program,
+    make_program,
+    normalize_vtt_programs,
     pformat_tti,
+    scan_components,
+    set_glyph_assembly,
+    set_glyph_talk,
+    tokenize,
     transform_assembly,
+    update_composites,
     vtt_compile,
+    vtt_compile_many,
+    vtt_dump_file,
     vtt_merge_file,
+    write_composite_info,
 )
+from vttLib.profile import CompileProfile
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
 
@@ -39,6 +75,157 @@ def input_and_expected(request, test_name):
     return input_vtt_assembly, expected_ft_assembly
 
 
+def _normalize_tokens(tokens):
+    return [
+        (
+            t.mnemonic,
+            t.flags,
+            list(t.stack_items),
+            [list(d) for d in t.deltas],
+            list(t.assignment) if t.assignment else None,
+        )
+        for t in tokens
+    ]
+
+
+def _vtt_ttx_programs():
+    font = TTFont()
+    font.importXML(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF-VTT.ttx"))
+    programs = [get_extra_assembly(font, tag) for tag in ("prep", "fpgm")]
+    for name in font.getGlyphOrder():
+        try:
+            programs.append(get_glyph_assembly(font, name))
+        except KeyError:
+            continue
+    return programs
+
+
+class TestTokenize(object):
+    def test_fixtures_match_reference(self, input_and_expected):
+        vtt_assembly, _ = input_and_expected
+
+        assert _normalize_tokens(tokenize(vtt_assembly)) == _normalize_tokens(
+            tokenize(vtt_assembly, engine="pyparsing")
+        )
+
+    def test_font_programs_match_reference(self):
+        for vtt_assembly in _vtt_ttx_programs():
+            if not vtt_assembly.strip():
+                continue
+            assert _normalize_tokens(tokenize(vtt_assembly)) == _normalize_tokens(
+                tokenize(vtt_assembly, engine="pyparsing")
+            )
+
+    @pytest.mark.parametrize(
+        "vtt_assembly",
+        [
+            "MDAP[ R], 1",
+            "MDAP [R ], 1",
+            "MIRP[mRr], 12, +3, -4",
+            "MIAP[Gr<], Var1, *",
+            "SRP0[], *",
+            "#PUSH, 1,2 ,x",
+            "#PUSHON\n#PUSH, 1\n#PUSHOFF",
+            "DLTP1[(4@4 8/8)(5 @ 3 -8)], 1",
+            "DLTP1[ (4@4 8)]",
+            "DLTP1[()]",
+            "/* comment */",
+            "JMPR[], (Var1=#Label1)\n#Label1:",
+            "JMPR[]",
+            "MDAP[R]/*x*/MDAP[r]",
+        ],
+    )
+    def test_edge_cases_match_reference(self, vtt_assembly):
+        assert _normalize_tokens(tokenize(vtt_assembly)) == _normalize_tokens(
+            tokenize(vtt_assembly, engine="pyparsing")
+        )
+
+    @pytest.mark.parametrize(
+        "vtt_assembly",
+        ["", "MDAP[R R]", "#Label1 :", "MDAP[R],/*c*/1", "DLTP1[(4@4 8/80)]"],
+    )
+    def test_invalid(self, vtt_assembly):
+        with pytest.raises(ParseException):
+            tokenize(vtt_assembly, engine="pyparsing")
+        with pytest.raises(ParseException):
+            tokenize(vtt_assembly)
+
+    def test_parse_all_false(self):
+        vtt_assembly = "MDAP[R], 1\nSRP0[], 2\n???"
+
+        assert _normalize_tokens(
+            tokenize(vtt_assembly, parseAll=False)
+        ) == _normalize_tokens(
+            tokenize(vtt_assembly, parseAll=False, engine="pyparsing")
+        )
+
+    def test_invalid_engine(self):
+        with pytest.raises(ValueError):
+            tokenize("SVTCA[X]", engine="foo")
+
+
+class TestProgramBackends(object):
+    def _assert_same_bytecode(self, vtt_assembly, name=None):
+        expected_components = []
+        expected = make_program(
+            vtt_assembly, name, expected_components, backend="assembly"
+        )
+        components = []
+        program = make_program(vtt_assembly, name, components, backend="bytecode")
+        assert program.getBytecode() == expected.getBytecode()
+        assert components == expected_components
+
+    def test_fixtures_match_reference(self, input_and_expected):
+        vtt_assembly, _ = input_and_expected
+        self._assert_same_bytecode(vtt_assembly)
+
+    def test_font_programs_match_reference(self):
+        font = TTFont()
+        font.importXML(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF-VTT.ttx"))
+        for tag in ("prep", "fpgm"):
+            self._assert_same_bytecode(get_extra_assembly(font, tag), tag)
+        for name in font.getGlyphOrder():
+            try:
+                vtt_assembly = get_glyph_assembly(font, name)
+            except KeyError:
+                continue
+            self._assert_same_bytecode(vtt_assembly)
+
+    @pytest.mark.parametrize(
+        "vtt_assembly",
+        [
+            "",
+            "SVTCA[X]",
+            "#PUSHOFF\nPUSHB[], 1, 2\nNPUSHW[], 2, 300, -300\n#PUSHON",
+            # a mix of bytes and words, and more than 255 items
+            "#PUSH, %s" % ", ".join(str(i * 7 % 600 - 100) for i in range(600)),
+            # more than 8 jump variables are pushed with NPUSHW
+            "#PUSHOFF\n#PUSH, %s\n%s\n#Label:\nPOP[]\n#PUSHON"
+            % (
+                ", ".join("Var%d" % i for i in range(10)),
+                "\n".join("JMPR[], (Var%d=#Label)" % i for i in range(10)),
+            ),
+            "OFFSET[R], 1, 10, 20\nSVTCA[Y]\nDLTP1[(4@9 8)], 1",
+        ],
+    )
+    def test_edge_cases_match_reference(self, vtt_assembly):
+        self._assert_same_bytecode(vtt_assembly)
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_font_program_jobs(self, jobs):
+        font = TTFont()
+        font.importXML(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF-VTT.ttx"))
+        vtt_assembly = get_extra_assembly(font, "fpgm")
+        program = vttLib._make_font_program(vtt_assembly, jobs=jobs)
+
+        expected = make_program(vtt_assembly, "fpgm", backend="assembly")
+        assert program.getBytecode() == expected.getBytecode()
+
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError):
+            make_program("SVTCA[X]", backend="foo")
+
+
 class TestTransformAssembly(object):
     def test_empty(self):
         assert not transform_assembly("")
@@ -175,6 +362,39 @@ class TestTransformAssembly(object):
             ).strip()
         )
 
+    def test_jump_many_variables(self):
+        jumps = "\n".join("JMPR[], (Var%d=#Label1)" % i for i in range(1, 10))
+        vtt_assembly = "#PUSHOFF\n#PUSH, %s\n%s\n#Label1:\nDUP[]\n#PUSHON" % (
+            ", ".join("Var%d" % i for i in range(1, 10)),
+            jumps,
+        )
+
+        ft_assembly = transform_assembly(vtt_assembly)
+
+        assert ft_assembly.splitlines() == (
+            ["NPUSHW[] 9 8 7 6 5 4 3 2 1"] + ["JMPR[]"] * 9 + ["DUP[]"]
+        )
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            [1],
+            [-1],
+            [1, 2, 3],
+            [1, 300, 2],
+            [300, 1, 2, 300, 1],
+            list(range(20)),
+            list(range(250, 270)),
+            list(range(-5, 600, 7)),
+            [1000] * 300,
+            [1] * 300,
+        ],
+    )
+    def test_push_size(self, args):
+        stream = [["PUSH[]"] + args]
+
+        assert _calc_push_size(args) == _calc_stream_size(stream)
+
     def test_delta_args_sorting(self):
 
         vtt_assembly = dedent(
@@ -234,3 +454,524 @@ def test_TSIC_compile(tmp_path, original_shared_datadir):
     assert "cvt " in vttLib_font
     assert "cvt " in vtt_font
     assert vttLib_font["cvt "] == vtt_font["cvt "]
+
+
+def test_compile_jobs(tmp_path, original_shared_datadir):
+    orig_ttf = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf"
+    orig_ttx = original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx"
+    serial_ttf = tmp_path / "serial.ttf"
+    parallel_ttf = tmp_path / "parallel.ttf"
+
+    shutil.copyfile(orig_ttf, serial_ttf)
+    vtt_merge_file(orig_ttx, serial_ttf)
+    shutil.copyfile(serial_ttf, parallel_ttf)
+
+    vtt_compile(serial_ttf, force_overwrite=True)
+    vtt_compile(parallel_ttf, force_overwrite=True, jobs=2)
+
+    assert serial_ttf.read_bytes() == parallel_ttf.read_bytes()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compile_profile(tmp_path, original_shared_datadir, jobs):
+    font = TTFont(_merged_noto_font(tmp_path, original_shared_datadir))
+    profile = CompileProfile()
+    compile_instructions(font, ship=False, jobs=jobs, profile=profile)
+
+    # the font has no composite glyphs, so there's no "glyphs.composites"
+    assert set(profile.stages) == {
+        "cvt",
+        "cvar",
+        "prep",
+        "fpgm",
+        "glyphs",
+        "glyphs.tokenize",
+        "glyphs.transform",
+        "glyphs.assemble",
+    }
+    assert all(seconds >= 0 for seconds in profile.stages.values())
+    assert set(profile.glyphs) == {
+        name for name in font.getGlyphOrder() if get_glyph_assembly(font, name)
+    }
+    slowest = profile.slowest_glyphs(3)
+    assert len(slowest) == 3
+    assert slowest[0][1] == max(profile.glyphs.values())
+
+    summary = profile.summary(top=5)
+    assert summary["glyphs"]["count"] == len(profile.glyphs)
+    assert [item["name"] for item in summary["slowest_glyphs"]] == [
+        name for name, _ in profile.slowest_glyphs(5)
+    ]
+    assert "Slowest glyph programs" in profile.format_summary()
+
+
+def _composite_glyph(*components):
+    glyph = Glyph()
+    glyph.numberOfContours = -1
+    glyph.components = []
+    for name, x, y, flags in components:
+        component = GlyphComponent()
+        component.glyphName = name
+        component.x, component.y, component.flags = x, y, flags
+        glyph.components.append(component)
+    return glyph
+
+
+@pytest.mark.parametrize(
+    "glyph_order",
+    [[".notdef", "a", "b"], {".notdef": 0, "a": 1, "b": 2}],
+    ids=["list", "mapping"],
+)
+def test_composite_info_glyph_order(glyph_order):
+    glyph = _composite_glyph(("b", 10, 20, ROUND_XY_TO_GRID), ("a", 0, -5, 0))
+
+    head, instructions, tail = write_composite_info(glyph, glyph_order)
+
+    assert instructions == "OFFSET[R], 2, 10, 20\nOFFSET[r], 1, 0, -5\n"
+    components = []
+    transform_assembly(instructions, components=components)
+    check_composite_info("c", glyph, components, glyph_order, check_flags=True)
+
+    glyph.components[0].glyphName = "a"
+    with pytest.raises(VTTLibInvalidComposite):
+        check_composite_info("c", glyph, components, glyph_order)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "",
+        "SVTCA[Y]\nMDAP[R], 1",
+        "USEMYMETRICS[]\nOFFSET[R], 1, 0, 0\nOFFSET[r], 2, 100, -20\nIUP[X]",
+        "SCALEDCOMPONENTOFFSET[]\nANCHOR[], 2, 3, 4\n"
+        "UNSCALEDCOMPONENTOFFSET[]\nUSEMYMETRICS[]\nOVERLAP[]\nOFFSET[R], 1, 0, 0",
+        "/* OFFSET[R], 9, 9, 9 */\n  OFFSET [ r ] ,1 , +10,\n-5 /* USEMYMETRICS[] */",
+        "USEMYMETRICS[]\nSVTCA[X]\nANCHOR[], 1, 2, 3\nOFFSET[R], 2, 0, 0",
+        # flags outside of those write_composite_info writes
+        "OFFSET[], 1, 2, 3",
+        "OFFSET[X], 1, 2, 3",
+        "OFFSET[Rr], 1, 2, 3",
+        "ANCHOR[r], 1, 2, 3",
+        "ANCHOR[R], 1, 2, 3",
+        # VTT's placeholder for the current value is dropped
+        "OFFSET[R], 1, *, 2, 3",
+    ],
+)
+def test_scan_components(data):
+    components = []
+    transform_assembly(data, components=components)
+    assert scan_components(data) == components
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "OFFSET[R], 1, 2",
+        "OFFSET[R], 1, 2, 3, 4",
+        "SVTCA[X]\nANCHOR[], 1, 2, 3, 4\nIUP[X]",
+        "OFFSET[R, 1, 2, 3",
+    ],
+)
+def test_scan_components_invalid(data):
+    with pytest.raises((ValueError, vttLib.parser.ParseException)):
+        transform_assembly(data, components=[])
+    with pytest.raises(VTTLibInvalidComposite, match="expected 3 stack items"):
+        scan_components(data)
+
+
+def test_update_composites():
+    font = _composite_font()
+    set_glyph_assembly(font, "c", "SVTCA[Y]\nOFFSET[R], 2, 0, 0\nIUP[Y]")
+    set_glyph_assembly(font, "b", "OFFSET[R], 1, 0, 0\nSVTCA[X]")
+    font["glyf"]["c"].components[0].flags |= USE_MY_METRICS
+    assert update_composites(font) == CompositesReport(["c"], ["b"])
+    assert get_glyph_assembly(font, "c") == (
+        "SVTCA[Y]\nUSEMYMETRICS[]\nOFFSET[r], 1, 0, 0\nOFFSET[r], 2, 100, 0\nIUP[Y]\n"
+    )
+    # the components of a simple glyph are dropped along with its assembly
+    assert get_glyph_assembly(font, "b") == "\n"
+    assert get_glyph_assembly(font, "a") == "SVTCA[Y]\nMDAP[R], 1\n"
+    # programs which are up to date are left alone
+    assert update_composites(font) == CompositesReport([], [])
+
+
+def test_update_changed_composites():
+    font = _composite_font()
+    font["glyf"]["d"] = _composite_glyph(("c", 0, 0, 0))
+    font.setGlyphOrder(font.getGlyphOrder() + ["d"])
+    update_composites(font)
+    state = json.loads(json.dumps(composite_state(font)))
+    assert state == {
+        "c": [[1, 0, False, 0, 0], [2, 0, False, 100, 0]],
+        "d": [[3, 0, False, 0, 0]],
+    }
+    assert changed_composites(font, state) == set()
+
+    # a component moved, and base glyphs swapped in the glyph order
+    font["glyf"]["d"].components[0].x = 10
+    font.setGlyphOrder([".notdef", "b", "a", "c", "d"])
+    assert changed_composites(font, state) == {"c", "d"}
+    # composite glyphs made simple, or new ones
+    font["glyf"]["d"] = font["glyf"]["a"]
+    font["glyf"]["a"] = _composite_glyph(("b", 0, 0, 0))
+    changed = changed_composites(font, state)
+    assert changed == {"a", "c", "d"}
+
+    report = update_composites(font, changed, jobs=2)
+    assert report == CompositesReport(["a", "c"], ["d"])
+    assert get_glyph_assembly(font, "c") == (
+        "OFFSET[r], 2, 0, 0\nOFFSET[r], 1, 100, 0\n"
+    )
+    assert changed_composites(font, composite_state(font)) == set()
+
+
+def _synthetic_tsic():
+    cvts = [100 * i for i in range(20)]
+    axes = ["wght", "wdth"]
+    locations = [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [0.5, 0.0], [-1.0, 0.0]]
+    records = []
+    for n, _ in enumerate(locations, start=1):
+        indices = list(range(n - 1, 20, n))
+        values = [cvts[i] + n * (i % 3 - 1) for i in indices]
+        records.append(SimpleNamespace(CVTArray=indices, CVTValueArray=values))
+    tsic = SimpleNamespace(
+        AxisArray=axes,
+        RecordLocations=[SimpleNamespace(Axis=loc) for loc in locations],
+        Record=records,
+    )
+    return tsic, cvts
+
+
+def test_make_cvar_variations():
+    tsic, cvts = _synthetic_tsic()
+
+    variations = make_cvar_variations(tsic, cvts, use_numpy=False)
+
+    assert len(variations) == 5
+    var = next(v for v in variations if v.axes == {"wdth": (0, 1.0, 1)})
+    # CVTs missing from the TSIC record or with a zero delta are omitted
+    assert var.coordinates == [None, None, None, -2, None, 2] * 3 + [None, None]
+
+
+def test_make_cvar_variations_numpy():
+    pytest.importorskip("numpy")
+    tsic, cvts = _synthetic_tsic()
+
+    assert make_cvar_variations(tsic, cvts, use_numpy=True) == make_cvar_variations(
+        tsic, cvts, use_numpy=False
+    )
+
+    font = TTFont()
+    font.importXML(os.path.join(DATA_DIR, "NotoSans-MM-ASCII-VF.ttx"))
+    tsic, cvts = font["TSIC"].table, font["cvt "].values
+    assert make_cvar_variations(tsic, cvts, use_numpy=True) == make_cvar_variations(
+        tsic, cvts, use_numpy=False
+    )
+
+
+def _merged_noto_font(tmp_path, original_shared_datadir):
+    ttf = tmp_path / "NotoSans-MM-ASCII-VF.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", ttf)
+    vtt_merge_file(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx", ttf)
+    return ttf
+
+
+def test_compile_incremental(tmp_path, original_shared_datadir, monkeypatch):
+    source_ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    reference_ttf = tmp_path / "reference.ttf"
+    vtt_compile(source_ttf, reference_ttf)
+
+    font = TTFont(source_ttf)
+    set_glyph_assembly(font, "A", "SVTCA[Y]\nMDAP[R], 1")
+    font.save(source_ttf)
+    full_ttf = tmp_path / "full.ttf"
+    vtt_compile(source_ttf, full_ttf)
+
+    compiled = []
+    make_glyph_program = vttLib.make_glyph_program
+
+    def counting_make_glyph_program(vtt_assembly, name=None):
+        compiled.append(name)
+        return make_glyph_program(vtt_assembly, name)
+
+    monkeypatch.setattr(vttLib, "make_glyph_program", counting_make_glyph_program)
+    incremental_ttf = tmp_path / "incremental.ttf"
+    vtt_compile(source_ttf, incremental_ttf, incremental_from=reference_ttf)
+
+    assert compiled == ["A"]
+    assert incremental_ttf.read_bytes() == full_ttf.read_bytes()
+
+
+def test_compile_incremental_manifest(tmp_path, original_shared_datadir):
+    source_ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(source_ttf)
+    manifest = make_compile_manifest(font)
+    compile_instructions(font, ship=True)
+    assert "TSI1" not in font
+
+    with pytest.raises(VTTLibError):
+        compile_instructions(TTFont(source_ttf), reference=font)
+
+    incremental = TTFont(source_ttf)
+    compile_instructions(
+        incremental, ship=True, reference=font, reference_manifest=manifest
+    )
+    for tag in ("fpgm", "prep"):
+        assert incremental[tag].program == font[tag].program
+    for name in font.getGlyphOrder():
+        assert incremental["glyf"][name] == font["glyf"][name]
+
+
+def test_compile_incremental_stripped_reference(tmp_path, original_shared_datadir):
+    source_ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    full = TTFont(source_ttf)
+    compile_instructions(full, ship=False)
+
+    reference = TTFont(source_ttf)
+    manifest = make_compile_manifest(reference, strip_unused_functions=True)
+    compile_instructions(reference, ship=False, strip_unused_functions=True)
+    assert len(reference["fpgm"].program.getBytecode()) < len(
+        full["fpgm"].program.getBytecode()
+    )
+
+    # whether the reference's 'fpgm' was stripped is recorded in its manifest,
+    # or found from its function definitions
+    for reference_manifest in (manifest, None):
+        incremental = TTFont(source_ttf)
+        compile_instructions(
+            incremental,
+            ship=False,
+            reference=reference,
+            reference_manifest=reference_manifest,
+        )
+        assert incremental["fpgm"].program == full["fpgm"].program
+        assert incremental["maxp"].maxFunctionDefs == full["maxp"].maxFunctionDefs
+
+
+@pytest.mark.parametrize("reference_optimized", [True, False])
+def test_compile_incremental_optimized_reference(
+    tmp_path, original_shared_datadir, reference_optimized
+):
+    source_ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(source_ttf)
+    data = get_glyph_assembly(font, "A")
+    set_glyph_assembly(font, "A", "SVTCA[X]\nSRP0[], 3\nSRP0[], 4\n" + data)
+    font.save(source_ttf)
+
+    reference = TTFont(source_ttf)
+    manifest = make_compile_manifest(reference, optimize=reference_optimized)
+    compile_instructions(reference, ship=False, optimize=reference_optimized)
+
+    optimize = not reference_optimized
+    expected = TTFont(source_ttf)
+    compile_instructions(expected, ship=False, optimize=optimize)
+    assert expected["glyf"]["A"].program != reference["glyf"]["A"].program
+
+    incremental = TTFont(source_ttf)
+    compile_instructions(
+        incremental,
+        ship=False,
+        reference=reference,
+        reference_manifest=manifest,
+        optimize=optimize,
+    )
+    for name in expected.getGlyphOrder():
+        assert incremental["glyf"][name] == expected["glyf"][name]
+
+
+def _composite_font():
+    fb = FontBuilder(1000, isTTF=True)
+    glyph_order = [".notdef", "a", "b", "c"]
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    simple = pen.glyph()
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupGlyf(
+        {
+            ".notdef": simple,
+            "a": simple,
+            "b": simple,
+            "c": _composite_glyph(("a", 0, 0, 0), ("b", 100, 0, 0)),
+        }
+    )
+    fb.setupHorizontalMetrics({name: (600, 0) for name in glyph_order})
+    font = fb.font
+    font["TSI1"] = newTable("TSI1")
+    font["TSI1"].extraPrograms = {"fpgm": "", "ppgm": "", "cvt": ""}
+    font["TSI1"].glyphPrograms = {}
+    set_glyph_assembly(font, "a", "SVTCA[Y]\nMDAP[R], 1")
+    set_glyph_assembly(
+        font, "c", "USEMYMETRICS[]\nOFFSET[R], 1, 0, 0\nOFFSET[r], 2, 100, 0"
+    )
+    return font
+
+
+def test_compile_incremental_components():
+    reference = _composite_font()
+    compile_instructions(reference, ship=False)
+    assert reference["glyf"]["c"].components[0].flags & USE_MY_METRICS
+
+    font = _composite_font()
+    compile_instructions(font, ship=False, reference=reference)
+    assert [c.flags for c in font["glyf"]["c"].components] == [
+        c.flags for c in reference["glyf"]["c"].components
+    ]
+
+    # the base glyphs are moved, so the unchanged VTT assembly is now invalid
+    font = _composite_font()
+    font.setGlyphOrder([".notdef", "b", "a", "c"])
+    with pytest.raises(VTTLibInvalidComposite):
+        compile_instructions(font, ship=False, reference=reference)
+
+
+def test_dump_file(tmp_path, original_shared_datadir):
+    ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(ttf)
+    set_glyph_assembly(
+        font,
+        "A",
+        "/* TT glyph 36, char 0x41 (A) */\n"
+        "/* VTT 6.35 compiler Mon Jan 1 00:00:00 2018 */\n"
+        "SVTCA[Y]\nMDAP[R], 1  \n\n",
+    )
+    set_glyph_talk(font, "A", "/* GUI generated Mon Jan 1 00:00:00 2018 */\nYAnchor(1)")
+    font.save(ttf)
+
+    font = TTFont(ttf, lazy=True)
+    programs = dict(font["TSI1"].glyphPrograms)
+    vttLib.transfer.dump_to_file(font, tmp_path / "streamed.ttx")
+    # only the dumped tables are decompiled, and the font is left unchanged
+    assert not font.isLoaded("glyf")
+    assert font["TSI1"].glyphPrograms == programs
+
+    font = TTFont(ttf)
+    normalize_vtt_programs(font)
+    font.saveXML(
+        tmp_path / "expected.ttx", tables=["TSI1", "TSI3", "TSI5", "maxp", "TSIC"]
+    )
+    assert (
+        get_glyph_assembly(font, "A")
+        == "/* VTT 6.35 compiler */\nSVTCA[Y]\nMDAP[R], 1\n"
+    )
+
+    vtt_dump_file(ttf, tmp_path / "dumped.ttx")
+    expected = (tmp_path / "expected.ttx").read_bytes()
+    assert (tmp_path / "streamed.ttx").read_bytes() == expected
+    assert (tmp_path / "dumped.ttx").read_bytes() == expected
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_normalize_vtt_programs(tmp_path, original_shared_datadir, jobs):
+    ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(ttf)
+    normalize_vtt_programs(font, jobs=jobs)
+    # the programs are already normalized, and aren't written back
+    assert not font["TSI1"].glyphPrograms.modified
+    assert not font["TSI3"].glyphPrograms.modified
+
+    set_glyph_assembly(
+        font,
+        "A",
+        "/* TT glyph 36, char 0x41 (A) */\n"
+        "/* VTT 6.35 compiler Mon Jan 1 00:00:00 2018 */\n"
+        "SVTCA[Y]\nMDAP[R], 1  \n\n",
+    )
+    set_glyph_talk(
+        font,
+        "A",
+        "/* VTTTalk glyph 36, char 0x41 (A) */\n"
+        "/* GUI generated Mon Jan 1 00:00:00 2018 */\nYAnchor(1)",
+    )
+    set_glyph_assembly(font, "B", "/* GUI generated Mon Jan 1 00:00:00 2018 */")
+    normalize_vtt_programs(font, jobs=jobs)
+    assert font["TSI1"].glyphPrograms["A"] == (
+        "/* VTT 6.35 compiler */\rSVTCA[Y]\rMDAP[R], 1\r"
+    )
+    assert font["TSI3"].glyphPrograms["A"] == "YAnchor(1)\r"
+    # only talks have their GUI timestamps stripped
+    assert font["TSI1"].glyphPrograms["B"] == (
+        "/* GUI generated Mon Jan 1 00:00:00 2018 */\r"
+    )
+
+
+def test_merge_file_skips_other_tables(tmp_path, original_shared_datadir):
+    ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(ttf)
+    font.saveXML(tmp_path / "full.ttx")
+    # a table that is not merged is skipped without being parsed
+    data = (tmp_path / "full.ttx").read_text(encoding="utf-8")
+    data = data.replace("<head>", '<head>\n    <unitsPerEm value="invalid value"/>', 1)
+    (tmp_path / "full.ttx").write_text(data, encoding="utf-8")
+
+    expected = TTFont(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf")
+    dump = TTFont()
+    dump.importXML(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttx")
+    for tag in ("TSI1", "TSI3", "TSI5", "TSIC"):
+        expected[tag] = dump[tag]
+
+    merged = TTFont(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf")
+    vttLib.transfer.merge_from_file(merged, tmp_path / "full.ttx")
+    for tag in ("TSI1", "TSI3"):
+        assert merged[tag].glyphPrograms == expected[tag].glyphPrograms
+        assert merged[tag].extraPrograms == expected[tag].extraPrograms
+    assert merged["TSI5"].glyphGrouping == expected["TSI5"].glyphGrouping
+    assert merged["TSIC"].compile(merged) == expected["TSIC"].compile(expected)
+    for attr in vttLib.MAXP_ATTRS:
+        assert getattr(merged["maxp"], attr) == getattr(dump["maxp"], attr)
+
+
+def test_sidecar_reader(tmp_path, original_shared_datadir):
+    ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    font = TTFont(ttf)
+    vttLib.transfer.dump_to_sidecar(font, tmp_path / "dump.vttb")
+    normalize_vtt_programs(font)
+
+    with vttLib.transfer.SidecarReader(tmp_path / "dump.vttb") as reader:
+        assert reader.program_names("TSI1") == sorted(font["TSI1"].glyphPrograms)
+        assert reader.program_names("TSI1", is_glyph=False) == [
+            "cvt",
+            "fpgm",
+            "ppgm",
+        ]
+        assert reader.get_glyph_assembly("A") == get_glyph_assembly(font, "A")
+        assert reader.get_glyph_talk("A") == vttLib.get_glyph_talk(font, "A")
+        assert reader.get_extra_assembly("fpgm") == vttLib.get_extra_assembly(
+            font, "fpgm"
+        )
+        # only the blocks holding the requested programs were decompressed
+        assert len(reader.sidecar._blocks) == 2
+        with pytest.raises(KeyError, match="Glyph program missing from TSI1"):
+            reader.get_glyph_assembly("missing")
+
+    (tmp_path / "not_a_sidecar.vttb").write_bytes(b"")
+    with pytest.raises(vttLib.VTTLibArgumentError):
+        vttLib.transfer.SidecarReader(tmp_path / "not_a_sidecar.vttb")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compile_many(tmp_path, original_shared_datadir, jobs):
+    source_ttf = _merged_noto_font(tmp_path, original_shared_datadir)
+    other_ttf = tmp_path / "other.ttf"
+    shutil.copyfile(source_ttf, other_ttf)
+    # a font without VTT sources fails to compile
+    invalid_ttf = tmp_path / "invalid.ttf"
+    shutil.copyfile(original_shared_datadir / "NotoSans-MM-ASCII-VF.ttf", invalid_ttf)
+    expected_ttf = tmp_path / "expected.ttf"
+    vtt_compile(source_ttf, expected_ttf)
+    output_dir = tmp_path / "output"
+
+    results = vtt_compile_many(
+        [source_ttf, invalid_ttf, other_ttf], output_dir=output_dir, jobs=jobs
+    )
+
+    assert [r.infile for r in results] == [source_ttf, invalid_ttf, other_ttf]
+    assert [r.error is None for r in results] == [True, False, True]
+    assert "TSI1" in results[1].error
+    for result in (results[0], results[2]):
+        assert result.outfile == str(output_dir / result.infile.name)
+        assert result.seconds > 0
+        with open(result.outfile, "rb") as fp:
+            assert fp.read() == expected_ttf.read_bytes()